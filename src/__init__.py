@@ -13,7 +13,7 @@ __description__ = "Spotless Film - AI-powered film dust removal application"
 # Import main components for easy access
 from .dust_removal_state import DustRemovalState, ProcessingMode, ToolMode
 from .professional_dust_removal_app import SpotlessFilmApp
-from .image_processing import ImageProcessingService, LamaInpainter, BrushTools
+from .image_processing import ImageProcessingService, LamaInpainter, LamaSession, BrushTools
 from .ui_components import SpotlessSidebar, SpotlessToolbar, ZoomControls
 from .professional_canvas import SpotlessCanvas
 
@@ -24,6 +24,7 @@ __all__ = [
     'SpotlessFilmApp',
     'ImageProcessingService',
     'LamaInpainter',
+    'LamaSession',
     'BrushTools',
     'SpotlessSidebar',
     'SpotlessToolbar', 
@@ -0,0 +1,802 @@
+#!/usr/bin/env python3
+"""
+Batch Processing Engine
+
+Tk-free batch pipeline shared by the batch dialog and headless runs.
+Decode, inference, inpainting and encode run as separate stages connected by
+bounded queues, so decoding the next file and encoding the previous one
+overlap with inference on the current one. BatchProcessPool spreads whole
+files across worker processes that share one read-only model instead.
+"""
+
+import os
+import sys
+import json
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Optional, Callable, Iterable, Iterator, List, Union, Dict, Tuple
+
+import numpy as np
+import torch
+import torch.multiprocessing as torch_mp
+from PIL import Image
+
+from image_processing import ImageProcessingService, UNet
+from batch_manifest import BatchManifest
+from batch_output import OutputRouter, DEFAULT_NAME_TEMPLATE
+from batch_report import BatchReport, ThroughputModel
+from batch_schedule import image_pixels
+
+logger = logging.getLogger(__name__)
+
+
+SUPPORTED_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp", ".webp")
+
+# Batch sensitivity used when neither the slider nor --threshold set one
+DEFAULT_BATCH_THRESHOLD = 0.4
+
+
+@dataclass
+class BatchOptions:
+    """Detection/cleanup parameters and stage concurrency for a batch run"""
+    threshold: float = DEFAULT_BATCH_THRESHOLD
+    remove_scratches: bool = True
+    dust_brightness_color: bool = True
+    min_brightness: int = 180
+    max_color_diff: int = 40
+    feather_edges: bool = False
+    feather_radius: int = 3
+    multiscale_inpaint: bool = False
+    jpeg_quality: int = 95
+    # Images stacked per forward pass; 0 sizes it to available memory
+    inference_batch: int = 0
+    # Output routing: see OutputRouter
+    output_root: Optional[str] = None
+    input_root: Optional[str] = None
+    name_template: str = DEFAULT_NAME_TEMPLATE
+    fsync_outputs: bool = False
+    # Workers per stage and the size of the queue feeding each stage
+    decode_workers: int = 2
+    inference_workers: int = 1
+    inpaint_workers: int = 2
+    encode_workers: int = 2
+    queue_size: int = 4
+
+    @classmethod
+    def from_state(cls, state, threshold: float, **overrides) -> "BatchOptions":
+        """Build options from the app state's current removal settings"""
+        options = cls(
+            threshold=threshold,
+            remove_scratches=getattr(state, 'remove_scratches', True),
+            dust_brightness_color=getattr(state, 'dust_brightness_color', True),
+            min_brightness=getattr(state, 'min_brightness', 180),
+            max_color_diff=getattr(state, 'max_color_diff', 40),
+            feather_edges=getattr(state, 'feather_edges', False),
+            feather_radius=getattr(state, 'feather_radius', 3),
+            multiscale_inpaint=getattr(state, 'multiscale_inpaint', False),
+        )
+        for key, value in overrides.items():
+            setattr(options, key, value)
+        return options
+
+    def params_key(self) -> str:
+        """The settings that affect the output, as a stable string for the manifest"""
+        return json.dumps({
+            "threshold": round(self.threshold, 6),
+            "remove_scratches": self.remove_scratches,
+            "dust_brightness_color": self.dust_brightness_color,
+            "min_brightness": self.min_brightness,
+            "max_color_diff": self.max_color_diff,
+            "feather_edges": self.feather_edges,
+            "feather_radius": self.feather_radius,
+            "multiscale_inpaint": self.multiscale_inpaint,
+            "jpeg_quality": self.jpeg_quality,
+            "name_template": self.name_template,
+            "output_root": self.output_root,
+        }, sort_keys=True)
+
+    def output_router(self) -> OutputRouter:
+        return OutputRouter(self.output_root, self.input_root, self.name_template, self.fsync_outputs)
+
+
+@dataclass
+class BatchItem:
+    """One file moving through the pipeline"""
+    index: int
+    path: str
+    image: Optional[Union[Image.Image, np.ndarray]] = None
+    prob_mask: Optional[np.ndarray] = None
+    result: Optional[Union[Image.Image, np.ndarray]] = None
+    output_path: Optional[str] = None
+    error: Optional[Exception] = None
+    cancelled: bool = False
+    started_at: Optional[float] = None
+    elapsed: Optional[float] = None
+    # Filled in along the way for the timing report
+    timings: Dict[str, float] = field(default_factory=dict)
+    width: Optional[int] = None
+    height: Optional[int] = None
+    dust_pixels: Optional[int] = None
+    # 16-bit grayscale source, written back as one channel
+    grayscale: bool = False
+
+    @property
+    def megapixels(self) -> Optional[float]:
+        return self.width * self.height / 1e6 if self.width and self.height else None
+
+
+@dataclass
+class BatchProgress:
+    """Snapshot passed to progress callbacks"""
+    processed: int
+    failed: int
+    total: int
+    eta_seconds: Optional[float] = None
+    last_item: Optional[BatchItem] = None
+    discovering: bool = False  # total is still growing while the folder scan runs
+    worker_counts: Optional[Dict[int, int]] = None  # files finished per worker process
+
+
+@dataclass
+class BatchResult:
+    processed: int = 0
+    failed: int = 0
+    cancelled: bool = False
+    elapsed: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+
+@dataclass
+class BatchDiscovery:
+    """Running counts from a streaming folder scan, read by the runners for progress totals"""
+    found: int = 0
+    skipped: int = 0
+    complete: bool = False
+    megapixels: float = 0.0  # header sizes of found files, when a scheduler has read them
+
+
+def iter_batch_files(root_folder: str, manifest: Optional[BatchManifest] = None,
+                     params: Optional[str] = None, discovery: Optional[BatchDiscovery] = None,
+                     router: Optional[OutputRouter] = None) -> Iterator[str]:
+    """Yield images under root_folder to process as they are found.
+
+    Earlier outputs (named by router, or sitting in its output tree) and hidden
+    files are skipped, and with a manifest so are files already done with the
+    same params and unchanged since. Each folder is listed with a single
+    os.scandir pass and its files are yielded before descending, so the first
+    images reach the pipeline long before a large share has been fully walked.
+    """
+    discovery = discovery if discovery is not None else BatchDiscovery()
+    router = router or OutputRouter()
+    pending_dirs = [root_folder]
+    while pending_dirs:
+        folder = pending_dirs.pop()
+        try:
+            with os.scandir(folder) as it:
+                entries = list(it)
+        except OSError as e:
+            logger.warning("Can't list %s: %s", folder, e)
+            continue
+        names = {entry.name for entry in entries}
+        subdirs = []
+        for entry in sorted(entries, key=lambda e: e.name):
+            if entry.name.startswith('.'):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if os.path.abspath(entry.path) != router.output_root:
+                        subdirs.append(entry.path)
+                    continue
+            except OSError:
+                continue
+            if not entry.name.lower().endswith(SUPPORTED_EXTENSIONS):
+                continue
+            if router.is_output_name(entry.name, names) or (manifest is not None and manifest.is_output(entry.path)):
+                discovery.skipped += 1
+            elif manifest is not None and not manifest.needs_processing(entry.path, params):
+                discovery.skipped += 1
+            else:
+                discovery.found += 1
+                yield entry.path
+        # Reversed so pop() visits subfolders in name order
+        pending_dirs.extend(reversed(subdirs))
+    discovery.complete = True
+
+
+def find_batch_files(root_folder: str, manifest: Optional[BatchManifest] = None,
+                     params: Optional[str] = None, router: Optional[OutputRouter] = None) -> Tuple[List[str], int]:
+    """Images under root_folder to process, and how many were skipped"""
+    discovery = BatchDiscovery()
+    files_to_process = list(iter_batch_files(root_folder, manifest, params, discovery, router))
+    return files_to_process, discovery.skipped
+
+
+def _remaining_megapixels(discovery: Optional[BatchDiscovery], throughput: ThroughputModel) -> Optional[float]:
+    """Known work left when the scheduler has measured the files, else None"""
+    if discovery is None or discovery.megapixels <= 0:
+        return None
+    return max(0.0, discovery.megapixels - throughput.megapixels_done - throughput.megapixels_failed)
+
+
+def _failed_megapixels(item: BatchItem, discovery: Optional[BatchDiscovery]) -> Optional[float]:
+    """Size a failed file was counted with in discovery.megapixels, read from its header if it never decoded"""
+    if item.megapixels is not None or discovery is None or discovery.megapixels <= 0:
+        return item.megapixels
+    pixels = image_pixels(item.path)
+    return pixels / 1e6 if pixels else None
+
+
+def record_item(manifest: Optional[BatchManifest], item: BatchItem, params: str) -> None:
+    """Store a finished item's outcome in the manifest, if there is one"""
+    if manifest is None:
+        return
+    try:
+        if item.error is None:
+            manifest.record_done(item.path, item.output_path, params, item.elapsed)
+        else:
+            manifest.record_failed(item.path, str(item.error), params, item.elapsed)
+    except Exception as e:
+        logger.warning("Could not update manifest for %s: %s", item.path, e)
+
+
+# MARK: - Memory
+
+# Rough peak memory of one worker: U-Net activations at 1024x1024 plus image buffers
+PROCESS_MEMORY_ESTIMATE = 2 * 1024 ** 3
+# Forward-pass memory per image in a stacked inference batch
+INFERENCE_SAMPLE_BYTES = 1536 * 1024 ** 2
+MAX_INFERENCE_BATCH = 8
+
+
+def available_memory_bytes() -> Optional[int]:
+    """Memory the OS reports as available, or None when it can't be determined"""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def auto_inference_batch(device) -> int:
+    """Images per forward pass that fit in the free memory of the inference device"""
+    available = None
+    if getattr(device, 'type', str(device)) == "cuda":
+        try:
+            available, _ = torch.cuda.mem_get_info(device)
+        except Exception:
+            available = None
+    if available is None:
+        available = available_memory_bytes()
+    if not available:
+        return 1
+    return max(1, min(MAX_INFERENCE_BATCH, int(available // INFERENCE_SAMPLE_BYTES)))
+
+
+# MARK: - Stages
+
+@contextmanager
+def _timed(item: BatchItem, stage: str):
+    """Add the time spent in the block to item.timings[stage]"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        item.timings[stage] = item.timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def decode_item(item: BatchItem) -> None:
+    with _timed(item, "decode"):
+        item.image = ImageProcessingService.open_image(item.path)
+        item.grayscale = isinstance(item.image, np.ndarray) and ImageProcessingService.is_grayscale_scan(item.path)
+    item.width, item.height = ImageProcessingService.image_size(item.image)
+
+
+def detect_item(item: BatchItem, model, device) -> None:
+    with _timed(item, "inference"):
+        item.prob_mask = ImageProcessingService.predict_dust_mask(
+            model,
+            item.image,
+            threshold=0.5,
+            window_size=1024,
+            stride=512,
+            device=device,
+            progress_callback=None
+        )
+
+
+def detect_items(items: List[BatchItem], model, device) -> None:
+    """Detection for several decoded items in one stacked forward pass"""
+    if len(items) == 1:
+        detect_item(items[0], model, device)
+        return
+    start = time.perf_counter()
+    masks = ImageProcessingService.predict_dust_masks_batch(model, [item.image for item in items], device=device)
+    # One forward pass for the stack: charge each item an equal share
+    share = (time.perf_counter() - start) / len(items)
+    for item, mask in zip(items, masks):
+        item.prob_mask = mask
+        item.timings["inference"] = item.timings.get("inference", 0.0) + share
+
+
+def clean_item(item: BatchItem, options: BatchOptions) -> None:
+    """Threshold, filter, dilate, inpaint and composite one image"""
+    img = item.image
+    img_size = ImageProcessingService.image_size(img)
+
+    with _timed(item, "filters"):
+        # Threshold to binary at desired sensitivity
+        bin_mask = ImageProcessingService.create_binary_mask(item.prob_mask, options.threshold, img_size)
+        item.prob_mask = None
+
+        if not options.remove_scratches:
+            bin_mask = ImageProcessingService.keep_small_dust_only(bin_mask)
+
+        if options.dust_brightness_color:
+            bin_mask = ImageProcessingService.filter_mask_by_brightness_and_color(
+                bin_mask, img, min_brightness=options.min_brightness, max_color_diff=options.max_color_diff)
+
+    # Dilate for coverage
+    with _timed(item, "dilate"):
+        dilated = ImageProcessingService.dilate_mask(bin_mask)
+    item.dust_pixels = int(np.count_nonzero(np.asarray(dilated)))
+
+    # Inpaint (fast CV2); the blend is skipped when the mask is binary
+    with _timed(item, "inpaint"):
+        if options.multiscale_inpaint:
+            inpainted = ImageProcessingService.inpaint_multiscale(img, dilated, radius=5)
+        else:
+            inpainted = ImageProcessingService.inpaint_cv2(img, dilated, radius=5)
+    with _timed(item, "blend"):
+        blend_mask = dilated
+        if options.feather_edges:
+            blend_mask = ImageProcessingService.feather_mask(dilated, options.feather_radius)
+        item.result = ImageProcessingService.composite_inpainted(img, inpainted, blend_mask)
+    item.image = None
+
+
+def encode_item(item: BatchItem, options: BatchOptions) -> None:
+    router = options.output_router()
+    item.output_path = router.output_path(item.path)
+    with _timed(item, "encode"):
+        router.write(item.result, item.output_path, quality=options.jpeg_quality, grayscale=item.grayscale)
+    item.result = None
+
+
+def process_item(item: BatchItem, model, device, options: BatchOptions) -> None:
+    """Run every stage for one file in the calling thread"""
+    decode_item(item)
+    detect_item(item, model, device)
+    clean_item(item, options)
+    encode_item(item, options)
+
+
+# MARK: - Pipeline
+
+_END = object()  # end-of-stream marker passed between stages
+
+
+class _Stage:
+    """A pool of worker threads applying one step to items from a bounded queue.
+
+    With batch_func and batch_size > 1 a worker also takes whatever is already
+    waiting in the queue, up to batch_size items, and handles them in one call.
+    """
+
+    def __init__(self, name: str, func: Callable[[BatchItem], None], workers: int,
+                 in_queue: queue.Queue, out_queue: queue.Queue, stop_event: threading.Event,
+                 batch_func: Optional[Callable[[List[BatchItem]], None]] = None, batch_size: int = 1):
+        self.name = name
+        self.func = func
+        self.batch_func = batch_func
+        self.batch_size = max(1, int(batch_size)) if batch_func else 1
+        self.workers = max(1, int(workers))
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.stop_event = stop_event
+        self.next_workers = 1
+        self._remaining = self.workers
+        self._lock = threading.Lock()
+        self.threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"batch-{self.name}-{i}", daemon=True)
+            t.start()
+            self.threads.append(t)
+
+    def _run(self) -> None:
+        while True:
+            item = self.in_queue.get()
+            if item is _END:
+                self._finish()
+                return
+            batch = [item]
+            ended = False
+            # Don't wait for a full batch: only take what upstream has already queued
+            while len(batch) < self.batch_size:
+                try:
+                    nxt = self.in_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is _END:
+                    ended = True
+                    break
+                batch.append(nxt)
+            self._process(batch)
+            for done in batch:
+                self.out_queue.put(done)
+            if ended:
+                self._finish()
+                return
+
+    def _process(self, batch: List[BatchItem]) -> None:
+        if self.stop_event.is_set():
+            for item in batch:
+                item.cancelled = True
+        pending = [item for item in batch if item.error is None and not item.cancelled]
+        if len(pending) > 1:
+            try:
+                self.batch_func(pending)
+                return
+            except Exception as e:
+                # Fall back to one at a time so a single bad item doesn't fail the batch
+                logger.warning("Batched %s failed (%s), retrying items singly", self.name, e)
+        for item in pending:
+            try:
+                self.func(item)
+            except Exception as e:
+                item.error = e
+                item.image = item.prob_mask = item.result = None
+
+    def _finish(self) -> None:
+        with self._lock:
+            self._remaining -= 1
+            last = self._remaining == 0
+        if last:
+            # The last worker out hands one end marker to each downstream worker
+            for _ in range(self.next_workers):
+                self.out_queue.put(_END)
+
+
+class BatchPipeline:
+    """Staged producer/consumer batch engine.
+
+    Items flow decode -> inference -> inpaint -> encode through bounded queues,
+    each stage with its own worker count. Total time approaches the cost of the
+    slowest stage rather than the sum of all of them, while the queue bounds cap
+    how many decoded images are in memory at once.
+    """
+
+    def __init__(self, model, device, options: BatchOptions,
+                 stop_event: Optional[threading.Event] = None,
+                 on_progress: Optional[Callable[[BatchProgress], None]] = None,
+                 manifest: Optional[BatchManifest] = None, report: Optional[BatchReport] = None):
+        self.model = model
+        self.device = device
+        self.options = options
+        self.stop_event = stop_event or threading.Event()
+        self.on_progress = on_progress
+        self.manifest = manifest
+        self.report = report
+
+    def run(self, paths: Iterable[str], total: Optional[int] = None,
+            discovery: Optional[BatchDiscovery] = None) -> BatchResult:
+        """Process paths (any iterable) and block until every item has drained.
+
+        Pass the BatchDiscovery filled by a streaming scan to have progress
+        totals follow the scan as it finds more files.
+        """
+        opts = self.options
+        queue_size = max(1, opts.queue_size)
+        # A batch is stacked from what the decode queue already holds, so it can't exceed the queue;
+        # the queue isn't widened to fit, as the decoded frames waiting in it aren't in the budget
+        batch_size = min(opts.inference_batch or auto_inference_batch(self.device), queue_size)
+        logger.info("Inference batch size: up to %d", batch_size)
+        queues = [queue.Queue(maxsize=queue_size) for _ in range(4)]
+        done_queue: queue.Queue = queue.Queue()
+        stages = [
+            _Stage("decode", decode_item, opts.decode_workers, queues[0], queues[1], self.stop_event),
+            _Stage("inference", lambda item: detect_item(item, self.model, self.device),
+                   opts.inference_workers, queues[1], queues[2], self.stop_event,
+                   batch_func=lambda items: detect_items(items, self.model, self.device),
+                   batch_size=batch_size),
+            _Stage("inpaint", lambda item: clean_item(item, opts), opts.inpaint_workers,
+                   queues[2], queues[3], self.stop_event),
+            _Stage("encode", lambda item: encode_item(item, opts), opts.encode_workers,
+                   queues[3], done_queue, self.stop_event),
+        ]
+        for stage, next_stage in zip(stages, stages[1:]):
+            stage.next_workers = next_stage.workers
+        for stage in stages:
+            stage.start()
+
+        if total is None and hasattr(paths, '__len__'):
+            total = len(paths)
+        feeder = threading.Thread(target=self._feed, args=(paths, queues[0], stages[0].workers),
+                                  name="batch-feed", daemon=True)
+        feeder.start()
+
+        result = BatchResult()
+        params = opts.params_key()
+        start_time = time.time()
+        throughput = ThroughputModel(start_time)
+        while True:
+            item = done_queue.get()
+            if item is _END:
+                break
+            if item.cancelled:
+                continue
+            item.elapsed = time.time() - item.started_at
+            record_item(self.manifest, item, params)
+            if self.report is not None:
+                self.report.add(item)
+            if item.error is not None:
+                throughput.fail(_failed_megapixels(item, discovery))
+                result.failed += 1
+                result.errors.append(f"{item.path}: {item.error}")
+                logger.error("Batch error on %s: %s", item.path, item.error)
+            else:
+                throughput.add(item.megapixels)
+                result.processed += 1
+            self._report(result, total, throughput, item, discovery)
+
+        result.cancelled = self.stop_event.is_set()
+        result.elapsed = time.time() - start_time
+        return result
+
+    def _feed(self, paths: Iterable[str], first_queue: queue.Queue, workers: int) -> None:
+        try:
+            for index, path in enumerate(paths, start=1):
+                if self.stop_event.is_set():
+                    break
+                first_queue.put(BatchItem(index=index, path=path, started_at=time.time()))
+        finally:
+            for _ in range(workers):
+                first_queue.put(_END)
+
+    def _report(self, result: BatchResult, total: Optional[int], throughput: ThroughputModel, item: BatchItem,
+                discovery: Optional[BatchDiscovery] = None) -> None:
+        if not self.on_progress:
+            return
+        done = result.processed + result.failed
+        if discovery is not None:
+            total = discovery.found
+        eta_seconds = throughput.eta(total - done, _remaining_megapixels(discovery, throughput)) if total else None
+        self.on_progress(BatchProgress(
+            processed=result.processed,
+            failed=result.failed,
+            total=total or done,
+            eta_seconds=eta_seconds,
+            last_item=item,
+            discovering=discovery is not None and not discovery.complete,
+        ))
+
+
+# MARK: - Process pool
+
+def default_process_count() -> int:
+    """Worker processes for this machine: one per core, capped by available memory"""
+    count = os.cpu_count() or 1
+    available = available_memory_bytes()
+    if available:
+        count = min(count, int(available // PROCESS_MEMORY_ESTIMATE))
+    return max(1, count)
+
+
+# Per-process globals, set before forking or by the pool initializer
+_pool_model = None
+_pool_options: Optional[BatchOptions] = None
+
+
+def _init_pool_worker(model, options: BatchOptions, torch_threads: int) -> None:
+    global _pool_model, _pool_options
+    torch.set_num_threads(torch_threads)
+    if model is not None:
+        _pool_model = model
+    _pool_options = options
+
+
+def _pool_process(job):
+    index, path = job
+    item = BatchItem(index=index, path=path)
+    start = time.time()
+    try:
+        process_item(item, _pool_model, torch.device("cpu"), _pool_options)
+    except Exception as e:
+        item.error = e
+    error = f"{type(item.error).__name__}: {item.error}" if item.error is not None else None
+    # Plain fields only: the decoded image and masks stay in the worker
+    return {
+        "index": index,
+        "path": path,
+        "output_path": item.output_path,
+        "error": error,
+        "elapsed": time.time() - start,
+        "pid": os.getpid(),
+        "timings": item.timings,
+        "width": item.width,
+        "height": item.height,
+        "dust_pixels": item.dust_pixels,
+    }
+
+
+def _pool_failure(index: int, path: str, error: BaseException) -> dict:
+    """Result for a job the pool itself failed to run (e.g. a worker died)"""
+    return {"index": index, "path": path, "output_path": None, "error": f"{type(error).__name__}: {error}",
+            "elapsed": None, "pid": None, "timings": {}, "width": None, "height": None, "dust_pixels": None}
+
+
+class BatchProcessPool:
+    """Batch mode that spreads files over a pool of worker processes.
+
+    The U-Net weights are loaded once in the parent and moved to shared memory.
+    On Linux, when started from a single-threaded process (the CLI calls
+    start() before its folder scan begins), the workers are forked and inherit
+    the model copy-on-write. Forking a process that has
+    other threads (the GUI) can copy locks mid-use and deadlock the children, so
+    there they start from a forkserver instead, and elsewhere they are spawned;
+    both receive shared-memory handles rather than a copy. Workers run on the
+    CPU with torch threads split between them. Cancelling kills the workers and
+    removes the temp files of outputs they were writing.
+    """
+
+    def __init__(self, model, options: BatchOptions, processes: Optional[int] = None,
+                 stop_event: Optional[threading.Event] = None,
+                 on_progress: Optional[Callable[[BatchProgress], None]] = None,
+                 manifest: Optional[BatchManifest] = None, report: Optional[BatchReport] = None):
+        self.model = model
+        self.options = options
+        self.processes = processes or default_process_count()
+        self.stop_event = stop_event or threading.Event()
+        self.on_progress = on_progress
+        self.manifest = manifest
+        self.report = report
+        self._pool = None
+
+    def start(self) -> None:
+        """Start the worker processes; run() does it too if needed.
+
+        Call it before anything else in the process starts threads (such as
+        iterating a BatchScheduler) for the workers to be forked on Linux.
+        """
+        global _pool_model
+        if self._pool is not None:
+            return
+        model = self._shareable_model()
+        threads = max(1, (os.cpu_count() or 1) // self.processes)
+        if not sys.platform.startswith("linux"):
+            method = "spawn"
+        else:
+            method = "fork" if threading.active_count() == 1 else "forkserver"
+        if method == "fork":
+            _pool_model = model
+            initargs = (None, self.options, threads)
+        else:
+            initargs = (model, self.options, threads)
+        logger.info("Process pool: %d workers (%s), %d torch threads each", self.processes, method, threads)
+        self._pool = torch_mp.get_context(method).Pool(self.processes, initializer=_init_pool_worker, initargs=initargs)
+
+    def close(self) -> None:
+        """Stop workers started with start() that run() won't be given any work for"""
+        global _pool_model
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+            _pool_model = None
+
+    def run(self, paths: Iterable[str], total: Optional[int] = None,
+            discovery: Optional[BatchDiscovery] = None) -> BatchResult:
+        global _pool_model
+        if total is None and hasattr(paths, '__len__'):
+            total = len(paths)
+        self.start()
+        pool = self._pool
+
+        result = BatchResult()
+        params = self.options.params_key()
+        worker_counts: Dict[int, int] = {}
+        start_time = time.time()
+        throughput = ThroughputModel(start_time)
+        # Jobs a worker has taken; fed one per free worker so the scheduler keeps choosing the next file
+        in_flight: Dict[int, str] = {}
+        completed: queue.Queue = queue.Queue()
+        pending = iter(paths)
+        exhausted = False
+        index = 0
+        try:
+            while True:
+                while not exhausted and len(in_flight) < self.processes and not self.stop_event.is_set():
+                    path = next(pending, None)
+                    if path is None:
+                        exhausted = True
+                        break
+                    index += 1
+                    in_flight[index] = path
+                    pool.apply_async(_pool_process, ((index, path),), callback=completed.put,
+                                     error_callback=lambda e, job=(index, path): completed.put(_pool_failure(*job, e)))
+                if self.stop_event.is_set():
+                    result.cancelled = True
+                    break
+                if exhausted and not in_flight:
+                    break
+                try:
+                    done = completed.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+                in_flight.pop(done["index"], None)
+                if done["pid"] is not None:
+                    worker_counts[done["pid"]] = worker_counts.get(done["pid"], 0) + 1
+                item = BatchItem(index=done["index"], path=done["path"], output_path=done["output_path"],
+                                 elapsed=done["elapsed"], timings=done["timings"], width=done["width"],
+                                 height=done["height"], dust_pixels=done["dust_pixels"])
+                if done["error"] is not None:
+                    item.error = RuntimeError(done["error"])
+                    throughput.fail(_failed_megapixels(item, discovery))
+                    result.failed += 1
+                    result.errors.append(f"{item.path}: {done['error']}")
+                    logger.error("Batch error on %s: %s", item.path, done['error'])
+                else:
+                    throughput.add(item.megapixels)
+                    result.processed += 1
+                record_item(self.manifest, item, params)
+                if self.report is not None:
+                    self.report.add(item)
+                self._report(result, total, throughput, worker_counts, item, discovery)
+        finally:
+            if result.cancelled:
+                pool.terminate()
+            else:
+                pool.close()
+            pool.join()
+            self._pool = None
+            _pool_model = None
+            if result.cancelled:
+                router = self.options.output_router()
+                for path in in_flight.values():
+                    try:
+                        router.remove_partial(router.output_path(path))
+                    except ValueError:
+                        pass  # no output for it in the first place
+
+        result.elapsed = time.time() - start_time
+        return result
+
+    def _shareable_model(self):
+        """CPU copy of the model (the app's own model may live on MPS/CUDA) in shared memory"""
+        model = self.model
+        if next(model.parameters()).device.type != "cpu":
+            cpu_model = UNet()
+            cpu_model.load_state_dict({k: v.cpu() for k, v in model.state_dict().items()})
+            model = cpu_model
+        model.eval()
+        return model.share_memory()
+
+    def _report(self, result: BatchResult, total: Optional[int], throughput: ThroughputModel,
+                worker_counts: Dict[int, int], item: BatchItem, discovery: Optional[BatchDiscovery] = None) -> None:
+        if not self.on_progress:
+            return
+        done = result.processed + result.failed
+        if discovery is not None:
+            total = discovery.found
+        # Wall-clock throughput already reflects every worker running in parallel
+        eta_seconds = throughput.eta(total - done, _remaining_megapixels(discovery, throughput)) if total else None
+        self.on_progress(BatchProgress(
+            processed=result.processed,
+            failed=result.failed,
+            total=total or done,
+            eta_seconds=eta_seconds,
+            last_item=item,
+            discovering=discovery is not None and not discovery.complete,
+            worker_counts=dict(worker_counts),
+        ))
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Batch Job Manifest
+
+Per-folder SQLite record of what a batch run has done, so an interrupted or
+repeated run only redoes files that are new, changed, failed or whose output
+has gone missing.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = ".spotless_manifest.sqlite"
+
+# Bytes hashed from each end of a file; enough to tell re-scans apart without reading whole TIFFs
+HASH_CHUNK = 64 * 1024
+
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+def partial_hash(path: str) -> str:
+    """Hash of the size plus the first and last HASH_CHUNK bytes of a file"""
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, "rb") as f:
+        digest.update(f.read(HASH_CHUNK))
+        if size > 2 * HASH_CHUNK:
+            f.seek(-HASH_CHUNK, os.SEEK_END)
+            digest.update(f.read(HASH_CHUNK))
+    return digest.hexdigest()
+
+
+class BatchManifest:
+    """Resumable batch state stored in <root>/.spotless_manifest.sqlite.
+
+    root is where outputs go (the input folder when they sit next to their
+    sources, else the output folder); output paths are stored relative to it.
+    Each input is keyed by its path relative to input_root (root by default),
+    so the manifest stays valid if either tree is moved, and records its status,
+    the mtime/size/partial hash it had when processed, the processing parameters,
+    the output written and how long it took. Writes are committed every few
+    records so a crash loses at most a handful of entries.
+    """
+
+    COMMIT_EVERY = 20
+
+    def __init__(self, root: str, filename: str = MANIFEST_NAME, input_root: Optional[str] = None):
+        self.root = os.path.abspath(root)
+        self.input_root = os.path.abspath(input_root) if input_root else self.root
+        self.path = os.path.join(self.root, filename)
+        self._lock = threading.Lock()
+        self._uncommitted = 0
+        # The output root is usually new: create it so the first run is already resumable
+        os.makedirs(self.root, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                mtime REAL,
+                size INTEGER,
+                hash TEXT,
+                params TEXT,
+                output TEXT,
+                output_mtime REAL,
+                elapsed REAL,
+                error TEXT,
+                updated REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS files_output ON files(output)")
+        self._conn.commit()
+
+    @classmethod
+    def try_open(cls, root: str, input_root: Optional[str] = None) -> Optional["BatchManifest"]:
+        """Open the manifest for root, or None if it can't be written there (read-only shares)"""
+        try:
+            return cls(root, input_root=input_root)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning("No manifest for %s: %s", root, e)
+            return None
+
+    def _key(self, path: str) -> str:
+        return os.path.relpath(os.path.abspath(path), self.input_root)
+
+    def _output_key(self, path: str) -> str:
+        return os.path.relpath(os.path.abspath(path), self.root)
+
+    def _output_abs(self, key: str) -> str:
+        return os.path.normpath(os.path.join(self.root, key))
+
+    def needs_processing(self, path: str, params: str) -> bool:
+        """True unless the file was processed with these params, is unchanged and its output still exists"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, mtime, size, hash, params, output, output_mtime FROM files WHERE path = ?",
+                (self._key(path),)
+            ).fetchone()
+        if row is None:
+            return True
+        status, mtime, size, file_hash, old_params, output, output_mtime = row
+        if status != STATUS_DONE or old_params != params or not output:
+            return True
+        try:
+            st = os.stat(path)
+            out_st = os.stat(self._output_abs(output))
+        except OSError:
+            return True
+        if out_st.st_mtime != output_mtime or st.st_size != size:
+            return True
+        if st.st_mtime != mtime:
+            # Touched but possibly unchanged (copied archives): compare content before redoing
+            if partial_hash(path) != file_hash:
+                return True
+            with self._lock:
+                self._conn.execute("UPDATE files SET mtime = ? WHERE path = ?", (st.st_mtime, self._key(path)))
+                self._mark_dirty()
+        return False
+
+    def is_output(self, path: str) -> bool:
+        """True if an earlier run wrote this file as an output"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM files WHERE output = ? LIMIT 1", (self._output_key(path),)
+            ).fetchone() is not None
+
+    def record_done(self, path: str, output_path: str, params: str, elapsed: Optional[float] = None) -> None:
+        st = os.stat(path)
+        file_hash = partial_hash(path)
+        output_mtime = os.stat(output_path).st_mtime
+        self._record(path, STATUS_DONE, st.st_mtime, st.st_size, file_hash, params,
+                     self._output_key(output_path), output_mtime, elapsed, None)
+
+    def record_failed(self, path: str, error: str, params: str, elapsed: Optional[float] = None) -> None:
+        self._record(path, STATUS_FAILED, None, None, None, params, None, None, elapsed, error)
+
+    def _record(self, path, status, mtime, size, file_hash, params, output, output_mtime, elapsed, error) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files "
+                "(path, status, mtime, size, hash, params, output, output_mtime, elapsed, error, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self._key(path), status, mtime, size, file_hash, params, output, output_mtime,
+                 elapsed, error, time.time())
+            )
+            self._mark_dirty()
+
+    def _mark_dirty(self) -> None:
+        self._uncommitted += 1
+        if self._uncommitted >= self.COMMIT_EVERY:
+            self._conn.commit()
+            self._uncommitted = 0
+
+    def counts(self) -> dict:
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM files GROUP BY status").fetchall())
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+    def __enter__(self) -> "BatchManifest":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Batch Output Routing
+
+Decides where each cleaned batch image is written and writes it atomically,
+so a crash mid-save never leaves a truncated file that a later run would
+mistake for a finished output.
+"""
+
+import glob
+import os
+import re
+import uuid
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+from PIL import Image
+
+from image_processing import ImageProcessingService
+
+DEFAULT_NAME_TEMPLATE = "{stem}C{ext}"
+
+_TMP_SUFFIX = ".tmp"
+
+
+class OutputRouter:
+    """Output naming and placement for batch runs.
+
+    name_template builds the file name from the source's {stem} and {ext}
+    (extension including the dot); the default gives fooC.jpg for foo.jpg.
+    Without output_root files are written next to their source. With it they go
+    under output_root, mirroring their path relative to input_root when that is
+    given (a mirror tree) or flat otherwise (e.g. a separate fast volume).
+    """
+
+    def __init__(self, output_root: Optional[str] = None, input_root: Optional[str] = None,
+                 name_template: str = DEFAULT_NAME_TEMPLATE, fsync: bool = False):
+        if "{stem}" not in name_template:
+            raise ValueError(f"Output name template must contain {{stem}}: {name_template!r}")
+        self.output_root = os.path.abspath(output_root) if output_root else None
+        self.input_root = os.path.abspath(input_root) if input_root else None
+        self.name_template = name_template if "{ext}" in name_template else name_template + "{ext}"
+        if self.name_template == "{stem}{ext}" and self.writes_beside_sources:
+            raise ValueError(f"Output name template {name_template!r} would overwrite the source images; "
+                             "change the name or write to a separate output folder")
+        self.fsync = fsync
+        # Inverse of the template, to recognise earlier outputs sitting among the sources
+        pattern = re.escape(self.name_template)
+        pattern = pattern.replace(re.escape("{stem}"), r"(?P<stem>.+)").replace(re.escape("{ext}"), r"(?P<ext>\.[^.]+)")
+        self._output_name = re.compile(f"^{pattern}$")
+
+    def output_path(self, path: str) -> str:
+        folder, fname = os.path.split(os.path.abspath(path))
+        stem, ext = os.path.splitext(fname)
+        name = self.name_template.format(stem=stem, ext=ext)
+        if self.output_root is None:
+            output_path = os.path.join(folder, name)
+        elif self.input_root is not None:
+            rel_folder = os.path.relpath(folder, self.input_root)
+            output_path = os.path.normpath(os.path.join(self.output_root, rel_folder, name))
+        else:
+            output_path = os.path.join(self.output_root, name)
+        if os.path.normcase(output_path) == os.path.normcase(os.path.join(folder, fname)):
+            raise ValueError(f"Output for {path} would overwrite the source")
+        return output_path
+
+    @property
+    def writes_beside_sources(self) -> bool:
+        return self.output_root is None or self.output_root == self.input_root
+
+    def collisions(self, paths: Iterable[str]) -> Dict[str, List[str]]:
+        """Outputs that more than one of paths would be written to (flat output folders), with their sources"""
+        sources: Dict[str, List[str]] = {}
+        for path in paths:
+            sources.setdefault(os.path.normcase(self.output_path(path)), []).append(path)
+        return {output: names for output, names in sources.items() if len(names) > 1}
+
+    def is_output_name(self, fname: str, names_in_dir) -> bool:
+        """True if fname looks like an output whose source sits next to it.
+
+        Always False when outputs go to a separate output folder: anything among
+        the sources is then a source, even if its name fits the template.
+        """
+        if not self.writes_beside_sources:
+            return False
+        match = self._output_name.match(fname)
+        if not match:
+            return False
+        return (match.group("stem") + match.group("ext")) in names_in_dir
+
+    def write(self, image: Union[Image.Image, np.ndarray], output_path: str, quality: int = 95,
+              grayscale: bool = False) -> None:
+        """Write via a hidden temp file in the same folder, then rename into place"""
+        folder, fname = os.path.split(output_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        stem, ext = os.path.splitext(fname)
+        # Keep the extension so the encoder picks the right format; the leading dot hides it from scans
+        tmp_path = os.path.join(folder, f".{stem}.{uuid.uuid4().hex[:8]}{_TMP_SUFFIX}{ext}")
+        try:
+            ImageProcessingService.save_image(image, tmp_path, quality=quality, grayscale=grayscale)
+            if self.fsync:
+                _fsync_path(tmp_path)
+            os.replace(tmp_path, output_path)
+            if self.fsync:
+                _fsync_dir(folder or ".")
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+
+    @staticmethod
+    def remove_partial(output_path: str) -> None:
+        """Delete temp files left by writes of output_path that were killed mid-way"""
+        folder, fname = os.path.split(output_path)
+        stem, ext = os.path.splitext(fname)
+        pattern = f".{glob.escape(stem)}.{'[0-9a-f]' * 8}{_TMP_SUFFIX}{glob.escape(ext)}"
+        for tmp_path in glob.glob(os.path.join(glob.escape(folder), pattern)):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+def _fsync_path(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsync_dir(folder: str) -> None:
+    """Persist the rename itself; not supported on Windows, where it is skipped"""
+    if os.name == "nt":
+        return
+    fd = os.open(folder, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
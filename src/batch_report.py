@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Batch Timing Report
+
+Per-file, per-stage timings collected during a batch run, written out as CSV
+or JSON at the end, plus the rolling throughput model behind the live ETA.
+"""
+
+import csv
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+# Stage names in pipeline order, as recorded in BatchItem.timings
+STAGES = ("decode", "inference", "filters", "dilate", "inpaint", "blend", "encode")
+
+REPORTS_FOLDER = ".spotless_reports"
+
+
+def default_report_path(folder: str, ext: str = ".csv") -> str:
+    """Timestamped report path in a hidden folder, so later scans of folder ignore it"""
+    return os.path.join(folder, REPORTS_FOLDER, time.strftime("batch-%Y%m%d-%H%M%S") + ext)
+
+
+class ThroughputModel:
+    """Rolling megapixels-per-second estimate for the batch ETA.
+
+    Throughput is measured in wall-clock time over the last `window` finished
+    files, so it reflects however many workers run in parallel, and in
+    megapixels rather than files so a run of large scans doesn't skew it.
+    Remaining work is the known megapixels still queued when the scheduler has
+    measured them, otherwise estimated from the mean size of files so far.
+    Failed files leave the queue through fail(): they are no longer pending,
+    but a quick failure says nothing about the rate.
+    """
+
+    def __init__(self, start_time: Optional[float] = None, window: int = 20):
+        # Seeded with the start so the first finished file already gives a rate
+        self._points = deque([(start_time or time.time(), 0.0)], maxlen=window + 1)
+        self.megapixels_done = 0.0
+        self.megapixels_failed = 0.0
+        self._sized_files = 0
+
+    def add(self, megapixels: Optional[float], finished_at: Optional[float] = None) -> None:
+        mp = megapixels or 0.0
+        self._points.append((finished_at or time.time(), mp))
+        if megapixels:
+            self.megapixels_done += megapixels
+            self._sized_files += 1
+
+    def fail(self, megapixels: Optional[float]) -> None:
+        if megapixels:
+            self.megapixels_failed += megapixels
+
+    def rate(self) -> Optional[float]:
+        """Recent throughput in megapixels per second"""
+        elapsed = self._points[-1][0] - self._points[0][0]
+        work = sum(mp for _, mp in list(self._points)[1:])
+        if elapsed <= 0 or work <= 0:
+            return None
+        return work / elapsed
+
+    def eta(self, remaining_files: int, remaining_megapixels: Optional[float] = None) -> Optional[float]:
+        """Seconds left; uses remaining_megapixels when the sizes of pending files are known"""
+        rate = self.rate()
+        if rate is None or not self._sized_files:
+            return None
+        if remaining_megapixels is None:
+            remaining_megapixels = max(0, remaining_files) * self.megapixels_done / self._sized_files
+        return remaining_megapixels / rate
+
+
+class BatchReport:
+    """Collects one row per finished file and summarises where the time went"""
+
+    def __init__(self):
+        self.rows: List[Dict] = []
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def add(self, item) -> None:
+        timings = dict(item.timings)
+        megapixels = item.megapixels
+        row = {
+            "path": item.path,
+            "output": item.output_path,
+            "status": "failed" if item.error is not None else "done",
+            "width": item.width,
+            "height": item.height,
+            "megapixels": round(megapixels, 3) if megapixels else None,
+            "dust_pixels": item.dust_pixels,
+            "elapsed": round(item.elapsed, 4) if item.elapsed is not None else None,
+        }
+        for stage in STAGES:
+            row[stage] = round(timings[stage], 4) if stage in timings else None
+        row["error"] = str(item.error) if item.error is not None else None
+        with self._lock:
+            self.rows.append(row)
+
+    def summary(self) -> Dict:
+        """Totals per stage and each stage's share of the summed work time"""
+        with self._lock:
+            rows = list(self.rows)
+        stage_totals = {stage: sum(row[stage] or 0.0 for row in rows) for stage in STAGES}
+        work = sum(stage_totals.values())
+        megapixels = sum(row["megapixels"] or 0.0 for row in rows)
+        wall = time.time() - self.started
+        return {
+            "files": len(rows),
+            "failed": sum(1 for row in rows if row["status"] == "failed"),
+            "megapixels": round(megapixels, 2),
+            "wall_seconds": round(wall, 2),
+            "megapixels_per_second": round(megapixels / wall, 3) if wall > 0 else None,
+            "stages": {
+                stage: {
+                    "seconds": round(total, 3),
+                    "mean_seconds": round(total / len(rows), 4) if rows else None,
+                    "share": round(total / work, 3) if work > 0 else None,
+                }
+                for stage, total in stage_totals.items()
+            },
+        }
+
+    def bottleneck(self) -> Optional[str]:
+        """Stage with the largest share of work time"""
+        stages = self.summary()["stages"]
+        shares = {stage: info["share"] for stage, info in stages.items() if info["share"]}
+        return max(shares, key=shares.get) if shares else None
+
+    def write(self, path: str) -> None:
+        """Write as JSON (summary and rows) or CSV (rows), chosen by extension"""
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with self._lock:
+            rows = list(self.rows)
+        if path.lower().endswith(".json"):
+            with open(path, "w") as f:
+                json.dump({"summary": self.summary(), "files": rows}, f, indent=2)
+            return
+        fields = ["path", "output", "status", "width", "height", "megapixels", "dust_pixels", "elapsed",
+                  *STAGES, "error"]
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Batch Scheduling
+
+Reorders batch files so the biggest ones start first and user-tagged folders
+go ahead of the rest. Starting big files early lets parallel workers pack the
+small ones around them instead of one huge TIFF finishing alone at the end.
+"""
+
+import fnmatch
+import heapq
+import itertools
+import os
+import threading
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from PIL import Image
+
+ORDER_LARGEST = "largest"
+ORDER_SCAN = "scan"
+
+# Head start the scan gets before the first file is handed out: this many files found, or this long
+INITIAL_FILL = 256
+INITIAL_FILL_SECONDS = 1.0
+
+
+def parse_priority_patterns(text: str) -> List[str]:
+    """'roll12, urgent*' -> ['roll12', 'urgent*']"""
+    return [part.strip() for part in text.split(",") if part.strip()]
+
+
+def priority_rank(path: str, root: Optional[str], patterns: Sequence[str]) -> int:
+    """Index of the first pattern matching the path (lower runs first); len(patterns) if none.
+
+    A pattern matches the path relative to root, or any single folder name in it,
+    so 'roll12' picks out every file under a folder called roll12.
+    """
+    if not patterns:
+        return 0
+    rel = os.path.relpath(path, root) if root else path
+    rel = rel.replace(os.sep, "/")
+    folders = rel.split("/")[:-1]
+    for rank, pattern in enumerate(patterns):
+        if fnmatch.fnmatch(rel, pattern) or any(fnmatch.fnmatch(folder, pattern) for folder in folders):
+            return rank
+    return len(patterns)
+
+
+def image_pixels(path: str) -> Optional[int]:
+    """Pixel count from the file header only, without decoding the image"""
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+        return width * height
+    except Exception:
+        return None
+
+
+class BatchScheduler:
+    """Priority/size ordered view over a stream of batch files.
+
+    The source (usually the streaming folder scan) is drained on a background
+    thread into a heap, and iteration always hands out the best file found so
+    far: lowest priority rank first, then largest. Reading each header makes
+    the scan only a little faster than processing, so the first file waits
+    until the scan has finished, found INITIAL_FILL files, or run for
+    INITIAL_FILL_SECONDS. Small folders are thus ordered exactly; in larger
+    ones, files the scan reaches later are ordered among what has been found
+    by the time a worker asks for its next file.
+
+    Size is the header pixel count, falling back to file size for formats PIL
+    can't read the header of. Megapixels found are added to the discovery so
+    the ETA can use the real remaining work rather than an average.
+    """
+
+    def __init__(self, paths: Iterable[str], order: str = ORDER_LARGEST, priority_patterns: Sequence[str] = (),
+                 root: Optional[str] = None, discovery=None):
+        self.paths = paths
+        self.order = order
+        self.priority_patterns = list(priority_patterns)
+        self.root = root
+        self.discovery = discovery
+        self._heap: List[Tuple[int, float, int, str]] = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._scan_done = False
+        self._closed = False
+        self._error: Optional[BaseException] = None
+
+    def __iter__(self) -> Iterator[str]:
+        if self.order == ORDER_SCAN and not self.priority_patterns:
+            # Nothing to reorder: pass the stream straight through
+            for path in self.paths:
+                if self.discovery is not None:
+                    self._measure(path)
+                yield path
+            return
+        threading.Thread(target=self._scan, name="batch-schedule", daemon=True).start()
+        try:
+            with self._cond:
+                self._cond.wait_for(lambda: self._scan_done or len(self._heap) >= INITIAL_FILL,
+                                    timeout=INITIAL_FILL_SECONDS)
+            while True:
+                with self._cond:
+                    while not self._heap and not self._scan_done:
+                        self._cond.wait()
+                    if self._error is not None:
+                        raise self._error
+                    if not self._heap:
+                        return
+                    _rank, _size, _seq, path = heapq.heappop(self._heap)
+                yield path
+        finally:
+            # Consumer stopped early (cancelled batch): let the scan thread wind down
+            self._closed = True
+
+    def _scan(self) -> None:
+        try:
+            for path in self.paths:
+                if self._closed:
+                    break
+                size = self._measure(path)
+                rank = priority_rank(path, self.root, self.priority_patterns)
+                key = -size if self.order == ORDER_LARGEST else 0
+                with self._cond:
+                    # The counter keeps scan order among equals and avoids comparing paths
+                    heapq.heappush(self._heap, (rank, key, next(self._counter), path))
+                    self._cond.notify()
+        except BaseException as e:
+            self._error = e
+        finally:
+            with self._cond:
+                self._scan_done = True
+                self._cond.notify_all()
+
+    def _measure(self, path: str) -> float:
+        pixels = image_pixels(path)
+        if pixels:
+            if self.discovery is not None:
+                self.discovery.megapixels += pixels / 1e6
+            return float(pixels)
+        try:
+            # Roughly comparable to pixel counts for 8-bit RGB
+            return os.path.getsize(path) / 3.0
+        except OSError:
+            return 0.0
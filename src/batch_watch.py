@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Watch-Folder Mode
+
+Polls a scanner's output folder and yields images once they have finished
+writing, so a long-running BatchPipeline can process them with the model kept
+loaded between rolls.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from batch_engine import SUPPORTED_EXTENSIONS
+from batch_manifest import BatchManifest
+from batch_output import OutputRouter
+
+
+class FolderWatcher:
+    """Iterable of newly written, stable image files under a folder.
+
+    A file becomes ready once its size and mtime have not changed for
+    settle_seconds, which covers scanners and copy tools that write in several
+    passes. Files already present when watching starts are picked up too
+    (minus any the manifest says are done). Iteration ends when stop_event is set.
+    """
+
+    def __init__(self, root: str, settle_seconds: float = 2.0, poll_interval: float = 1.0,
+                 stop_event: Optional[threading.Event] = None, recursive: bool = True,
+                 manifest: Optional[BatchManifest] = None, params: Optional[str] = None,
+                 router: Optional[OutputRouter] = None):
+        self.root = os.path.abspath(root)
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.stop_event = stop_event or threading.Event()
+        self.recursive = recursive
+        self.manifest = manifest
+        self.params = params
+        # Recognises outputs, and the output tree to leave alone when it sits inside the watched folder
+        self.router = router or OutputRouter()
+        self._pending: Dict[str, Tuple[int, float, float]] = {}  # path -> (size, mtime, unchanged since)
+        self._handled: Dict[str, Tuple[int, float]] = {}  # path -> (size, mtime) when yielded
+
+    def __iter__(self) -> Iterator[str]:
+        while not self.stop_event.is_set():
+            for path in self.poll():
+                if self.stop_event.is_set():
+                    return
+                yield path
+            self.stop_event.wait(self.poll_interval)
+
+    def poll(self) -> List[str]:
+        """One scan of the folder: returns the files that became ready since the last one"""
+        now = time.time()
+        ready: List[str] = []
+        seen = set()
+        for path, size, mtime in self._scan(self.root):
+            seen.add(path)
+            if self._handled.get(path) == (size, mtime):
+                continue
+            previous = self._pending.get(path)
+            if previous is None or previous[:2] != (size, mtime):
+                self._pending[path] = (size, mtime, now)
+                continue
+            if size > 0 and now - previous[2] >= self.settle_seconds:
+                del self._pending[path]
+                self._handled[path] = (size, mtime)
+                if self.manifest is None or self.manifest.needs_processing(path, self.params):
+                    ready.append(path)
+        # Forget files that were moved away before they settled
+        for path in list(self._pending):
+            if path not in seen:
+                del self._pending[path]
+        ready.sort()
+        return ready
+
+    def _scan(self, folder: str) -> Iterator[Tuple[str, int, float]]:
+        try:
+            with os.scandir(folder) as it:
+                entries = list(it)
+        except OSError:
+            return
+        names = {entry.name for entry in entries}
+        for entry in entries:
+            # Skip hidden and temp files scanners write before renaming into place
+            if entry.name.startswith('.'):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if self.recursive and os.path.abspath(entry.path) != self.router.output_root:
+                        yield from self._scan(entry.path)
+                    continue
+                if not entry.name.lower().endswith(SUPPORTED_EXTENSIONS) or self.router.is_output_name(entry.name, names):
+                    continue
+                if self.manifest is not None and self.manifest.is_output(entry.path):
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue
+            yield entry.path, st.st_size, st.st_mtime
@@ -1,7 +1,10 @@
+import logging
+
 from dust_removal_state import ToolMode, ProcessingMode
-from image_processing import BrushTools
 from PIL import Image
 
+logger = logging.getLogger(__name__)
+
 def on_canvas_resize(app, event):
     """Handle canvas resize"""
     if app.use_gl:
@@ -49,7 +52,7 @@ def on_canvas_drag(app, event):
         if app.last_mouse_pos is None:
             app.last_mouse_pos = (event.x, event.y)
             app.is_panning = True
-            print("🔧 Panning initialized")
+            logger.debug("Panning initialized")
             return
             
         dx = event.x - app.last_mouse_pos[0]
@@ -60,7 +63,7 @@ def on_canvas_drag(app, event):
             off_x, off_y = app.state.view_state.drag_offset
             app.state.view_state.drag_offset = (off_x + dx, off_y + dy)
             app.last_mouse_pos = (event.x, event.y)
-            print(f"🔧 Panning: dx={dx}, dy={dy}, offset={app.state.view_state.drag_offset}")
+            logger.debug("Panning: dx=%d, dy=%d, offset=%s", dx, dy, app.state.view_state.drag_offset)
             
             # Move existing canvas items without re-rendering
             if app.image_item_id is not None:
@@ -187,86 +190,65 @@ def on_canvas_release(app, event):
     if app.state.view_state.tool_mode in (ToolMode.BRUSH, ToolMode.ERASER):
         app.state.end_brush_stroke()
 
-def apply_eraser_at_point(app, point, canvas_width, canvas_height):
-    """Apply eraser tool at given point"""
+def convert_to_low_res_coordinates(app, point, low_res_size):
+    """Map a canvas point to low-res mask pixels via the displayed image rect; None if outside it"""
+    bounds = getattr(app, 'image_item_bounds', None)
+    if not bounds:
+        return None
+    left, top, disp_w, disp_h = bounds
+    if disp_w <= 0 or disp_h <= 0:
+        return None
+    rel_x = (point[0] - left) / float(disp_w)
+    rel_y = (point[1] - top) / float(disp_h)
+    if not (0.0 <= rel_x < 1.0 and 0.0 <= rel_y < 1.0):
+        return None
+    return (rel_x * low_res_size[0], rel_y * low_res_size[1])
+
+def _paint_at_point(app, point, canvas_width, canvas_height, is_erasing):
+    """Paint or erase one drag event into the low-res mask"""
     if not app.state.dust_mask:
         return
     
-    # Don't apply eraser when space key is pressed (panning mode)
+    # Don't paint when space key is pressed (panning mode)
     if app.state.view_state.space_key_pressed:
         return
     
     # Start brush stroke
     app.state.start_brush_stroke()
     
-    # Get low-res mask for performance
-    low_res_mask = app.state.get_low_res_mask()
-    if not low_res_mask:
+    # Brush engine painting into the preview-level mask
+    engine = app.state.get_brush_engine()
+    if engine is None:
         return
     
     # Convert point to low-res coordinates
-    low_res_point = app.convert_to_low_res_coordinates(point, low_res_mask.size)
+    low_res_point = app.convert_to_low_res_coordinates(point, engine.size)
     if not low_res_point:
         return
     
     # Calculate brush radius for low-res mask
-    scale_factor = min(low_res_mask.size) / min(canvas_width, canvas_height)
+    scale_factor = min(engine.size) / min(canvas_width, canvas_height)
     brush_radius = max(1, int(app.state.view_state.brush_size * scale_factor))
     
-    # Apply eraser with interpolation if we have a previous point
-    if app.state.last_eraser_point:
-        updated_mask = BrushTools.interpolated_stroke(
-            low_res_mask, app.state.last_eraser_point, low_res_point, 
-            brush_radius, is_erasing=True
-        )
+    # Interpolate from the previous point of this stroke, if any
+    last_point = app.state.last_eraser_point if is_erasing else app.state.last_brush_point
+    if last_point:
+        dirty_rect = engine.stroke(last_point, low_res_point, brush_radius, is_erasing=is_erasing)
     else:
-        updated_mask = BrushTools.apply_circular_brush(
-            low_res_mask, low_res_point, brush_radius, is_erasing=True
-        )
+        dirty_rect = engine.stamp(low_res_point, brush_radius, is_erasing=is_erasing)
     
-    if updated_mask:
-        app.state.update_low_res_mask(updated_mask)
+    if is_erasing:
         app.state.last_eraser_point = low_res_point
-        app.display_image()
+    else:
+        app.state.last_brush_point = low_res_point
+    if dirty_rect:
+        # Redraw happens once per idle cycle via the mask observers, however many events arrive
+        app.state.update_brush_stroke(dirty_rect)
+
+def apply_eraser_at_point(app, point, canvas_width, canvas_height):
+    """Apply eraser tool at given point"""
+    _paint_at_point(app, point, canvas_width, canvas_height, is_erasing=True)
 
 def apply_brush_at_point(app, point, canvas_width, canvas_height):
     """Apply brush tool at given point"""
-    if not app.state.dust_mask:
-        return
-    
-    # Don't apply brush when space key is pressed (panning mode)
-    if app.state.view_state.space_key_pressed:
-        return
-    
-    # Start brush stroke
-    app.state.start_brush_stroke()
-    
-    # Get low-res mask for performance
-    low_res_mask = app.state.get_low_res_mask()
-    if not low_res_mask:
-        return
-    
-    # Convert point to low-res coordinates
-    low_res_point = app.convert_to_low_res_coordinates(point, low_res_mask.size)
-    if not low_res_point:
-        return
-    
-    # Calculate brush radius for low-res mask
-    scale_factor = min(low_res_mask.size) / min(canvas_width, canvas_height)
-    brush_radius = max(1, int(app.state.view_state.brush_size * scale_factor))
-    
-    # Apply brush with interpolation if we have a previous point
-    if app.state.last_brush_point:
-        updated_mask = BrushTools.interpolated_stroke(
-            low_res_mask, app.state.last_brush_point, low_res_point, 
-            brush_radius, is_erasing=False
-        )
-    else:
-        updated_mask = BrushTools.apply_circular_brush(
-            low_res_mask, low_res_point, brush_radius, is_erasing=False
-        )
-    
-    if updated_mask:
-        app.state.update_low_res_mask(updated_mask)
-        app.state.last_brush_point = low_res_point
-        app.display_image()
\ No newline at end of file
+    _paint_at_point(app, point, canvas_width, canvas_height, is_erasing=False)
@@ -6,18 +6,29 @@ Centralized state management for the dust removal application,
 matching the SwiftUI ObservableObject pattern from Spotless-Film.
 """
 
+import functools
 import tkinter as tk
 from tkinter import messagebox
 import numpy as np
 from PIL import Image, ImageTk
 import torch
 import torch.nn as nn
-from typing import Optional, List, Tuple, Callable
+from typing import Optional, List, Tuple, Callable, FrozenSet, Iterable
+import logging
 import threading
 from dataclasses import dataclass
 from enum import Enum
 import cv2
 
+from brush_engine import BrushEngine, Rect, segments_bounds, union_rect
+from frame_session import DEFAULT_LOOKAHEAD
+from image_buffer import ImageBuffer
+from mask_history import MaskHistory
+from session_memory import Artifact, SessionMemory
+from state_slices import ALL_SLICES, SLICE_IMAGES, SLICE_MASK, SLICE_PROCESSING, SLICE_VIEW
+
+logger = logging.getLogger(__name__)
+
 
 class ProcessingMode(Enum):
     SINGLE = "single"
@@ -58,27 +69,203 @@ class ProcessingState:
     stride: int = 512
 
 
+LEVEL_FULL = "full"
+LEVEL_PREVIEW = "preview"
+LEVEL_THUMBNAIL = "thumbnail"
+
+
+def _fit_long_side(size: Tuple[int, int], long_side: int) -> Tuple[int, int]:
+    """Size scaled down so its long side is at most long_side (same rounding as preview images)"""
+    w, h = size
+    if max(w, h) <= long_side:
+        return (w, h)
+    if w >= h:
+        return (long_side, max(1, int(h * (long_side / float(w)))))
+    return (max(1, int(w * (long_side / float(h)))), long_side)
+
+
+def _scale_rect(rect: Rect, src_size: Tuple[int, int], dst_size: Tuple[int, int]) -> Rect:
+    """Smallest dst-level rect covering a src-level rect"""
+    sx = dst_size[0] / float(src_size[0])
+    sy = dst_size[1] / float(src_size[1])
+    return (int(rect[0] * sx), int(rect[1] * sy),
+            min(dst_size[0], int(np.ceil(rect[2] * sx))), min(dst_size[1], int(np.ceil(rect[3] * sy))))
+
+
+@functools.lru_cache(maxsize=8)
+def _nearest_indices(src_len: int, dst_len: int, vertical: bool) -> np.ndarray:
+    """Source index PIL's NEAREST resize samples for each destination index along one axis.
+
+    Taken from PIL itself by resizing a ramp of indices: its floating-point
+    centre mapping rounds differently from any per-rect box, and columns and
+    rows are stepped differently, so this is the only exact match.
+    """
+    ramp = np.arange(src_len, dtype=np.int32)
+    if vertical:
+        out = Image.fromarray(ramp[:, None]).resize((1, dst_len), Image.NEAREST)
+    else:
+        out = Image.fromarray(ramp[None, :]).resize((dst_len, 1), Image.NEAREST)
+    return np.asarray(out).ravel().astype(np.intp)
+
+
+def _resample_into(dst: np.ndarray, src: Image.Image, rect: Rect) -> None:
+    """Re-sample rect of dst from src, matching what a whole-image NEAREST resize would give"""
+    x0, y0, x1, y1 = rect
+    if x0 >= x1 or y0 >= y1:
+        return
+    dh, dw = dst.shape
+    sw, sh = src.size
+    xs = _nearest_indices(sw, dw, False)[x0:x1]
+    ys = _nearest_indices(sh, dh, True)[y0:y1]
+    band = np.asarray(src.crop((int(xs[0]), int(ys[0]), int(xs[-1]) + 1, int(ys[-1]) + 1)))
+    dst[y0:y1, x0:x1] = band[np.ix_(ys - ys[0], xs - xs[0])]
+
+
+class MaskPyramid:
+    """Full-res dust mask with preview and thumbnail levels kept in step lazily.
+    
+    The preview level (long side up to 2048, the size of the preview images) is
+    also the live drawing buffer: brush strokes paint straight into it and are
+    replayed into full res when the stroke ends. Changes only mark a rect dirty
+    on the level below (full -> preview -> thumbnail); that region alone is
+    re-sampled the next time the level is read, so nothing is resized whole.
+    
+    Full res is held copy-on-write: share() hands out a snapshot for free and
+    the pixels are only copied if the mask is then edited.
+    """
+    
+    PREVIEW_LONG_SIDE = 2048
+    THUMBNAIL_LONG_SIDE = 512
+    
+    def __init__(self, full: Image.Image):
+        self._full = ImageBuffer(full)
+        self._preview: Optional[BrushEngine] = None
+        self._thumbnail: Optional[np.ndarray] = None
+        self._preview_dirty: Optional[Rect] = None  # full-res coordinates
+        self._thumbnail_dirty: Optional[Rect] = None  # preview coordinates
+    
+    @property
+    def full(self) -> Image.Image:
+        """Full-res mask, read-only; edit through writable_full()"""
+        return self._full.image
+    
+    def writable_full(self) -> Image.Image:
+        """Full-res mask to edit in place, copied first if a snapshot still shares it"""
+        return self._full.writable()
+    
+    def share(self) -> ImageBuffer:
+        """Snapshot of the current full-res mask that later edits won't change"""
+        return self._full.share()
+    
+    def level_size(self, level: str) -> Tuple[int, int]:
+        if level == LEVEL_PREVIEW:
+            return _fit_long_side(self.full.size, self.PREVIEW_LONG_SIDE)
+        if level == LEVEL_THUMBNAIL:
+            return _fit_long_side(self.full.size, self.THUMBNAIL_LONG_SIDE)
+        return self.full.size
+    
+    def mark_dirty(self, rect: Optional[Rect] = None) -> None:
+        """Full-res mask changed inside rect (all of it if None)"""
+        if rect is None:
+            self._preview = None
+            self._thumbnail = None
+            return
+        self._preview_dirty = union_rect(self._preview_dirty, rect)
+    
+    def mark_preview_dirty(self, rect: Rect) -> None:
+        """Preview level was painted directly inside rect"""
+        if self._thumbnail is not None:
+            self._thumbnail_dirty = union_rect(self._thumbnail_dirty, rect)
+    
+    @property
+    def brush_engine(self) -> BrushEngine:
+        """The preview level, up to date with full res"""
+        if self._preview is None:
+            size = self.level_size(LEVEL_PREVIEW)
+            self._preview = BrushEngine.from_image(self.full.resize(size, Image.NEAREST))
+            self._preview_dirty = None
+            self._thumbnail = None
+            logger.debug("Created preview mask: %s", size)
+        elif self._preview_dirty is not None:
+            rect = _scale_rect(self._preview_dirty, self.full.size, self._preview.size)
+            self._preview_dirty = None
+            _resample_into(self._preview.buffer, self.full, rect)
+            self.mark_preview_dirty(rect)
+        return self._preview
+    
+    @property
+    def preview(self) -> Image.Image:
+        return self.brush_engine.image()
+    
+    @property
+    def thumbnail(self) -> Image.Image:
+        preview = self.brush_engine
+        if self._thumbnail is None:
+            self._thumbnail = np.array(preview.image().resize(self.level_size(LEVEL_THUMBNAIL), Image.NEAREST))
+            self._thumbnail_dirty = None
+        elif self._thumbnail_dirty is not None:
+            h, w = self._thumbnail.shape
+            rect = _scale_rect(self._thumbnail_dirty, preview.size, (w, h))
+            self._thumbnail_dirty = None
+            _resample_into(self._thumbnail, preview.image(), rect)
+        return Image.fromarray(self._thumbnail, mode='L')
+    
+    def level(self, level: str) -> Image.Image:
+        if level == LEVEL_PREVIEW:
+            return self.preview
+        if level == LEVEL_THUMBNAIL:
+            return self.thumbnail
+        return self.full
+    
+    def level_for_size(self, size: Tuple[int, int]) -> str:
+        """Smallest level at least as large as size in both dimensions"""
+        for level in (LEVEL_THUMBNAIL, LEVEL_PREVIEW):
+            w, h = self.level_size(level)
+            if w >= size[0] and h >= size[1]:
+                return level
+        return LEVEL_FULL
+    
+    def resized(self, size: Tuple[int, int], level: Optional[str] = None) -> Image.Image:
+        """Mask scaled to size from the given level, or the smallest one covering it"""
+        mask = self.level(level or self.level_for_size(size))
+        if mask.size == tuple(size):
+            return mask
+        return mask.resize(size, Image.NEAREST)
+
+
 class DustRemovalState:
     """Main state management class matching SwiftUI's DustRemovalState"""
     
+    # Large buffers live in self.memory, which keeps them under the session budget:
+    # the source is only counted, the rest spill to disk when least recently used
+    selected_image = Artifact(pinned=True)
+    processed_image = Artifact(spill=True)
+    raw_prediction_mask = Artifact(spill=True)
+    selected_image_16bit = Artifact(spill=True)
+    processed_image_16bit = Artifact(spill=True)
+    
     def __init__(self, root: tk.Tk):
         self.root = root
+        self.memory = SessionMemory()
         
         # Images
         self.selected_image: Optional[Image.Image] = None
         self.processed_image: Optional[Image.Image] = None
-        self.dust_mask: Optional[Image.Image] = None
-        self.original_dust_mask: Optional[Image.Image] = None
+        self.mask_pyramid: Optional[MaskPyramid] = None  # dust_mask is its full-res level
+        self._original_mask: Optional[ImageBuffer] = None
         self.raw_prediction_mask: Optional[np.ndarray] = None
         
-        # Low-resolution drawing for performance
-        self.low_res_mask: Optional[Image.Image] = None
-        self.low_res_scale: float = 0.25
-        self.max_drawing_resolution: float = 1024
+        # Full bit-depth buffers for 16-bit TIFF scans (selected/processed_image are 8-bit views)
+        self.selected_image_16bit: Optional[np.ndarray] = None
+        self.processed_image_16bit: Optional[np.ndarray] = None
         
         # Models
         self.unet_model: Optional[nn.Module] = None
-        self.lama_inpainter = None
+        self.lama_inpainter = None  # LamaSession, loaded on first use
+        self.lama_idle_timeout: float = 300.0  # seconds before an idle LaMa model is evicted
+        
+        # Roll sessions: frames after the current one prepared in the background
+        self.frame_lookahead: int = DEFAULT_LOOKAHEAD
         
         # Device
         self.device = torch.device(
@@ -90,9 +277,8 @@ class DustRemovalState:
         self.view_state = ViewState()
         self.processing_state = ProcessingState()
         
-        # Undo system
-        self.mask_history: List[Image.Image] = []
-        self.max_history_size = 20
+        # Undo system: tile deltas of each stroke within a byte budget
+        self.mask_history = MaskHistory(max_bytes=64 * 1024 * 1024)
         self.is_dragging = False
         
         # Stroke tracking for smooth drawing
@@ -103,29 +289,85 @@ class DustRemovalState:
         self.error_message: Optional[str] = None
         self.showing_error = False
         
-        # Observer callbacks
-        self.observers: List[Callable] = []
+        # Observer callbacks with the slices each one wants; changes are coalesced per idle cycle
+        self.observers: List[Tuple[Callable, FrozenSet[str]]] = []
+        self._pending_slices: set = set()
+        self._dispatch_scheduled = False
+        self._notify_lock = threading.Lock()
+        # Slices being dispatched, so an observer can skip work; everything outside a dispatch
+        self.changed_slices: FrozenSet[str] = ALL_SLICES
         
         # Threading locks
         self._lock = threading.Lock()
+        # Held for a U-Net prediction, so detection and roll prefetch don't run it concurrently
+        self.inference_lock = threading.Lock()
     
-    def add_observer(self, callback: Callable) -> None:
-        """Add an observer for state changes"""
-        self.observers.append(callback)
-    
-    def notify_observers(self) -> None:
-        """Notify all observers of state changes"""
-        print(f"🔔 notify_observers called with {len(self.observers)} observers")
-        for i, callback in enumerate(self.observers):
-            try:
-                print(f"🔔 Scheduling observer {i}: {callback.__name__ if hasattr(callback, '__name__') else str(callback)}")
-                self.root.after_idle(callback)
-            except Exception as e:
-                print(f"🔔 Error scheduling observer {i}: {e}")
-                pass  # Handle stale callbacks gracefully
+    def add_observer(self, callback: Callable, slices: Optional[Iterable[str]] = None) -> None:
+        """Add an observer for changes to the given state slices (all of them by default)"""
+        self.observers.append((callback, frozenset(slices) if slices else ALL_SLICES))
+    
+    def notify_observers(self, *slices: str) -> None:
+        """Mark slices as changed (all if none given); observers run once on the next idle cycle"""
+        with self._notify_lock:
+            self._pending_slices.update(slices or ALL_SLICES)
+            if self._dispatch_scheduled:
+                return
+            self._dispatch_scheduled = True
+        try:
+            self.root.after_idle(self._dispatch_observers)
+        except Exception as e:
+            logger.debug("Error scheduling observers: %s", e)
+            with self._notify_lock:
+                self._dispatch_scheduled = False
+    
+    def _dispatch_observers(self) -> None:
+        """Run each observer subscribed to any slice changed since the last dispatch"""
+        with self._notify_lock:
+            changed = frozenset(self._pending_slices)
+            self._pending_slices.clear()
+            self._dispatch_scheduled = False
+        self.changed_slices = changed
+        try:
+            for callback, slices in list(self.observers):
+                if not (slices & changed):
+                    continue
+                try:
+                    callback()
+                except Exception:
+                    logger.exception("Observer %s failed", getattr(callback, '__name__', callback))
+        finally:
+            self.changed_slices = ALL_SLICES
     
     # MARK: - Computed Properties
     
+    @property
+    def source_image(self):
+        """Image to process at full bit depth: the 16-bit array if loaded, else selected_image"""
+        if self.selected_image_16bit is not None:
+            return self.selected_image_16bit
+        return self.selected_image
+    
+    @property
+    def dust_mask(self) -> Optional[Image.Image]:
+        """Full-resolution dust mask"""
+        return self.mask_pyramid.full if self.mask_pyramid is not None else None
+    
+    @dust_mask.setter
+    def dust_mask(self, mask: Optional[Image.Image]) -> None:
+        # A new mask starts a new pyramid; its lower levels are built on first use
+        self.mask_pyramid = MaskPyramid(mask) if mask is not None else None
+        # Undo steps are tile deltas against the mask being replaced; they don't apply to this one
+        self.mask_history.clear()
+    
+    @property
+    def original_dust_mask(self) -> Optional[Image.Image]:
+        """Mask as detected, before any brush edits (read-only)"""
+        return self._original_mask.image if self._original_mask is not None else None
+    
+    def keep_original_mask(self) -> None:
+        """Remember the current mask as the detected one; shares its pixels until the mask is edited"""
+        self._original_mask = self.mask_pyramid.share() if self.mask_pyramid is not None else None
+    
     @property
     def can_detect_dust(self) -> bool:
         return (self.selected_image is not None and 
@@ -145,7 +387,11 @@ class DustRemovalState:
     
     @property
     def can_undo(self) -> bool:
-        return len(self.mask_history) > 0
+        return self.mask_history.can_undo
+    
+    @property
+    def can_redo(self) -> bool:
+        return self.mask_history.can_redo
     
     # MARK: - Actions
     
@@ -153,76 +399,64 @@ class DustRemovalState:
         """Reset processing state for new image"""
         with self._lock:
             self.processed_image = None
+            self.processed_image_16bit = None
             self.dust_mask = None
-            self.original_dust_mask = None
+            self._original_mask = None
             self.raw_prediction_mask = None
             self.view_state.hide_detections = False
             self.reset_zoom()
             self.clear_mask_history()
-            self.low_res_mask = None
             self.notify_observers()
     
     def reset_zoom(self) -> None:
         """Reset zoom and pan to default"""
         self.view_state.zoom_scale = 1.0
         self.view_state.drag_offset = (0.0, 0.0)
-        self.notify_observers()
+        self.notify_observers(SLICE_VIEW)
     
     def zoom_in(self) -> None:
         """Zoom in by 1.5x up to 5x max"""
         self.view_state.zoom_scale = min(self.view_state.zoom_scale * 1.5, 5.0)
-        self.notify_observers()
+        self.notify_observers(SLICE_VIEW)
     
     def zoom_out(self) -> None:
         """Zoom out by 1.5x down to 1x min"""
         self.view_state.zoom_scale = max(self.view_state.zoom_scale / 1.5, 1.0)
         if self.view_state.zoom_scale == 1.0:
             self.view_state.drag_offset = (0.0, 0.0)
-        self.notify_observers()
+        self.notify_observers(SLICE_VIEW)
     
     def set_tool_mode(self, mode: ToolMode) -> None:
         """Set the current tool mode"""
         self.view_state.tool_mode = mode
-        self.notify_observers()
+        self.notify_observers(SLICE_VIEW)
     
     def toggle_overlay(self) -> None:
         """Toggle dust overlay visibility"""
         self.view_state.hide_detections = not self.view_state.hide_detections
-        self.notify_observers()
+        self.notify_observers(SLICE_VIEW)
     
     def set_processing_mode(self, mode: ProcessingMode) -> None:
         """Set the processing/compare mode"""
         self.view_state.processing_mode = mode
         # Do not force-hide detections; let the user control overlay visibility
-        self.notify_observers()
+        self.notify_observers(SLICE_VIEW)
     
     def show_error(self, message: str) -> None:
         """Show error message"""
         self.error_message = message
         self.showing_error = True
         messagebox.showerror("Error", message)
-        self.notify_observers()
+        self.notify_observers(SLICE_PROCESSING)
     
     # MARK: - Undo System
     
-    def save_mask_to_history(self) -> None:
-        """Save current mask to undo history"""
-        if self.dust_mask is None:
-            return
-        
-        # Convert PIL to copy for history
-        mask_copy = self.dust_mask.copy()
-        self.mask_history.append(mask_copy)
-        
-        # Limit history size
-        if len(self.mask_history) > self.max_history_size:
-            self.mask_history.pop(0)
-    
     def start_brush_stroke(self) -> None:
         """Start a new brush stroke"""
         if not self.is_dragging:
-            self.save_mask_to_history()
             self.is_dragging = True
+            if self.mask_pyramid is not None:
+                self.mask_pyramid.brush_engine.begin_stroke()
     
     def end_brush_stroke(self) -> None:
         """End the current brush stroke"""
@@ -230,77 +464,95 @@ class DustRemovalState:
         self.last_brush_point = None
         self.last_eraser_point = None
         
-        # Sync low-res changes back to full resolution
-        self.sync_low_res_to_full_res()
-        self.notify_observers()
+        # Paint the finished stroke into the full-res mask and close the undo step
+        self.apply_stroke_to_full_res()
+        self.mask_history.commit()
+        self.notify_observers(SLICE_MASK)
     
     def undo_last_mask_change(self) -> None:
         """Undo the last mask change"""
-        if not self.mask_history:
+        if self.dust_mask is None or self.is_dragging:
             return
         
-        # Restore previous mask
-        self.dust_mask = self.mask_history.pop()
+        # Swap the stroke's tiles back into the full-res mask
+        rect = self.mask_history.undo(self.mask_pyramid.writable_full())
+        if rect is None:
+            return
         
-        # Recreate low-res mask from restored full-res mask
-        self.create_low_res_mask()
-        self.notify_observers()
+        # Lower pyramid levels re-sample just that region when next read
+        self.mask_pyramid.mark_dirty(rect)
+        self.notify_observers(SLICE_MASK)
+    
+    def redo_last_mask_change(self) -> None:
+        """Redo the last undone mask change"""
+        if self.dust_mask is None or self.is_dragging:
+            return
+        
+        rect = self.mask_history.redo(self.mask_pyramid.writable_full())
+        if rect is None:
+            return
+        
+        self.mask_pyramid.mark_dirty(rect)
+        self.notify_observers(SLICE_MASK)
     
     def clear_mask_history(self) -> None:
         """Clear undo history"""
         self.mask_history.clear()
         self.is_dragging = False
     
-    # MARK: - Low-Resolution Drawing Methods
+    # MARK: - Mask Drawing Methods
+    
+    def get_brush_engine(self) -> Optional[BrushEngine]:
+        """Brush engine painting into the mask pyramid's preview level"""
+        if self.mask_pyramid is None:
+            return None
+        return self.mask_pyramid.brush_engine
     
-    def create_low_res_mask(self) -> None:
-        """Create low-resolution mask for performance"""
-        if self.dust_mask is None:
-            self.low_res_mask = None
+    def update_brush_stroke(self, dirty_rect: Optional[Rect]) -> None:
+        """Preview level was painted inside dirty_rect; the overlay reads it directly until the stroke ends"""
+        if dirty_rect is None or self.mask_pyramid is None:
             return
+        self.mask_pyramid.mark_preview_dirty(dirty_rect)
+        self.notify_observers(SLICE_MASK)
+    
+    def mask_for_size(self, size: Tuple[int, int]) -> Optional[Image.Image]:
+        """Dust mask at the given size, scaled from the smallest pyramid level that covers it.
         
-        original_size = self.dust_mask.size
-        
-        # Calculate optimal low-res size
-        max_dimension = max(original_size)
-        target_scale = min(self.low_res_scale, self.max_drawing_resolution / max_dimension)
-        
-        low_res_size = (
-            int(original_size[0] * target_scale),
-            int(original_size[1] * target_scale)
-        )
-        
-        self.low_res_mask = self.dust_mask.resize(low_res_size, Image.NEAREST)
-        print(f"🎨 Created low-res mask: {low_res_size} (scale: {target_scale})")
-    
-    def get_low_res_mask(self) -> Optional[Image.Image]:
-        """Get low-resolution mask, creating if needed"""
-        if self.low_res_mask is None:
-            self.create_low_res_mask()
-        return self.low_res_mask
-    
-    def update_low_res_mask(self, new_low_res_mask: Image.Image) -> None:
-        """Update low-res mask and provide visual feedback"""
-        self.low_res_mask = new_low_res_mask
-        
-        # Update the display mask immediately with upscaled version for visual feedback
-        if self.dust_mask is not None:
-            upscaled_mask = new_low_res_mask.resize(self.dust_mask.size, Image.NEAREST)
-            self.dust_mask = upscaled_mask
-        
-        self.notify_observers()
+        Mid-stroke the new paint only exists in the preview level, so that is used.
+        """
+        if self.mask_pyramid is None:
+            return None
+        level = LEVEL_PREVIEW if self.is_dragging else None
+        return self.mask_pyramid.resized(size, level)
     
-    def sync_low_res_to_full_res(self) -> None:
-        """Sync low-res drawing to full resolution"""
-        if self.low_res_mask is None or self.dust_mask is None:
+    def apply_stroke_to_full_res(self) -> None:
+        """Replay the finished stroke's segments at full resolution, touching only its region.
+        
+        Full-res pixels outside the stroke keep their detection detail instead of
+        being replaced by the low-res drawing.
+        """
+        if self.mask_pyramid is None:
+            return
+        engine = self.mask_pyramid.brush_engine
+        engine.end_stroke()
+        segments, engine.segments = engine.segments, []
+        if not segments:
             return
         
-        # Upscale the low-res mask to full resolution
-        final_mask = self.low_res_mask.resize(self.dust_mask.size, Image.NEAREST)
-        self.dust_mask = final_mask
+        low_w, low_h = engine.size
+        full_w, full_h = self.dust_mask.size
+        scale = (full_w / low_w, full_h / low_h)
+        box = segments_bounds(segments, scale, self.dust_mask.size)
+        if box is None:
+            return
         
-        print("🔄 Synced low-res drawing to full resolution")
-
+        full = self.mask_pyramid.writable_full()
+        self.mask_history.capture(full, box)
+        region = BrushEngine.from_image(full.crop(box))
+        region.replay(segments, scale, box[:2])
+        full.paste(region.image(), box[:2])
+        self.mask_pyramid.mark_dirty(box)
+    
     # MARK: - Image Processing Helpers
     
     def dilate_mask(self, mask: Image.Image, kernel_size: int = 5) -> Image.Image:
@@ -337,5 +589,5 @@ class DustRemovalState:
             return mask_image.resize(original_size, Image.NEAREST)
             
         except Exception as e:
-            print(f"❌ Error creating binary mask: {e}")
+            logger.error("Error creating binary mask: %s", e)
             return None
@@ -1,6 +1,18 @@
 import os
 from tkinter import filedialog, messagebox
 from PIL import Image
+import numpy as np
+from image_processing import ImageProcessingService
+from frame_session import FrameSession, PreparedFrame
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tiff', '.tif', '.bmp')
+IMAGE_FILETYPES = [
+    ("Image files", "*.jpg *.jpeg *.png *.tiff *.tif *.bmp"),
+    ("JPEG files", "*.jpg *.jpeg"),
+    ("PNG files", "*.png"),
+    ("TIFF files", "*.tiff *.tif"),
+    ("All files", "*.*")
+]
 
 def safe_import_image(app):
     """Safe wrapper for import_image to prevent multiple dialogs"""
@@ -25,19 +37,14 @@ def import_image(app):
         file_path = filedialog.askopenfilename(
             title="Select Image",
             initialdir=os.path.expanduser("~"),  # Start in home directory
-            filetypes=[
-                ("Image files", "*.jpg *.jpeg *.png *.tiff *.bmp"),
-                ("JPEG files", "*.jpg *.jpeg"),
-                ("PNG files", "*.png"),
-                ("TIFF files", "*.tiff *.tif"),
-                ("All files", "*.*")
-            ]
+            filetypes=IMAGE_FILETYPES
         )
         
         print(f"🔵 File dialog returned: '{file_path}' (type: {type(file_path)})")
         
         if file_path and file_path.strip():  # Check for valid path
             print(f"🔵 Valid file path, loading: {file_path}")
+            close_frame_session(app)
             load_image(app, file_path)
         else:
             print("🔵 No file selected or empty path")
@@ -56,8 +63,12 @@ def load_image(app, file_path: str):
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
         
-        # Load image
-        image = Image.open(file_path)
+        # Drop the previous scan, its results and caches before decoding, so two
+        # large sessions are never held at once
+        release_scan_results(app)
+        
+        # Load image (16-bit TIFFs keep a full-depth copy for processing and export)
+        image, app.state.selected_image_16bit = ImageProcessingService.open_scan(file_path)
         app.state.selected_image = image
         # Store the file path for export functionality
         app.last_loaded_path = file_path
@@ -66,7 +77,8 @@ def load_image(app, file_path: str):
         app.state.reset_processing()
         
         filename = os.path.basename(file_path)
-        print(f"✅ Image loaded: {filename} ({image.size[0]}x{image.size[1]})")
+        bit_depth = "16-bit" if app.state.selected_image_16bit is not None else "8-bit"
+        print(f"✅ Image loaded: {filename} ({image.size[0]}x{image.size[1]}, {bit_depth})")
         print(f"✅ State.selected_image set: {app.state.selected_image is not None}")
         print(f"✅ Can detect dust now: {app.state.can_detect_dust}")
         
@@ -84,18 +96,158 @@ def load_image(app, file_path: str):
         error_msg = f"Failed to load image: {str(e)}"
         print(f"❌ {error_msg}")
         app.status_label.configure(text=error_msg, text_color="red")
+        # The previous scan was already released
+        app.update_ui()
         messagebox.showerror("Error", error_msg)
 
+def release_scan_results(app):
+    """Drop the current scan, its results, previews and split caches"""
+    app.state.reset_processing()
+    app.state.selected_image = None
+    app.state.selected_image_16bit = None
+    app.preview_selected_image = None
+    app.preview_processed_image = None
+    app._split_resized_original = None
+    app._split_resized_processed = None
+    app._split_cached_signature = None
+
 def handle_file_drop(app, files: list[str]):
-    """Handle drag and drop files"""
-    if not files:
+    """Handle drag and drop files; several images open as a roll"""
+    images = [f for f in files if f.lower().endswith(IMAGE_EXTENSIONS)]
+    if not images:
+        if files:
+            messagebox.showerror("Error", "Please drop a valid image file")
+        return
+    
+    if len(images) > 1:
+        open_frame_session(app, sorted(images))
+    else:
+        close_frame_session(app)
+        load_image(app, images[0])
+
+# MARK: - Frame sessions (a roll cleaned frame by frame)
+
+def open_frame_session_dialog(app):
+    """Pick the frames of a roll; they open in file name order"""
+    paths = filedialog.askopenfilenames(
+        title="Select Frames",
+        initialdir=os.path.expanduser("~"),
+        filetypes=IMAGE_FILETYPES
+    )
+    if paths:
+        open_frame_session(app, sorted(paths))
+
+def open_frame_session(app, paths):
+    """Open paths as a roll, show the first frame and start preparing the next ones"""
+    close_frame_session(app)
+    session = FrameSession(
+        paths, app.state.memory,
+        predict=lambda source: predict_frame(app, source),
+        can_predict=lambda: app.state.unet_model is not None,
+        paused=lambda: app.state.processing_state.is_detecting or app.state.processing_state.is_removing,
+        build_preview=app.build_preview_image,
+        lookahead=app.state.frame_lookahead,
+        # Called on the worker thread
+        on_ready=lambda index: app.root.after_idle(lambda: on_frame_ready(app, index)),
+    )
+    app.frame_session = session
+    app._pending_frame = None
+    # The first frame opens straight away; the worker starts on the ones after it
+    show_frame(app, 0)
+    session.start()
+
+def predict_frame(app, source):
+    """Dust prediction for a frame being prepared; waits for any detection already running"""
+    with app.state.inference_lock:
+        return ImageProcessingService.predict_dust_mask(
+            app.state.unet_model, source, threshold=0.5, window_size=1024, stride=512, device=app.state.device)
+
+def close_frame_session(app):
+    if app.frame_session is not None:
+        app.frame_session.close()
+        app.frame_session = None
+        app._pending_frame = None
+        app.update_frame_controls()
+
+def next_frame(app):
+    if app.frame_session is not None and app.frame_session.has_next:
+        show_frame(app, app.frame_session.index + 1)
+
+def previous_frame(app):
+    if app.frame_session is not None and app.frame_session.has_previous:
+        show_frame(app, app.frame_session.index - 1)
+
+def show_frame(app, index: int):
+    """Switch the editor to frame index, using its prepared image and prediction if ready"""
+    session = app.frame_session
+    if session is None or not 0 <= index < len(session):
+        return
+    if app.state.processing_state.is_detecting or app.state.processing_state.is_removing:
+        app.status_label.configure(text="Wait for processing to finish before changing frames", text_color="orange")
         return
     
-    file_path = files[0]
-    if file_path.lower().endswith(('.jpg', '.jpeg', '.png', '.tiff', '.tif', '.bmp')):
-        load_image(app, file_path)
+    session.move_to(index)
+    frame = session.take(index)
+    if frame is None and session.is_preparing(index):
+        # Almost there: keep showing the current frame and switch when it's ready
+        app._pending_frame = index
+        app.status_label.configure(text=f"Preparing frame {index + 1}/{len(session)}...")
+        app.update_frame_controls()
+        return
+    app._pending_frame = None
+    
+    # Hand the frame being left back to the session, so stepping back is instant too
+    stash_shown_frame(app)
+    if frame is None:
+        session.skip(index)
+        load_image(app, session.paths[index])
     else:
-        messagebox.showerror("Error", "Please drop a valid image file")
+        apply_prepared_frame(app, session.paths[index], frame)
+    session.shown = index
+    app.update_frame_controls()
+
+def stash_shown_frame(app):
+    session = app.frame_session
+    if session is None or session.shown is None or app.state.selected_image is None:
+        return
+    frame = PreparedFrame(app.state.selected_image, app.state.selected_image_16bit,
+                          app.preview_selected_image, app.state.raw_prediction_mask)
+    shown, session.shown = session.shown, None
+    # Release the editor's references first, so the frame is never counted twice
+    release_scan_results(app)
+    session.stash(shown, frame)
+
+def apply_prepared_frame(app, file_path: str, frame: PreparedFrame):
+    """Show a frame decoded and detected in the background, as load_image plus detect_dust would"""
+    release_scan_results(app)
+    app.state.selected_image_16bit = frame.image_16bit
+    app.state.selected_image = frame.image
+    app.last_loaded_path = file_path
+    app.preview_selected_image = frame.preview if frame.preview is not None else app.build_preview_image(frame.image)
+    app.state.reset_processing()
+    
+    filename = os.path.basename(file_path)
+    if frame.prediction is not None:
+        app.state.raw_prediction_mask = frame.prediction
+        app.update_dust_mask_with_threshold()
+        app.state.keep_original_mask()
+        app.status_label.configure(text=f"Frame loaded: {filename} (dust pre-detected)")
+    else:
+        app.status_label.configure(text=f"Frame loaded: {filename}")
+    
+    if hasattr(app, 'detect_btn'):
+        app.detect_btn.configure(state="normal")
+    app.update_ui()
+
+def on_frame_ready(app, index: int):
+    """A frame finished preparing in the background (runs on the UI thread)"""
+    session = app.frame_session
+    if session is None:
+        return
+    if app._pending_frame == index:
+        show_frame(app, index)
+    else:
+        app.update_frame_controls()
 
 def export_image(app):
     """Export processed image"""
@@ -103,24 +255,27 @@ def export_image(app):
         messagebox.showwarning("Warning", "No processed image to export")
         return
     
+    is_16bit = app.state.processed_image_16bit is not None
+    filetypes = [
+        ("PNG files", "*.png"),
+        ("JPEG files", "*.jpg"),
+        ("TIFF files", "*.tiff"),
+        ("All files", "*.*")
+    ]
+    if is_16bit:
+        # Offer 16-bit TIFF first so archival scans keep their depth
+        filetypes.insert(0, filetypes.pop(2))
     file_path = filedialog.asksaveasfilename(
         title="Save Processed Image",
-        defaultextension=".png",
-        filetypes=[
-            ("PNG files", "*.png"),
-            ("JPEG files", "*.jpg"),
-            ("TIFF files", "*.tiff"),
-            ("All files", "*.*")
-        ]
+        defaultextension=".tiff" if is_16bit else ".png",
+        filetypes=filetypes
     )
     
     if file_path:
         try:
-            # Save with high quality
-            if file_path.lower().endswith('.jpg') or file_path.lower().endswith('.jpeg'):
-                app.state.processed_image.save(file_path, 'JPEG', quality=95)
-            else:
-                app.state.processed_image.save(file_path)
+            # Save with high quality (16-bit TIFF when the scan was 16-bit)
+            ImageProcessingService.save_image(export_source(app, file_path), file_path, quality=95,
+                                          grayscale=export_grayscale(app))
             
             filename = os.path.basename(file_path)
             print(f"✅ Image saved: {filename}")
@@ -165,7 +320,8 @@ def export_full_resolution(app):
         
         if file_path:
             # Save the full resolution processed image
-            app.state.processed_image.save(file_path, quality=95)
+            ImageProcessingService.save_image(export_source(app, file_path), file_path, quality=95,
+                                              grayscale=export_grayscale(app))
             messagebox.showinfo("Export Successful", f"Image exported successfully to:\n{file_path}")
             print(f"✅ Full resolution image exported: {file_path}")
         else:
@@ -174,4 +330,14 @@ def export_full_resolution(app):
     except Exception as e:
         error_msg = f"Failed to export image: {str(e)}"
         messagebox.showerror("Export Error", error_msg)
-        print(f"❌ Export error: {e}")
\ No newline at end of file
+        print(f"❌ Export error: {e}")
+
+def export_source(app, file_path: str):
+    """Pick the buffer to export: the 16-bit result for TIFF targets, else the 8-bit image"""
+    if app.state.processed_image_16bit is not None and file_path.lower().endswith(('.tif', '.tiff')):
+        return app.state.processed_image_16bit
+    return app.state.processed_image
+
+def export_grayscale(app) -> bool:
+    """Whether the loaded scan was 16-bit grayscale, so its 16-bit export stays one channel"""
+    return app.last_loaded_path is not None and ImageProcessingService.is_grayscale_scan(app.last_loaded_path)
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Frame Sessions
+
+A roll of scans opened together and cleaned frame by frame. While the user
+works on one frame, a background thread decodes the next few, builds their
+previews and runs dust prediction on them, so moving on shows the detections
+straight away instead of starting from zero. Prepared frames are held in the
+session memory budget (spilled to disk like any other artifact if it fills
+up), and preparation waits rather than push the frame being edited out.
+"""
+
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Sequence, Set
+
+import numpy as np
+from PIL import Image
+
+from batch_schedule import image_pixels
+from image_processing import ImageProcessingService
+from session_memory import SessionMemory
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOOKAHEAD = 3
+
+# Resident bytes per pixel of a prepared frame: 8-bit RGB plus the float32
+# prediction, and the 16-bit copy for TIFFs
+_FRAME_BYTES_PER_PIXEL = 3 + 4
+_TIFF_BYTES_PER_PIXEL = _FRAME_BYTES_PER_PIXEL + 6
+
+# How long the idle worker waits before checking the budget and model again
+_RECHECK_SECONDS = 2.0
+
+_FIELDS = ("image", "image_16bit", "preview", "prediction")
+
+
+@dataclass
+class PreparedFrame:
+    """Everything needed to show a frame without decoding or detecting it"""
+    image: Image.Image
+    image_16bit: Optional[np.ndarray] = None
+    preview: Optional[Image.Image] = None
+    prediction: Optional[np.ndarray] = None
+
+
+def estimate_frame_bytes(path: str) -> int:
+    """Resident size of a prepared frame, from the file header"""
+    pixels = image_pixels(path) or 0
+    per_pixel = _TIFF_BYTES_PER_PIXEL if path.lower().endswith(('.tif', '.tiff')) else _FRAME_BYTES_PER_PIXEL
+    return pixels * per_pixel
+
+
+class FrameSession:
+    """Ordered frames, the one being edited, and background preparation of the next ones.
+
+    The worker prepares the current frame and the `lookahead` frames after it,
+    nearest first: decode, preview, and, once predict can run (the model is
+    loaded), the dust prediction. A frame is only started while the memory
+    budget has room for it. Frames outside [current - 1, current + lookahead]
+    are dropped, so stepping back one frame stays instant too.
+
+    take() hands a prepared frame to the editor and stash() gives the frame
+    the editor is leaving back; both just move references. on_ready(index) is
+    called from the worker thread whenever a frame finishes. While paused()
+    is true (the editor is detecting or removing dust itself) no new frame is
+    started, so the two don't compete for the model.
+    """
+
+    def __init__(self, paths: Sequence[str], memory: SessionMemory,
+                 predict: Callable[[Any], np.ndarray], can_predict: Callable[[], bool],
+                 build_preview: Callable[[Image.Image], Optional[Image.Image]],
+                 lookahead: int = DEFAULT_LOOKAHEAD, on_ready: Optional[Callable[[int], None]] = None,
+                 paused: Optional[Callable[[], bool]] = None):
+        self.paths: List[str] = list(paths)
+        self.memory = memory
+        self.predict = predict
+        self.can_predict = can_predict
+        self.build_preview = build_preview
+        self.lookahead = max(0, int(lookahead))
+        self.on_ready = on_ready
+        self.paused = paused or (lambda: False)
+        self.index = 0
+        self.shown: Optional[int] = None  # frame currently loaded in the editor
+        self._ready: Set[int] = set()
+        self._predicted: Set[int] = set()
+        self._skip: Set[int] = set()  # shown in the editor, or failed to prepare
+        self._preparing: Optional[int] = None
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="frame-prefetch", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            for index in list(self._ready):
+                self._discard(index)
+            self._cond.notify_all()
+
+    @property
+    def has_next(self) -> bool:
+        return self.index + 1 < len(self.paths)
+
+    @property
+    def has_previous(self) -> bool:
+        return self.index > 0
+
+    def ready_ahead(self) -> int:
+        """Prepared frames after the current one"""
+        with self._cond:
+            return sum(1 for index in self._ready if index > self.index)
+
+    def is_ready(self, index: int) -> bool:
+        with self._cond:
+            return index in self._ready
+
+    def is_preparing(self, index: int) -> bool:
+        with self._cond:
+            return self._preparing == index
+
+    def move_to(self, index: int) -> None:
+        """Make index the current frame and re-aim preparation around it"""
+        with self._cond:
+            self.index = index
+            for other in list(self._ready):
+                if not self._in_window(other):
+                    self._discard(other)
+            self._cond.notify_all()
+
+    def take(self, index: int) -> Optional[PreparedFrame]:
+        """Prepared frame for the editor, or None if it isn't ready; the session lets go of it"""
+        with self._cond:
+            if index not in self._ready:
+                return None
+            frame = self._frame(index)
+            self._discard(index)
+            self._skip.add(index)
+            return frame
+
+    def skip(self, index: int) -> None:
+        """The editor loads index itself; don't prepare it"""
+        with self._cond:
+            self._skip.add(index)
+
+    def stash(self, index: int, frame: PreparedFrame) -> None:
+        """Frame the editor is leaving, kept prepared if it is still near the current one"""
+        with self._cond:
+            self._skip.discard(index)
+            if self._closed or not self._in_window(index) or frame.image is None:
+                return
+            self._store(index, frame)
+            self._cond.notify_all()
+
+    # Worker
+
+    def _key(self, index: int, name: str) -> str:
+        return f"frame{index}.{name}"
+
+    def _in_window(self, index: int) -> bool:
+        return self.index - 1 <= index <= self.index + self.lookahead
+
+    def _frame(self, index: int) -> PreparedFrame:
+        return PreparedFrame(**{name: self.memory.get(self._key(index, name)) for name in _FIELDS})
+
+    def _store(self, index: int, frame: PreparedFrame) -> None:
+        for name in _FIELDS:
+            self.memory.put(self._key(index, name), getattr(frame, name), spill=True)
+        self._ready.add(index)
+        if frame.prediction is not None:
+            self._predicted.add(index)
+        else:
+            self._predicted.discard(index)
+
+    def _discard(self, index: int) -> None:
+        for name in _FIELDS:
+            self.memory.discard(self._key(index, name))
+        self._ready.discard(index)
+        self._predicted.discard(index)
+
+    def _next_job(self) -> Optional[int]:
+        """Nearest frame in the window still needing work, if any"""
+        can_predict = self.can_predict()
+        for index in range(self.index, min(len(self.paths), self.index + self.lookahead + 1)):
+            if index in self._skip:
+                continue
+            if index not in self._ready or (can_predict and index not in self._predicted):
+                return index
+        return None
+
+    def _has_room(self, index: int) -> bool:
+        if index in self._ready:
+            return True  # only the prediction is missing
+        return self.memory.nbytes + estimate_frame_bytes(self.paths[index]) <= self.memory.max_bytes
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                index = None if self.paused() else self._next_job()
+                if index is None or not self._has_room(index):
+                    # Paused, nothing to do, or no room yet: the model may load or memory free up meanwhile
+                    self._cond.wait(_RECHECK_SECONDS)
+                    continue
+                self._preparing = index
+                existing = self._frame(index) if index in self._ready else None
+            try:
+                frame = self._prepare(index, existing)
+            except Exception as e:
+                logger.warning("Could not prepare frame %s: %s", self.paths[index], e)
+                frame = None
+            with self._cond:
+                self._preparing = None
+                if self._closed:
+                    return
+                if frame is None:
+                    self._skip.add(index)
+                elif self._in_window(index) and index not in self._skip:
+                    self._store(index, frame)
+                else:
+                    continue  # moved on while it was prepared
+            if self.on_ready is not None:
+                self.on_ready(index)
+
+    def _prepare(self, index: int, frame: Optional[PreparedFrame]) -> PreparedFrame:
+        path = self.paths[index]
+        if frame is None:
+            image, image_16bit = ImageProcessingService.open_scan(path)
+            frame = PreparedFrame(image, image_16bit, self.build_preview(image))
+        if self.can_predict():
+            source = frame.image_16bit if frame.image_16bit is not None else frame.image
+            frame.prediction = self.predict(source)
+        logger.debug("Prepared frame %d (%s), prediction: %s", index, path, frame.prediction is not None)
+        return frame
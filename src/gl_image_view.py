@@ -6,6 +6,7 @@ Dependencies:
   pip install PyOpenGL pyopengltk
 """
 
+import logging
 from typing import Optional, Tuple
 
 try:
@@ -30,6 +31,8 @@ from PIL import Image
 import numpy as np
 import time
 
+logger = logging.getLogger(__name__)
+
 
 if OPENGL_AVAILABLE:
     class GLImageView(TkOpenGLFrame):
@@ -57,12 +60,13 @@ if OPENGL_AVAILABLE:
         if base is not None:
             self.base_size = base.size
         self._needs_upload = True
-        print(f"[GL] set_images: base={None if base is None else base.size}, overlay={None if overlay_rgba is None else overlay_rgba.size}")
-        print(f"[GL] set_images took {(time.time()-t0)*1000:.2f} ms (flagged for upload)")
+        logger.debug("set_images: base=%s, overlay=%s, took %.2f ms (flagged for upload)",
+                     None if base is None else base.size, None if overlay_rgba is None else overlay_rgba.size,
+                     (time.time() - t0) * 1000)
         self.after_idle(self.redraw)
 
     def set_view(self, zoom: float, offset: Tuple[float, float]):
-        print(f"[GL] set_view: zoom={zoom:.3f}, offset=({offset[0]:.1f},{offset[1]:.1f})")
+        logger.debug("set_view: zoom=%.3f, offset=(%.1f,%.1f)", zoom, offset[0], offset[1])
         self.zoom = max(zoom, 0.01)
         self.offset = offset
         self.after_idle(self.redraw)
@@ -132,7 +136,7 @@ if OPENGL_AVAILABLE:
                 glEnd()
 
             self.swapbuffers()
-            print(f"[GL] redraw done in {(time.time()-t0)*1000:.2f} ms (upload={self._needs_upload})")
+            logger.debug("redraw done in %.2f ms (upload=%s)", (time.time() - t0) * 1000, self._needs_upload)
 
     # Helpers
         def _upload_textures(self):
@@ -162,7 +166,9 @@ if OPENGL_AVAILABLE:
                 self.overlay_tex = None
 
             self._needs_upload = False
-            print(f"[GL] _upload_textures: base={None if self.base_image is None else self.base_image.size}, overlay={None if self.overlay_image is None else self.overlay_image.size}, took {(time.time()-t0)*1000:.2f} ms")
+            logger.debug("_upload_textures: base=%s, overlay=%s, took %.2f ms",
+                         None if self.base_image is None else self.base_image.size,
+                         None if self.overlay_image is None else self.overlay_image.size, (time.time() - t0) * 1000)
 else:
     class GLImageView:  # stub to provide informative error if used when unavailable
         def __init__(self, *args, **kwargs):
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Shared Image Buffers
+
+Images in the state are shared with the display code rather than copied:
+readers get the same PIL image and must not change it. The few places that
+edit an image in place (the full-res dust mask: strokes, undo/redo) go through
+an ImageBuffer, which copies the pixels first only if another handle still
+shares them. Display code scales straight from the shared image, since resize
+already returns a new one.
+"""
+
+import weakref
+from typing import Optional, Tuple
+
+from PIL import Image
+
+
+class ImageBuffer:
+    """Copy-on-write handle to a PIL image.
+
+    image is for reading only. share() returns another handle onto the same
+    pixels at no cost; writable() returns pixels this handle may modify in
+    place, copying them first if any other live handle still shares them.
+    """
+
+    __slots__ = ('_image', '_owners', '__weakref__')
+
+    def __init__(self, image: Image.Image):
+        self._image = image
+        self._owners = weakref.WeakSet([self])
+
+    @property
+    def image(self) -> Image.Image:
+        return self._image
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self._image.size
+
+    @property
+    def is_shared(self) -> bool:
+        return len(self._owners) > 1
+
+    def share(self) -> "ImageBuffer":
+        other = ImageBuffer.__new__(ImageBuffer)
+        other._image = self._image
+        other._owners = self._owners
+        self._owners.add(other)
+        return other
+
+    def writable(self) -> Image.Image:
+        if self.is_shared:
+            self._owners.discard(self)
+            self._image = self._image.copy()
+            self._owners = weakref.WeakSet([self])
+        return self._image
+
+
+def fit_within(image: Image.Image, max_size: Tuple[int, int],
+               resample: Optional[int] = None) -> Image.Image:
+    """Scaled copy of image fitting max_size, like Image.thumbnail without copying the source first.
+
+    Returns image itself when it already fits; the result must be treated as read-only.
+    """
+    w, h = image.size
+    max_w, max_h = max(1, int(max_size[0])), max(1, int(max_size[1]))
+    if w <= max_w and h <= max_h:
+        return image
+    scale = min(max_w / float(w), max_h / float(h))
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    return image.resize(size, Image.Resampling.BICUBIC if resample is None else resample, reducing_gap=2.0)
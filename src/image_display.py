@@ -1,6 +1,11 @@
+import logging
+
 from PIL import Image, ImageTk
 import numpy as np
 from dust_removal_state import ProcessingMode
+from image_buffer import fit_within
+
+logger = logging.getLogger(__name__)
 
 def display_image(app, image=None):
     """Display image on canvas based on current view mode"""
@@ -21,7 +26,7 @@ def display_image(app, image=None):
         
         # Handle different view modes
         mode = app.state.view_state.processing_mode
-        print(f"🖼️ Displaying in {mode} mode")
+        logger.debug("Displaying in %s mode", mode)
         
         if mode == ProcessingMode.SINGLE:
             if app.use_gl:
@@ -33,8 +38,8 @@ def display_image(app, image=None):
         elif mode == ProcessingMode.SPLIT_SLIDER:
             display_split_view(app, canvas_width, canvas_height)
         
-    except Exception as e:
-        print(f"Error displaying image: {e}")
+    except Exception:
+        logger.exception("Error displaying image")
 
 def display_single_view(app, canvas_width, canvas_height, image=None):
     """Display single image view"""
@@ -42,19 +47,16 @@ def display_single_view(app, canvas_width, canvas_height, image=None):
     if image is None:
         if app.state.processed_image:
             image = app.preview_processed_image or app.state.processed_image
-            print("🖼️ Single view: Using processed image")
+            logger.debug("Single view: using processed image")
         else:
             image = app.preview_selected_image or app.state.selected_image
-            print("🖼️ Single view: Using selected image")
+            logger.debug("Single view: using selected image")
     else:
-        print(f"🖼️ Single view: Using provided image")
+        logger.debug("Single view: using provided image")
     
     if not image:
         return
     
-    # Create working image from chosen source (preview/full)
-    display_image = image.copy()
-    
     # Determine if we're showing processed (for info; we now allow overlay on both)
     is_processed_display = (
         (app.state.processed_image is not None) and 
@@ -65,7 +67,7 @@ def display_single_view(app, canvas_width, canvas_height, image=None):
     margin = 40
     base_w = canvas_width - margin
     base_h = canvas_height - margin
-    img_ratio = display_image.size[0] / display_image.size[1]
+    img_ratio = image.size[0] / image.size[1]
     canvas_ratio = base_w / base_h if base_h > 0 else 1.0
     if img_ratio > canvas_ratio:
         fitted_w = base_w
@@ -81,7 +83,8 @@ def display_single_view(app, canvas_width, canvas_height, image=None):
 
     # Choose resampling quality (interactive zoom uses faster filter)
     resample = app._current_resample or Image.Resampling.LANCZOS
-    display_image = display_image.resize((disp_w, disp_h), resample)
+    # resize returns a new image, so the shared source is never copied or changed
+    display_image = image.resize((disp_w, disp_h), resample)
 
     # Calculate position with pan offset
     off_x, off_y = app.state.view_state.drag_offset
@@ -113,22 +116,15 @@ def display_side_by_side_view(app, canvas_width, canvas_height):
     if not app.state.selected_image:
         return
     
-    print("🖼️ Rendering side-by-side view")
+    logger.debug("Rendering side-by-side view")
     
     # Calculate dimensions for each side
     half_width = canvas_width // 2
     margin = 20
     
-    # Original image (left side)
-    original_image = app.state.selected_image.copy()
-    
-    # Add dust overlay to original if available and overlay is visible
-    if app.state.dust_mask and getattr(app, 'overlay_visible', True):
-        # Use fast overlay at display size
-        pass
-    
-    # Resize original image
-    original_image.thumbnail((half_width - margin, canvas_height - 40), Image.Resampling.LANCZOS)
+    # Original image (left side), scaled from the shared image without copying it
+    original_image = fit_within(app.state.selected_image, (half_width - margin, canvas_height - 40),
+                                Image.Resampling.LANCZOS)
     app.photo_left = ImageTk.PhotoImage(original_image)
     
     # Display original on left
@@ -138,8 +134,8 @@ def display_side_by_side_view(app, canvas_width, canvas_height):
     
     # Processed image (right side) if available
     if app.state.processed_image:
-        processed_image = app.state.processed_image.copy()
-        processed_image.thumbnail((half_width - margin, canvas_height - 40), Image.Resampling.LANCZOS)
+        processed_image = fit_within(app.state.processed_image, (half_width - margin, canvas_height - 40),
+                                     Image.Resampling.LANCZOS)
         app.photo_right = ImageTk.PhotoImage(processed_image)
         
         # Display processed on right
@@ -160,7 +156,7 @@ def display_split_view(app, canvas_width, canvas_height):
     if not app.state.selected_image:
         return
     
-            # print("🖼️ Rendering split view")    
+    logger.debug("Rendering split view")
     # If no processed image, show single view
     if not app.state.processed_image:
         display_single_view(app, canvas_width, canvas_height)
@@ -199,8 +195,9 @@ def display_split_view(app, canvas_width, canvas_height):
     cache_size = (new_width, new_height)
     signature = (cache_size, orig_token, proc_token, overlay_flag, mask_token, float(getattr(app, 'overlay_opacity', 0.5)))
 
-    # Cache resized images for current size/content to make slider smooth
-    if app._split_cached_signature != signature:
+    # Cache resized images for current size/content to make slider smooth (re-made if evicted)
+    if (app._split_cached_signature != signature or app._split_resized_original is None
+            or app._split_resized_processed is None):
         resample = app._current_resample or Image.Resampling.LANCZOS
         app._split_resized_original = base_original.resize(cache_size, resample)
         app._split_resized_processed = base_processed.resize(cache_size, resample)
@@ -293,21 +290,15 @@ def display_single_view_gl(app, canvas_width, canvas_height):
 def create_overlay_image(app, base_image):
     """Create image with dust overlay (matches Swift app visualization)"""
     try:
-        print("🎨 Creating dust overlay...")
-        
         # Convert base image to RGB if needed
         if base_image.mode != 'RGB':
             base_image = base_image.convert('RGB')
         
-        # Get dust mask
-        dust_mask = app.state.dust_mask
+        # Get dust mask at the image's size
+        dust_mask = app.state.mask_for_size(base_image.size)
         if not dust_mask:
             return base_image
         
-        # Ensure mask is same size as image
-        if dust_mask.size != base_image.size:
-            dust_mask = dust_mask.resize(base_image.size, Image.Resampling.NEAREST)
-        
         # Convert to numpy arrays
         base_array = np.array(base_image).astype(np.float32)
         mask_array = np.array(dust_mask).astype(np.float32) / 255.0
@@ -324,11 +315,10 @@ def create_overlay_image(app, base_image):
         # Convert back to image
         overlay_image = Image.fromarray(np.clip(base_array, 0, 255).astype(np.uint8))
         
-        print("✅ Dust overlay created")
         return overlay_image
         
     except Exception as e:
-        print(f"❌ Error creating overlay: {e}")
+        logger.error("Error creating overlay: %s", e)
         return base_image
 
 def create_overlay_layer(app, display_size):
@@ -336,10 +326,8 @@ def create_overlay_layer(app, display_size):
     try:
         if not app.state.dust_mask:
             return None
-        # Always base overlay on the full-res mask and scale to the current display size
-        mask = app.state.dust_mask
-        if mask.size != display_size:
-            mask = mask.resize(display_size, Image.Resampling.NEAREST)
+        # Scaled from the smallest mask pyramid level that covers the display size
+        mask = app.state.mask_for_size(display_size)
         mask_array = np.array(mask.convert('L'), dtype=np.uint8)
         alpha = float(getattr(app, 'overlay_opacity', 0.5))
         a = (mask_array.astype(np.float32) * alpha).clip(0, 255).astype(np.uint8)
@@ -357,7 +345,8 @@ def build_preview_image(app, image, long_side: int = 2048):
             return None
         w, h = image.size
         if max(w, h) <= long_side:
-            return image.copy()
+            # Small enough already: share it, display code never edits images in place
+            return image
         if w >= h:
             new_w = long_side
             new_h = max(1, int(h * (long_side / float(w))))
@@ -366,5 +355,13 @@ def build_preview_image(app, image, long_side: int = 2048):
             new_w = max(1, int(w * (long_side / float(h))))
         return image.resize((new_w, new_h), Image.Resampling.LANCZOS)
     except Exception as e:
-        print(f"Preview build failed: {e}")
-        return image
\ No newline at end of file
+        logger.warning("Preview build failed: %s", e)
+        return image
+
+def rebuild_selected_preview(app):
+    """Preview of the selected image, re-made after the session memory budget dropped it"""
+    return build_preview_image(app, app.state.selected_image)
+
+def rebuild_processed_preview(app):
+    """Preview of the processed image, re-made after the session memory budget dropped it"""
+    return build_preview_image(app, app.state.processed_image)
@@ -10,11 +10,19 @@ import torch
 import torch.nn as nn
 from PIL import Image, ImageDraw
 import cv2
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, List, Union, Callable
+import os
+import gc
+import importlib.util
+import logging
 import threading
 import time
 from dataclasses import dataclass
 
+from brush_engine import BrushEngine
+
+logger = logging.getLogger(__name__)
+
 
 # Import model architecture (copy from notebook)
 class UNet(nn.Module):
@@ -64,16 +72,11 @@ class UNet(nn.Module):
         return torch.sigmoid(self.final(d1))
 
 
-# Try to import LaMa for deep learning inpainting
-try:
-    from lama_cleaner.model_manager import ModelManager
-    from lama_cleaner.schema import Config
-    LAMA_AVAILABLE = True
-except ImportError:
-    import traceback
-    print("❌ LaMa Cleaner not found. Please install it with 'pip install lama-cleaner'")
-    traceback.print_exc()
-    LAMA_AVAILABLE = False
+# LaMa is optional and heavy to import: only check that it is installed here,
+# the actual import happens when a LamaInpainter is constructed.
+LAMA_AVAILABLE = importlib.util.find_spec("lama_cleaner") is not None
+if not LAMA_AVAILABLE:
+    logger.warning("LaMa Cleaner not found. Please install it with 'pip install lama-cleaner'")
 
 
 class LamaInpainter:
@@ -85,6 +88,8 @@ class LamaInpainter:
         
         if LAMA_AVAILABLE:
             try:
+                from lama_cleaner.model_manager import ModelManager
+                from lama_cleaner.schema import Config
                 self.model = ModelManager(
                     name="lama",
                     device=self.device,
@@ -102,17 +107,15 @@ class LamaInpainter:
                     hd_strategy_resize_limit=2048,
                 )
                 self.available = True
-                print("✅ LaMa inpainting model loaded successfully")
-            except Exception as e:
-                import traceback
-                print(f"❌ Failed to load LaMa model: {e}")
-                traceback.print_exc()
+                logger.info("LaMa inpainting model loaded successfully")
+            except Exception:
+                logger.exception("Failed to load LaMa model")
                 self.available = False
     
     def inpaint(self, image: Image.Image, mask: Image.Image) -> Image.Image:
         """Inpaint using LaMa or fallback to advanced CV2"""
         if not self.available:
-            print("🎨 LaMa not available, falling back to CV2 inpainting...")
+            logger.info("LaMa not available, falling back to CV2 inpainting")
             return self._fallback_inpaint(image, mask)
         
         try:
@@ -121,15 +124,29 @@ class LamaInpainter:
             mask_np = np.array(mask.convert('L'))
                 
             result = self.model(image_np, mask_np, self.config)
-            return Image.fromarray(result)
+            return Image.fromarray(self._as_rgb(result, image_np, mask_np))
             
-        except Exception as e:
-            import traceback
-            print(f"❌ LaMa inpainting failed: {e}, falling back to CV2")
-            traceback.print_exc()
+        except Exception:
+            logger.exception("LaMa inpainting failed, falling back to CV2")
             return self._fallback_inpaint(image, mask)
     
-    def _fallback_inpaint(self, image: Image.Image, mask: Image.Image) -> Image.Image:
+    @staticmethod
+    def _as_rgb(result: np.ndarray, image_np: np.ndarray, mask_np: np.ndarray) -> np.ndarray:
+        """lama_cleaner returns BGR (float in some versions); match the input's RGB order.
+
+        Pixels outside the mask come back unchanged, so whichever channel order
+        reproduces them is the one the model used.
+        """
+        result = np.clip(result, 0, 255).astype(np.uint8) if result.dtype != np.uint8 else result
+        keep = mask_np[::8, ::8] < 127
+        if keep.any() and result.shape == image_np.shape:
+            sample, source = result[::8, ::8][keep].astype(np.int16), image_np[::8, ::8][keep].astype(np.int16)
+            if np.abs(sample[:, ::-1] - source).mean() < np.abs(sample - source).mean():
+                return np.ascontiguousarray(result[:, :, ::-1])
+        return result
+
+    @staticmethod
+    def _fallback_inpaint(image: Image.Image, mask: Image.Image) -> Image.Image:
         """Fallback to TELEA CV2 inpainting with a single pass (radius=5)."""
         image_np = np.array(image.convert('RGB'))
         mask_np = np.array(mask.convert('L'))
@@ -137,6 +154,164 @@ class LamaInpainter:
         return Image.fromarray(result)
 
 
+class LamaSession:
+    """Lazily loaded LaMa model that stays warm while in use.
+
+    Nothing is imported or loaded until LaMa is first requested. request() loads and
+    warms the model on a background thread; inpaint() waits up to load_timeout
+    seconds for it and falls back to CV2 if it isn't ready, or failed to load. After
+    idle_timeout seconds without use the model is dropped and its memory released,
+    and the next request loads it again. idle_timeout=None keeps it resident.
+    """
+    
+    def __init__(self, idle_timeout: Optional[float] = 300.0,
+                 on_status: Optional[Callable[[str], None]] = None,
+                 load_timeout: Optional[float] = 300.0):
+        self.idle_timeout = idle_timeout
+        self.on_status = on_status
+        self.load_timeout = load_timeout
+        self._inpainter: Optional[LamaInpainter] = None
+        self._load_error: Optional[BaseException] = None
+        self._loader: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._evict_timer: Optional[threading.Timer] = None
+        self._in_use = 0
+        self._last_used = 0.0
+    
+    @property
+    def available(self) -> bool:
+        """LaMa can be used (installed, and not known to have failed loading)"""
+        if not LAMA_AVAILABLE or self._load_error is not None:
+            return False
+        return self._inpainter is None or self._inpainter.available
+    
+    @property
+    def is_loaded(self) -> bool:
+        return self._ready.is_set() and self._inpainter is not None
+    
+    def request(self) -> None:
+        """Start loading and warming the model in the background if it isn't resident"""
+        with self._lock:
+            self._last_used = time.time()
+            if self._inpainter is not None or not LAMA_AVAILABLE or self._load_error is not None:
+                self._schedule_eviction()
+                return
+            if self._loader is not None and self._loader.is_alive():
+                return
+            self._ready.clear()
+            self._loader = threading.Thread(target=self._load, daemon=True)
+            self._loader.start()
+    
+    def inpaint(self, image: Image.Image, mask: Image.Image) -> Image.Image:
+        """Inpaint with LaMa, loading it first if needed (falls back to CV2)"""
+        if not LAMA_AVAILABLE:
+            return LamaInpainter._fallback_inpaint(image, mask)
+        self.request()
+        if not self._ready.wait(self.load_timeout):
+            logger.warning("LaMa not ready after %ss, falling back to CV2 inpainting", self.load_timeout)
+            return LamaInpainter._fallback_inpaint(image, mask)
+        with self._lock:
+            inpainter = self._inpainter
+            self._in_use += 1
+        try:
+            if inpainter is None:
+                return LamaInpainter._fallback_inpaint(image, mask)
+            return inpainter.inpaint(image, mask)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+                self._last_used = time.time()
+                self._schedule_eviction()
+    
+    def evict(self) -> None:
+        """Drop the model now and release its memory"""
+        with self._lock:
+            if self._in_use > 0 or self._inpainter is None:
+                return
+            self._inpainter = None
+            self._ready.clear()
+            if self._evict_timer is not None:
+                self._evict_timer.cancel()
+                self._evict_timer = None
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        if torch.backends.mps.is_available() and hasattr(torch, "mps"):
+            torch.mps.empty_cache()
+        logger.info("LaMa model evicted after idle timeout")
+        self._set_status("idle")
+    
+    def _load(self) -> None:
+        self._set_status("loading")
+        logger.info("Loading LaMa on demand")
+        inpainter = None
+        try:
+            inpainter = LamaInpainter()
+            if inpainter.available:
+                self._warm_up(inpainter)
+        except Exception as e:
+            logger.exception("Loading LaMa failed")
+            self._load_error = e
+            inpainter = None
+        finally:
+            # Always release waiters; a failed load leaves _inpainter None, so they fall back to CV2
+            with self._lock:
+                self._inpainter = inpainter
+                self._last_used = time.time()
+                self._ready.set()
+                self._schedule_eviction()
+        self._set_status("ready" if inpainter is not None and inpainter.available else "unavailable")
+    
+    @staticmethod
+    def _warm_up(inpainter: LamaInpainter) -> None:
+        """Run a tiny inpaint so the first real request doesn't pay for lazy init"""
+        try:
+            t0 = time.time()
+            image = np.zeros((64, 64, 3), dtype=np.uint8)
+            mask = np.zeros((64, 64), dtype=np.uint8)
+            mask[24:40, 24:40] = 255
+            inpainter.model(image, mask, inpainter.config)
+            logger.info("LaMa warm-up done in %.2fs", time.time() - t0)
+        except Exception as e:
+            logger.warning("LaMa warm-up failed (non-blocking): %s", e)
+    
+    def _schedule_eviction(self) -> None:
+        """(Re)arm the idle timer; caller holds the lock"""
+        if not self.idle_timeout or self._inpainter is None:
+            return
+        if self._evict_timer is not None:
+            self._evict_timer.cancel()
+        self._evict_timer = threading.Timer(self.idle_timeout, self._evict_if_idle)
+        self._evict_timer.daemon = True
+        self._evict_timer.start()
+    
+    def _evict_if_idle(self) -> None:
+        with self._lock:
+            idle_for = time.time() - self._last_used
+            if self._in_use > 0 or idle_for < self.idle_timeout:
+                self._schedule_eviction()
+                return
+        self.evict()
+    
+    def _set_status(self, status: str) -> None:
+        if self.on_status:
+            try:
+                self.on_status(status)
+            except Exception:
+                pass
+
+
+def _is_high_bit_depth(im: Image.Image) -> bool:
+    """True for TIFFs with more than 8 bits per sample, from the header alone"""
+    if im.format != 'TIFF':
+        return False
+    if im.mode.startswith('I;16'):
+        return True
+    bits = im.tag_v2.get(258, 8)  # BitsPerSample, one value per channel
+    return max(bits) > 8 if isinstance(bits, tuple) else bits > 8
+
+
 class ImageProcessingService:
     """Service for handling image processing operations"""
     
@@ -169,15 +344,15 @@ class ImageProcessingService:
                 kept += 1
             else:
                 removed += 1
-        print(f"🧹 keep_small_dust_only: kept={kept}, removed={removed}, max_area={max_area_px}, max_axis={max_axis_len}")
+        logger.debug("keep_small_dust_only: kept=%d, removed=%d, max_area=%d, max_axis=%d",
+                     kept, removed, max_area_px, max_axis_len)
         return Image.fromarray(keep, mode='L')
     
     @staticmethod
     def load_model(weights_path: str, device: torch.device) -> UNet:
         """Load U-Net model from weights file (exact match to main.ipynb architecture)"""
         try:
-            print(f"🔍 Loading model from: {weights_path}")
-            print(f"🔍 Device: {device}")
+            logger.info("Loading model from %s on %s", weights_path, device)
             
             # Create model with exact same architecture as main.ipynb
             model = UNet()
@@ -190,21 +365,19 @@ class ImageProcessingService:
             model.to(device)
             model.eval()
             
-            print(f"✅ Model loaded successfully from {weights_path}")
-            print(f"✅ Model is on device: {next(model.parameters()).device}")
+            logger.info("Model loaded from %s", weights_path)
             
             # Test model with dummy input to verify it works
             with torch.no_grad():
                 test_input = torch.randn(1, 1, 1024, 1024).to(device)
                 test_output = model(test_input)
-                print(f"✅ Model test successful - Output shape: {test_output.shape}")
-                print(f"✅ Output range: {test_output.min():.6f} to {test_output.max():.6f}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Model test output %s, range %.6f to %.6f",
+                                 tuple(test_output.shape), float(test_output.min()), float(test_output.max()))
             
             return model
-        except Exception as e:
-            print(f"❌ Failed to load model: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Failed to load model from %s", weights_path)
             raise
     
     @staticmethod
@@ -220,20 +393,7 @@ class ImageProcessingService:
         if device is None:
             device = torch.device("mps" if torch.backends.mps.is_available() else "cpu")
 
-        # Load image in grayscale
-        if isinstance(image_path_or_image, str):
-            image = Image.open(image_path_or_image).convert('L')
-        else:
-            image = image_path_or_image.convert('L') if image_path_or_image.mode != 'L' else image_path_or_image
-
-        orig_w, orig_h = image.size
-        print(f"🔍 Input image size: {orig_w}x{orig_h}")
-
-        # Force-resize to 1024x1024 (squeezed if necessary)
-        target = 1024
-        image_1024 = image.resize((target, target), Image.Resampling.BILINEAR)
-
-        img_np = np.array(image_1024, dtype=np.float32) / 255.0
+        img_np, (orig_w, orig_h) = ImageProcessingService._model_input(image_path_or_image)
         tensor = torch.from_numpy(img_np).unsqueeze(0).unsqueeze(0).to(device)
 
         if progress_callback:
@@ -252,16 +412,61 @@ class ImageProcessingService:
         if progress_callback:
             progress_callback(1.0)
 
-        print(f"🔍 Final prediction shape: {up_pred.shape}")
-        print(f"🔍 Prediction range: {up_pred.min():.6f} to {up_pred.max():.6f}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Prediction %s, range %.6f to %.6f", up_pred.shape, float(up_pred.min()), float(up_pred.max()))
         return up_pred
-    
+
+    @staticmethod
+    def predict_dust_masks_batch(model: UNet, images: List, device: torch.device = None) -> List[np.ndarray]:
+        """
+        Batched variant of predict_dust_mask: every image is squeezed to the
+        1024x1024 model input and the stack goes through a single forward pass.
+        Returns one probability map per image at its original resolution.
+        """
+        if device is None:
+            device = torch.device("mps" if torch.backends.mps.is_available() else "cpu")
+        if not images:
+            return []
+
+        inputs = [ImageProcessingService._model_input(img) for img in images]
+        batch = np.stack([img_np for img_np, _ in inputs])[:, None, :, :]
+        tensor = torch.from_numpy(batch).to(device)
+
+        with torch.no_grad():
+            preds = model(tensor).detach().cpu().numpy().astype(np.float32)
+
+        logger.debug("Batched prediction for %d images", len(images))
+        return [cv2.resize(pred[0], size, interpolation=cv2.INTER_LINEAR).astype(np.float32)
+                for pred, (_, size) in zip(preds, inputs)]
+
+    @staticmethod
+    def _model_input(image_path_or_image) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """Grayscale float32 1024x1024 model input and the original (width, height)"""
+        target = 1024
+        image = image_path_or_image
+        if isinstance(image, str):
+            image = ImageProcessingService.open_image(image)
+        if not isinstance(image, np.ndarray):
+            # 8-bit: grayscale, then force-resize to 1024x1024 (squeezed if necessary)
+            image = image.convert('L') if image.mode != 'L' else image
+            orig_w, orig_h = image.size
+            logger.debug("Input image size: %dx%d", orig_w, orig_h)
+            image_1024 = image.resize((target, target), Image.Resampling.BILINEAR)
+            return np.array(image_1024, dtype=np.float32) / 255.0, (orig_w, orig_h)
+        # High bit-depth array: shrink first, then gray and normalize only the 1024x1024 input
+        orig_h, orig_w = image.shape[:2]
+        logger.debug("Input image size: %dx%d (%s)", orig_w, orig_h, image.dtype)
+        small = cv2.resize(image, (target, target), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY) if small.ndim == 3 else small
+        img_np = gray.astype(np.float32) / float(np.iinfo(gray.dtype).max)
+        return img_np, (orig_w, orig_h)
+
     @staticmethod
     def create_binary_mask(prediction: np.ndarray, threshold: float, 
                           original_size: Tuple[int, int]) -> Image.Image:
         """Create binary mask from prediction (matches Swift ImageProcessingService)"""
-        print(f"🎯 Creating binary mask with threshold {threshold:.3f}")
-        print(f"🔍 Prediction shape: {prediction.shape}, Original size: {original_size}")
+        logger.debug("Creating binary mask with threshold %.3f from %s prediction, original size %s",
+                     threshold, prediction.shape, original_size)
         
         # Handle different prediction shapes (from PyTorch model)
         if len(prediction.shape) == 4:
@@ -274,37 +479,26 @@ class ImageProcessingService:
             # Already (H, W)
             pass
         else:
-            print(f"❌ Unexpected prediction shape: {prediction.shape}")
+            logger.error("Unexpected prediction shape: %s", prediction.shape)
             return None
         
-        print(f"🔍 Final prediction shape: {prediction.shape}")
-        
         # Apply threshold (matches Swift app logic exactly)
         binary_mask = (prediction > threshold).astype(np.uint8) * 255
         
-        # DEBUG: Print non-black pixel count
-        non_black_pixels = (binary_mask > 0).sum()
-        total_pixels = binary_mask.size
-        percentage = (non_black_pixels / total_pixels) * 100
-        print(f"🎯 DUST DETECTION: {non_black_pixels:,} non-black pixels out of {total_pixels:,} ({percentage:.2f}%)")
+        # Pixel counts are full-array reductions: only when debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            non_black_pixels = cv2.countNonZero(binary_mask)
+            logger.debug("Dust detection: %d non-black pixels out of %d (%.2f%%)",
+                         non_black_pixels, binary_mask.size, 100.0 * non_black_pixels / binary_mask.size)
         
         # Convert to PIL Image
         mask_image = Image.fromarray(binary_mask, mode='L')
         
-        print(f"🔍 Created mask size: {mask_image.size}")
-        
         # Resize to original image size if needed
         if mask_image.size != original_size:
-            print(f"🔍 Resizing mask from {mask_image.size} to {original_size}")
             mask_image = mask_image.resize(original_size, Image.Resampling.NEAREST)
-            
-            # DEBUG: Re-check after resize
-            final_mask_array = np.array(mask_image)
-            final_non_black = (final_mask_array > 0).sum()
-            final_percentage = (final_non_black / final_mask_array.size) * 100
-            print(f"🎯 FINAL DUST MASK: {final_non_black:,} non-black pixels ({final_percentage:.2f}%)")
         
-        print(f"✅ Binary mask created: {mask_image.size}")
+        logger.debug("Binary mask created: %s", mask_image.size)
         return mask_image
     
     @staticmethod
@@ -319,14 +513,29 @@ class ImageProcessingService:
         # Apply dilation
         dilated = cv2.dilate(mask_np, kernel, iterations=1)
         
-        print(f"🔍 Dilated mask with {kernel_size}x{kernel_size} kernel")
-        
         return Image.fromarray(dilated, mode='L')
     
     @staticmethod
-    def blend_images(original: Image.Image, inpainted: Image.Image, 
-                    mask: Image.Image) -> Image.Image:
-        """Blend original and inpainted images using mask"""
+    def is_binary_mask(mask) -> bool:
+        """Return True when every mask pixel is either 0 or 255 (no soft edges)."""
+        if isinstance(mask, Image.Image):
+            mask = mask.convert('L')
+        mask_np = np.ascontiguousarray(mask)
+        return cv2.countNonZero(cv2.inRange(mask_np, 1, 254)) == 0
+    
+    @staticmethod
+    def blend_images(original: Union[Image.Image, np.ndarray], inpainted: Union[Image.Image, np.ndarray],
+                    mask: Image.Image) -> Union[Image.Image, np.ndarray]:
+        """Blend original and inpainted images using mask.
+
+        Only the bounding box of the mask's non-zero pixels is blended; everything
+        outside it is the original untouched. RGB arrays (8 or 16-bit) are blended
+        in their own dtype and returned as arrays.
+        """
+        if isinstance(original, np.ndarray):
+            mask_np = np.asarray(mask.convert('L'))
+            return ImageProcessingService._blend_arrays(original, inpainted, mask_np, original.copy())
+
         # Ensure all images are same size and mode
         original = original.convert('RGB')
         inpainted = inpainted.convert('RGB')
@@ -338,110 +547,334 @@ class ImageProcessingService:
         if mask.size != original.size:
             mask = mask.resize(original.size, Image.NEAREST)
         
-        # Convert to numpy arrays
-        orig_np = np.array(original, dtype=np.float32)
-        inpaint_np = np.array(inpainted, dtype=np.float32)
-        mask_np = np.array(mask, dtype=np.float32) / 255.0
-        
-        # Expand mask to 3 channels
-        mask_3d = np.stack([mask_np] * 3, axis=2)
-        
-        # Blend: use inpainted where mask is white, original elsewhere
-        blended = orig_np * (1 - mask_3d) + inpaint_np * mask_3d
+        result = np.array(original)
+        ImageProcessingService._blend_arrays(result, np.asarray(inpainted), np.asarray(mask), result)
+        return Image.fromarray(result)
+
+    @staticmethod
+    def _blend_arrays(original: np.ndarray, inpainted: np.ndarray, mask_np: np.ndarray,
+                      out: np.ndarray) -> np.ndarray:
+        """Blend inpainted over original into out, touching only the mask's bounding box.
+
+        out may alias original or inpainted; no full-frame float copy is made.
+        """
+        x, y, w, h = cv2.boundingRect(mask_np)
+        if w == 0 or h == 0:
+            if out is not original:
+                np.copyto(out, original)
+            return out
         
-        # Convert back to PIL
-        result = Image.fromarray(np.clip(blended, 0, 255).astype(np.uint8))
+        roi = (slice(y, y + h), slice(x, x + w))
+        mask_roi = mask_np[roi]
+        out_roi = out[roi]
+        orig_roi = original[roi]
+        inpaint_roi = inpainted[roi]
+        if out is not original:
+            np.copyto(out_roi, orig_roi, where=(mask_roi == 0)[:, :, None])
+        if out is not inpainted:
+            np.copyto(out_roi, inpaint_roi, where=(mask_roi == 255)[:, :, None])
         
-        print(f"✅ Images blended successfully")
-        return result
+        # Soft edge pixels are the only ones that need float math
+        ys, xs = np.nonzero((mask_roi > 0) & (mask_roi < 255))
+        if len(ys):
+            max_value = np.iinfo(out.dtype).max
+            alpha = mask_roi[ys, xs].astype(np.float32)[:, None] / 255.0
+            blended = orig_roi[ys, xs].astype(np.float32) * (1 - alpha) + inpaint_roi[ys, xs].astype(np.float32) * alpha
+            out_roi[ys, xs] = np.clip(blended, 0, max_value).astype(out.dtype)
+        return out
+
+    @staticmethod
+    def feather_mask(mask: Image.Image, feather_radius: int = 3) -> Image.Image:
+        """Feather the inner edge of a binary (dilated) mask for seamless compositing.
+
+        The distance transform runs per mask component over its padded bounding box,
+        so only the area around specks is touched. Pixels at least feather_radius
+        from the mask edge stay at 255; the edge ramps down toward 0.
+        """
+        mask_np = np.array(mask.convert('L'))
+        if feather_radius <= 0:
+            return Image.fromarray(mask_np, mode='L')
+        _, bin_img = cv2.threshold(mask_np, 127, 255, cv2.THRESH_BINARY)
+        contours, _ = cv2.findContours(bin_img, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        h, w = bin_img.shape
+        feathered = bin_img.copy()
+        for cnt in contours:
+            x, y, cw, ch = cv2.boundingRect(cnt)
+            # Pad by one pixel so the zero ring around the component is included
+            x0, y0 = max(0, x - 1), max(0, y - 1)
+            x1, y1 = min(w, x + cw + 1), min(h, y + ch + 1)
+            dist = cv2.distanceTransform(bin_img[y0:y1, x0:x1], cv2.DIST_L2, 3)
+            ramp = np.minimum(dist * (255.0 / feather_radius), 255).astype(np.uint8)
+            # Overlapping boxes: the smallest distance seen is the closest to the true edge
+            np.minimum(feathered[y0:y1, x0:x1], ramp, out=feathered[y0:y1, x0:x1])
+        logger.debug("Feathered %d mask components (radius=%d)", len(contours), feather_radius)
+        return Image.fromarray(feathered, mode='L')
 
     @staticmethod
-    def filter_mask_by_brightness_and_color(mask: Image.Image, original: Image.Image, min_brightness: int = 180, max_color_diff: int = 40) -> Image.Image:
+    def composite_inpainted(original: Union[Image.Image, np.ndarray], inpainted: Union[Image.Image, np.ndarray],
+                            mask: Image.Image, inpaint_honors_mask: bool = True) -> Union[Image.Image, np.ndarray]:
+        """Put an inpainting result back over the original.
+
+        cv2.inpaint leaves every pixel outside the mask untouched, so for a binary
+        mask the blend is a no-op and the inpainted image is returned directly.
+        Soft masks, or inpainters that repaint the whole frame (LaMa), go through
+        blend_images, which only touches the mask's support.
+        """
+        same_size = ImageProcessingService.image_size(inpainted) == ImageProcessingService.image_size(original) == mask.size
+        if inpaint_honors_mask and same_size and ImageProcessingService.is_binary_mask(mask):
+            logger.debug("Blend skipped: binary mask already honored by inpainting")
+            return inpainted
+        if inpaint_honors_mask and same_size and isinstance(inpainted, np.ndarray):
+            # Outside the mask the inpainted array already equals the original: blend in place
+            return ImageProcessingService._blend_arrays(original, inpainted, np.asarray(mask.convert('L')), inpainted)
+        return ImageProcessingService.blend_images(original, inpainted, mask)
+
+    @staticmethod
+    def filter_mask_by_brightness_and_color(mask: Image.Image, original: Union[Image.Image, np.ndarray], min_brightness: int = 180, max_color_diff: int = 40) -> Image.Image:
         """
         Keep only mask pixels where the original image is above min_brightness (0-255)
         and is not strongly colored.
         Color neutrality test now uses the MAX channel difference instead of SUM so a threshold 0..255 is intuitive.
+        Thresholds stay on the 0-255 scale for 16-bit arrays; they are scaled to the array's range.
         If (min_brightness <= 0 and max_color_diff >= 255) we skip filtering (acts as OFF).
         """
         # Direct pass-through when filter effectively disabled
         if min_brightness <= 0 and max_color_diff >= 255:
-            print("🎨 filter_mask_by_brightness_and_color: disabled (passthrough)")
+            logger.debug("filter_mask_by_brightness_and_color: disabled (passthrough)")
             return mask
         mask_np = np.array(mask.convert('L'))
-        orig_np = np.array(original.convert('RGB'))
-        gray = orig_np.mean(axis=2)
-        # Use max difference between any two channels (range 0..255)
-        diff_rg = np.abs(orig_np[:, :, 0] - orig_np[:, :, 1])
-        diff_gb = np.abs(orig_np[:, :, 1] - orig_np[:, :, 2])
-        diff_rb = np.abs(orig_np[:, :, 0] - orig_np[:, :, 2])
-        color_diff = np.maximum.reduce([diff_rg, diff_gb, diff_rb])  # 0..255
-        keep = (gray >= min_brightness) & (color_diff <= max_color_diff)
+        orig_np = original if isinstance(original, np.ndarray) else np.asarray(original.convert('RGB'))
+        scale = 257 if orig_np.dtype == np.uint16 else 1
+        # Integer channel sum instead of a float mean: mean >= b  <=>  sum >= 3b
+        channel_sum = orig_np.sum(axis=2, dtype=np.uint32)
+        # Use max difference between any two channels (range 0..255, without uint wraparound)
+        r, g, b = cv2.split(orig_np)
+        color_diff = cv2.max(cv2.max(cv2.absdiff(r, g), cv2.absdiff(g, b)), cv2.absdiff(r, b))
+        keep = (channel_sum >= 3 * min_brightness * scale) & (color_diff <= max_color_diff * scale)
         filtered = np.where(keep, mask_np, 0).astype(np.uint8)
-        print(f"🎨 filter_mask_by_brightness_and_color: min_brightness={min_brightness}, max_color_diff={max_color_diff}, before={(mask_np>0).sum()}, after={(filtered>0).sum()}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("filter_mask_by_brightness_and_color: min_brightness=%d, max_color_diff=%d, before=%d, after=%d",
+                         min_brightness, max_color_diff, cv2.countNonZero(mask_np), cv2.countNonZero(filtered))
         return Image.fromarray(filtered, mode='L')
 
+    @staticmethod
+    def inpaint_cv2(image: Union[Image.Image, np.ndarray], mask: Image.Image, radius: int = 5) -> Union[Image.Image, np.ndarray]:
+        """Single-pass TELEA inpainting.
+
+        PIL images are inpainted as 8-bit RGB. RGB arrays keep their dtype and are
+        only inpainted over the mask's padded bounding box, into a single output copy.
+        """
+        mask_np = np.asarray(mask.convert('L'))
+        if not isinstance(image, np.ndarray):
+            image_np = np.array(image.convert('RGB'))
+            result = cv2.inpaint(image_np, mask_np, inpaintRadius=radius, flags=cv2.INPAINT_TELEA)
+            return Image.fromarray(result)
+        
+        result = image.copy()
+        x, y, w, h = cv2.boundingRect(mask_np)
+        if w == 0 or h == 0:
+            return result
+        pad = radius + 2
+        img_h, img_w = mask_np.shape
+        x0, y0 = max(0, x - pad), max(0, y - pad)
+        x1, y1 = min(img_w, x + w + pad), min(img_h, y + h + pad)
+        result[y0:y1, x0:x1] = ImageProcessingService._inpaint_array(
+            image[y0:y1, x0:x1], mask_np[y0:y1, x0:x1], radius)
+        return result
+
+    @staticmethod
+    def _inpaint_array(image_np: np.ndarray, mask_np: np.ndarray, radius: int) -> np.ndarray:
+        """TELEA on an RGB array of any dtype cv2 accepts.
+
+        cv2.inpaint only takes 16-bit data one channel at a time, so non-uint8
+        arrays are inpainted per channel.
+        """
+        mask_np = np.ascontiguousarray(mask_np)
+        if image_np.dtype == np.uint8:
+            return cv2.inpaint(np.ascontiguousarray(image_np), mask_np, inpaintRadius=radius, flags=cv2.INPAINT_TELEA)
+        result = np.empty_like(image_np)
+        for c in range(image_np.shape[2]):
+            channel = np.ascontiguousarray(image_np[:, :, c])
+            result[:, :, c] = cv2.inpaint(channel, mask_np, inpaintRadius=radius, flags=cv2.INPAINT_TELEA)
+        return result
+
+    @staticmethod
+    def inpaint_multiscale(image: Union[Image.Image, np.ndarray], mask: Image.Image, radius: int = 5,
+                           large_area: int = 400, coarse_size: int = 32,
+                           refine_radius: int = 2) -> Union[Image.Image, np.ndarray]:
+        """Inpaint with a pyramid for large blotches.
+
+        Components smaller than large_area pixels get the usual single-pass TELEA.
+        Each large component is cropped with some context and downsampled until it
+        is about coarse_size pixels across. It is filled there, then carried back up
+        one level at a time: the upsampled fill seeds the mask interior and only a
+        refine_radius band along the mask edge is re-inpainted at each level. The
+        cost follows the blotch's area at the coarse level, not at full resolution.
+        """
+        is_pil = not isinstance(image, np.ndarray)
+        image_np = np.array(image.convert('RGB')) if is_pil else image
+        mask_np = np.asarray(mask.convert('L'))
+        _, bin_img = cv2.threshold(mask_np, 127, 255, cv2.THRESH_BINARY)
+        contours, _ = cv2.findContours(bin_img, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        
+        img_h, img_w = bin_img.shape
+        result = image_np.copy()
+        small_mask = bin_img.copy()
+        large = 0
+        for cnt in contours:
+            if cv2.contourArea(cnt) < large_area:
+                continue
+            large += 1
+            x, y, cw, ch = cv2.boundingRect(cnt)
+            levels = int(np.clip(np.ceil(np.log2(max(cw, ch) / float(coarse_size))), 1, 6))
+            # Context around the blotch: radius << levels still leaves radius pixels at the coarsest level
+            pad = max(cw, ch) // 2 + (radius << levels)
+            x0, y0 = max(0, x - pad), max(0, y - pad)
+            x1, y1 = min(img_w, x + cw + pad), min(img_h, y + ch + pad)
+            
+            component = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+            cv2.drawContours(component, [cnt], -1, 255, thickness=cv2.FILLED, offset=(-x0, -y0))
+            
+            # Everything masked in the crop counts as unknown, so nearby dust doesn't leak in
+            images = [result[y0:y1, x0:x1]]
+            masks = [bin_img[y0:y1, x0:x1]]
+            for _ in range(levels):
+                images.append(cv2.pyrDown(images[-1]))
+                shrunk = cv2.resize(masks[-1], (images[-1].shape[1], images[-1].shape[0]), interpolation=cv2.INTER_AREA)
+                masks.append(np.where(shrunk > 0, 255, 0).astype(np.uint8))
+            
+            fill = ImageProcessingService._inpaint_array(images[-1], masks[-1], max(1, radius // 2))
+            band_kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+            for level in range(levels - 1, -1, -1):
+                level_h, level_w = masks[level].shape
+                upsampled = cv2.pyrUp(fill, dstsize=(level_w, level_h))
+                seeded = images[level].copy()
+                np.copyto(seeded, upsampled, where=(masks[level] > 0)[:, :, None])
+                # Re-inpaint only the band along the mask edge at this level
+                band = cv2.subtract(masks[level], cv2.erode(masks[level], band_kernel, iterations=refine_radius))
+                fill = ImageProcessingService._inpaint_array(seeded, band, refine_radius)
+            
+            np.copyto(result[y0:y1, x0:x1], fill, where=(component > 0)[:, :, None])
+            cv2.drawContours(small_mask, [cnt], -1, 0, thickness=cv2.FILLED)
+        
+        if cv2.countNonZero(small_mask):
+            result = ImageProcessingService.inpaint_cv2(result, Image.fromarray(small_mask, mode='L'), radius)
+        logger.debug("Multi-scale inpainting completed (%d large components, radius=%d)", large, radius)
+        return Image.fromarray(result) if is_pil else result
+
+    # MARK: - High bit-depth I/O
+
+    @staticmethod
+    def image_size(image: Union[Image.Image, np.ndarray]) -> Tuple[int, int]:
+        """(width, height) of a PIL image or an HxW[xC] array."""
+        if isinstance(image, np.ndarray):
+            return (image.shape[1], image.shape[0])
+        return image.size
+
+    @staticmethod
+    def open_image(path: str) -> Union[Image.Image, np.ndarray]:
+        """Open an image for processing.
+
+        16-bit TIFFs come back as uint16 RGB arrays (PIL would truncate them to 8-bit),
+        grayscale ones included; everything else is returned as an RGB PIL image.
+        """
+        with Image.open(path) as im:
+            # Image.open only reads the header, so 8-bit files are decoded once, by PIL
+            if not _is_high_bit_depth(im):
+                return im.convert('RGB')
+        data = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+        if data is not None and data.dtype == np.uint16:
+            if data.ndim == 2:
+                return cv2.cvtColor(data, cv2.COLOR_GRAY2RGB)
+            if data.shape[2] == 4:
+                return cv2.cvtColor(data, cv2.COLOR_BGRA2RGB)
+            return cv2.cvtColor(data, cv2.COLOR_BGR2RGB, dst=data)
+        with Image.open(path) as im:
+            return im.convert('RGB')
+
+    @staticmethod
+    def is_grayscale_scan(path: str) -> bool:
+        """True for single-channel 16-bit TIFFs, from the header alone.
+
+        open_image expands them to RGB for processing; pass grayscale=True to
+        save_image to write the result back as one channel.
+        """
+        with Image.open(path) as im:
+            return _is_high_bit_depth(im) and len(im.getbands()) == 1
+
+    @staticmethod
+    def open_scan(path: str) -> Tuple[Image.Image, Optional[np.ndarray]]:
+        """Decode a scan for the editor: (8-bit display image, 16-bit RGB array or None).
+
+        16-bit TIFFs keep a full-depth copy for processing and export.
+        """
+        if path.lower().endswith(('.tif', '.tiff')):
+            loaded = ImageProcessingService.open_image(path)
+            image_16bit = loaded if isinstance(loaded, np.ndarray) else None
+            return ImageProcessingService.to_display_image(loaded), image_16bit
+        image = Image.open(path)
+        image.load()
+        return image, None
+
+    @staticmethod
+    def to_display_image(image: Union[Image.Image, np.ndarray]) -> Image.Image:
+        """8-bit RGB PIL view of an image for display and previews."""
+        if not isinstance(image, np.ndarray):
+            return image
+        if image.dtype == np.uint16:
+            return Image.fromarray((image >> 8).astype(np.uint8))
+        return Image.fromarray(image)
+
+    @staticmethod
+    def save_image(image: Union[Image.Image, np.ndarray], path: str, quality: int = 95,
+                   grayscale: bool = False) -> None:
+        """Save a processed image; 16-bit arrays are written as 16-bit TIFFs.
+
+        With grayscale, a 16-bit RGB array is written as a single channel, as
+        its source was (see is_grayscale_scan).
+        """
+        if isinstance(image, np.ndarray) and image.dtype == np.uint16:
+            ext = os.path.splitext(path)[1].lower()
+            if ext not in ('.tif', '.tiff'):
+                raise ValueError(f"16-bit output must be written as TIFF, got '{ext}'")
+            code = cv2.COLOR_RGB2GRAY if grayscale else cv2.COLOR_RGB2BGR
+            ok, encoded = cv2.imencode(ext, cv2.cvtColor(image, code))
+            if not ok:
+                raise IOError(f"Failed to encode 16-bit TIFF: {path}")
+            encoded.tofile(path)
+            return
+        image = ImageProcessingService.to_display_image(image)
+        if path.lower().endswith(('.jpg', '.jpeg')):
+            image.save(path, 'JPEG', quality=quality)
+        else:
+            image.save(path)
+
 
 class BrushTools:
-    """Tools for brush and eraser operations on masks"""
+    """Tools for brush and eraser operations on masks.
+
+    One-shot PIL wrappers around BrushEngine; interactive painting keeps a
+    BrushEngine alive for the whole stroke instead of converting per event.
+    """
     
     @staticmethod
     def apply_circular_brush(mask: Image.Image, center: Tuple[float, float], 
                            radius: int, is_erasing: bool = True) -> Image.Image:
         """Apply circular brush stroke to mask"""
-        # Convert to numpy for processing
-        mask_np = np.array(mask.convert('L'))
-        h, w = mask_np.shape
-        
-        # Convert center to integer coordinates
-        cx, cy = int(center[0]), int(center[1])
-        
-        # Bounds check
-        if cx < 0 or cx >= w or cy < 0 or cy >= h:
+        engine = BrushEngine.from_image(mask)
+        if engine.stamp(center, radius, is_erasing) is None:
             return mask
-        
-        # Create circular brush
-        y, x = np.ogrid[:h, :w]
-        mask_circle = (x - cx) ** 2 + (y - cy) ** 2 <= radius ** 2
-        
-        # Apply brush
-        if is_erasing:
-            mask_np[mask_circle] = 0  # Erase (set to black)
-        else:
-            mask_np[mask_circle] = 255  # Add dust (set to white)
-        
-        return Image.fromarray(mask_np, mode='L')
+        return Image.fromarray(engine.buffer, mode='L')
     
     @staticmethod
     def interpolated_stroke(mask: Image.Image, start_point: Tuple[float, float],
                           end_point: Tuple[float, float], radius: int, 
                           is_erasing: bool = True) -> Image.Image:
         """Apply interpolated stroke between two points"""
-        # Calculate distance and steps
-        dx = end_point[0] - start_point[0]
-        dy = end_point[1] - start_point[1]
-        distance = np.sqrt(dx * dx + dy * dy)
-        
-        if distance < 1.0:
-            # Single point application
-            return BrushTools.apply_circular_brush(mask, end_point, radius, is_erasing)
-        
-        # Calculate number of steps based on brush size
-        spacing = max(1.0, radius * 0.25)
-        steps = max(1, int(distance / spacing))
-        
-        # Apply brush at interpolated points
-        current_mask = mask
-        for i in range(steps + 1):
-            t = i / steps if steps > 0 else 0
-            interp_point = (
-                start_point[0] + t * dx,
-                start_point[1] + t * dy
-            )
-            current_mask = BrushTools.apply_circular_brush(
-                current_mask, interp_point, radius, is_erasing
-            )
-        
-        return current_mask
+        engine = BrushEngine.from_image(mask)
+        if engine.stroke(start_point, end_point, radius, is_erasing) is None:
+            return mask
+        return Image.fromarray(engine.buffer, mode='L')
 
 
 class ProcessingTask:
@@ -467,29 +900,23 @@ class ProcessingTask:
     def _run(self):
         """Run the task in background thread"""
         try:
-            print(f"🧵 ProcessingTask thread started")
             start_time = time.time()
             self.result = self.target_func(*self.args, **self.kwargs)
             end_time = time.time()
             
-            print(f"🧵 ProcessingTask completed, result type: {type(self.result)}")
+            logger.debug("ProcessingTask %s completed in %.2fs", getattr(self.target_func, '__name__', self.target_func),
+                         end_time - start_time)
             self.completed = True
             
             if self.callback:
-                print(f"🧵 Calling completion callback...")
                 self.callback(self.result, end_time - start_time)
-            else:
-                print(f"🧵 No callback provided")
         except Exception as e:
-            print(f"🧵 ProcessingTask error: {e}")
+            logger.error("ProcessingTask error: %s", e)
             self.error = e
             self.completed = True
             
             if self.error_callback:
-                print(f"🧵 Calling error callback...")
                 self.error_callback(e)
-            else:
-                print(f"🧵 No error callback provided")
     
     def is_running(self) -> bool:
         """Check if task is still running"""
@@ -8,6 +8,7 @@ Main application entry point.
 import customtkinter as ctk
 from tkinterdnd2 import TkinterDnD
 from pathlib import Path
+import logging
 import sys
 from typing import Optional, List, Tuple
 from PIL import Image
@@ -35,8 +36,10 @@ except Exception:
 from dust_removal_state import DustRemovalState, ProcessingMode, ToolMode
 from ui_components import SpotlessSidebar, SpotlessToolbar, ZoomControls
 from professional_canvas import SpotlessCanvas
-from image_processing import ImageProcessingService, LamaInpainter, BrushTools, ProcessingTask, UNet
+from image_processing import ImageProcessingService, LamaSession, BrushTools, ProcessingTask, UNet
 from simple_modern_theme import SimpleModernTheme
+from spotless_logging import configure_logging
+from session_memory import Artifact
 try:
     from gl_image_view import GLImageView, OPENGL_AVAILABLE, GL_IMPORT_ERROR
 except Exception as e:
@@ -53,6 +56,8 @@ import state_and_model_management
 import ui_callbacks
 import spotless_batch
 
+logger = logging.getLogger(__name__)
+
 # Set appearance and theme
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("blue")
@@ -60,6 +65,12 @@ ctk.set_default_color_theme("blue")
 class SpotlessFilmModern:
     """Modern professional Spotless Film application with macOS-style UI"""
     
+    # Display copies are counted in the session memory budget and rebuilt if evicted
+    preview_selected_image = Artifact("preview_selected", rebuild="rebuild_selected_preview")
+    preview_processed_image = Artifact("preview_processed", rebuild="rebuild_processed_preview")
+    _split_resized_original = Artifact("split_original")
+    _split_resized_processed = Artifact("split_processed")
+    
     def __init__(self):
         # Create main window with drag-and-drop support
         self.root = TkinterDnD.Tk()
@@ -69,6 +80,7 @@ class SpotlessFilmModern:
         
         # Initialize state
         self.state = DustRemovalState(self.root)
+        self.memory = self.state.memory
         # Preview (downscaled) images for faster display
         self.preview_selected_image = None
         self.preview_processed_image = None
@@ -77,6 +89,9 @@ class SpotlessFilmModern:
         self._split_resized_original = None
         self._split_resized_processed = None
         self._split_cached_signature = None
+        # Roll of frames being cleaned one after another, if one is open
+        self.frame_session = None
+        self._pending_frame: Optional[int] = None
         
         # Initialize split view position
         self.split_position = 0.5  # Default to middle
@@ -85,12 +100,13 @@ class SpotlessFilmModern:
         # self.theme = SimpleModernTheme(self.root)
         
         # Processing components
-        self.lama_inpainter: Optional[LamaInpainter] = None
+        self.lama_inpainter: Optional[LamaSession] = None
         self.processing_task: Optional[ProcessingTask] = None
         
         # Flags
         self._importing = False
         self._batch_running = False
+        self._watch_stop_event: Optional[threading.Event] = None
         
         # Callback dictionary for UI components
         self.callbacks = {
@@ -113,7 +129,7 @@ class SpotlessFilmModern:
         # Setup keyboard shortcuts
         ui_callbacks.setup_keyboard_shortcuts(self)
         
-        print("✨ Spotless Film (Modern Professional) initialized")
+        logger.info("Spotless Film (Modern Professional) initialized")
     
     # UI methods now delegated to ui_setup
     def setup_ui(self):
@@ -142,6 +158,8 @@ class SpotlessFilmModern:
         ui_setup.show_welcome_message(self)
     def update_ui(self):
         ui_setup.update_ui(self)
+    def update_frame_controls(self):
+        ui_setup.update_frame_controls(self)
 
     # Canvas event handlers
     def on_canvas_resize(self, event):
@@ -158,6 +176,8 @@ class SpotlessFilmModern:
         canvas_event_handlers.apply_eraser_at_point(self, point, canvas_width, canvas_height)
     def apply_brush_at_point(self, point, canvas_width, canvas_height):
         canvas_event_handlers.apply_brush_at_point(self, point, canvas_width, canvas_height)
+    def convert_to_low_res_coordinates(self, point, low_res_size):
+        return canvas_event_handlers.convert_to_low_res_coordinates(self, point, low_res_size)
 
     # Image display
     def display_image(self, image=None):
@@ -178,6 +198,10 @@ class SpotlessFilmModern:
         return image_display.create_overlay_layer(self, display_size)
     def build_preview_image(self, image, long_side: int = 2048):
         return image_display.build_preview_image(self, image, long_side)
+    def rebuild_selected_preview(self):
+        return image_display.rebuild_selected_preview(self)
+    def rebuild_processed_preview(self):
+        return image_display.rebuild_processed_preview(self)
 
     # File operations
     def safe_import_image(self):
@@ -188,6 +212,14 @@ class SpotlessFilmModern:
         file_operations.load_image(self, file_path)
     def handle_file_drop(self, files: List[str]):
         file_operations.handle_file_drop(self, files)
+    def open_frame_session_dialog(self):
+        file_operations.open_frame_session_dialog(self)
+    def open_frame_session(self, paths: List[str]):
+        file_operations.open_frame_session(self, paths)
+    def next_frame(self):
+        file_operations.next_frame(self)
+    def previous_frame(self):
+        file_operations.previous_frame(self)
     def export_image(self):
         file_operations.export_image(self)
     def export_full_resolution(self):
@@ -200,7 +232,7 @@ class SpotlessFilmModern:
         processing_operations.remove_dust(self)
     def perform_dust_removal(self) -> Image.Image:
         return processing_operations.perform_dust_removal(self)
-    def perform_cv2_inpainting(self, image: Image.Image, mask: Image.Image) -> Image.Image:
+    def perform_cv2_inpainting(self, image, mask: Image.Image):
         return processing_operations.perform_cv2_inpainting(self, image, mask)
 
     # State and model management
@@ -256,6 +288,8 @@ class SpotlessFilmModern:
         ui_callbacks.toggle_compare_mode(self)
     def undo_mask_change(self):
         ui_callbacks.undo_mask_change(self)
+    def redo_mask_change(self):
+        ui_callbacks.redo_mask_change(self)
     def on_threshold_changed(self, value):
         ui_callbacks.on_threshold_changed(self, value)
     def set_view_mode(self, mode: ProcessingMode):
@@ -272,6 +306,12 @@ class SpotlessFilmModern:
         spotless_batch.batch_process_folder_dialog(self)
     def _batch_process_folder_worker(self, root_folder: str, progress_window, stop_event: threading.Event, batch_threshold: float):
         spotless_batch._batch_process_folder_worker(self, root_folder, progress_window, stop_event, batch_threshold)
+    def choose_batch_output_folder(self):
+        spotless_batch.choose_batch_output_folder(self)
+    def toggle_watch_folder(self):
+        spotless_batch.toggle_watch_folder(self)
+    def _watch_folder_worker(self, folder: str, output_dir: Optional[str], stop_event: threading.Event):
+        spotless_batch._watch_folder_worker(self, folder, output_dir, stop_event)
     def on_batch_threshold_changed(self, value):
         self.batch_threshold_value_label.configure(text=f"{float(value):.4f}")
         self.state.batch_threshold = float(value)
@@ -281,5 +321,9 @@ class SpotlessFilmModern:
         self.root.mainloop()
 
 if __name__ == "__main__":
+    # Needed for the batch process pool in frozen (PyInstaller) builds
+    import multiprocessing
+    multiprocessing.freeze_support()
+    configure_logging()
     app = SpotlessFilmModern()
     app.run()
\ No newline at end of file
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Mask Undo History
+
+Undo/redo for dust mask edits that stores only the tiles a stroke changed,
+zlib-compressed, under a byte budget, instead of a full copy of the mask per
+step. History size follows how much the user edits, not how big the scan is.
+"""
+
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from brush_engine import Rect, union_rect
+
+TILE_SIZE = 256
+DEFAULT_BUDGET_BYTES = 64 * 1024 * 1024
+
+
+@dataclass
+class MaskEdit:
+    """Compressed contents of the tiles an edit touched, for swapping back in"""
+    mask_size: Tuple[int, int]
+    tiles: List[Tuple[Rect, bytes]] = field(default_factory=list)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(data) for _, data in self.tiles)
+
+    @property
+    def rect(self) -> Optional[Rect]:
+        rect = None
+        for box, _ in self.tiles:
+            rect = union_rect(rect, box)
+        return rect
+
+
+def _tile_boxes(box: Rect, size: Tuple[int, int]):
+    """Tile-aligned boxes covering box, clipped to a mask of the given size"""
+    w, h = size
+    x0, y0, x1, y1 = box
+    for ty in range(max(0, y0) // TILE_SIZE, (min(h, y1) - 1) // TILE_SIZE + 1):
+        for tx in range(max(0, x0) // TILE_SIZE, (min(w, x1) - 1) // TILE_SIZE + 1):
+            yield (tx * TILE_SIZE, ty * TILE_SIZE, min(w, (tx + 1) * TILE_SIZE), min(h, (ty + 1) * TILE_SIZE))
+
+
+def _swap_tiles(mask: Image.Image, edit: MaskEdit) -> MaskEdit:
+    """Write edit's tiles into mask in place; returns an edit holding what they replaced"""
+    inverse = MaskEdit(mask.size)
+    for box, data in edit.tiles:
+        inverse.tiles.append((box, zlib.compress(mask.crop(box).tobytes(), 1)))
+        tile = Image.frombytes('L', (box[2] - box[0], box[3] - box[1]), zlib.decompress(data))
+        mask.paste(tile, box[:2])
+    return inverse
+
+
+class MaskHistory:
+    """Undo and redo stacks of tile deltas for an 'L' mask edited in place.
+
+    Callers call capture(mask, box) before changing a region of the mask and
+    commit() when the edit (a whole brush stroke) ends. The first capture of a
+    tile keeps its pre-edit bytes, so repeated dabs over one spot cost nothing
+    extra. Oldest steps are dropped once both stacks together exceed max_bytes.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_BUDGET_BYTES):
+        self.max_bytes = max_bytes
+        self._undo: List[MaskEdit] = []
+        self._redo: List[MaskEdit] = []
+        self._pending: Dict[Rect, bytes] = {}
+        self._pending_size: Optional[Tuple[int, int]] = None
+
+    def capture(self, mask: Image.Image, box: Rect) -> None:
+        """Remember the current contents of box's tiles, unless already captured this edit"""
+        if self._pending_size != mask.size:
+            self._pending.clear()
+            self._pending_size = mask.size
+        for tile in _tile_boxes(box, mask.size):
+            if tile not in self._pending:
+                self._pending[tile] = mask.crop(tile).tobytes()
+
+    def commit(self) -> bool:
+        """Close the current edit as one undo step; False if nothing was captured"""
+        if not self._pending:
+            return False
+        edit = MaskEdit(self._pending_size)
+        edit.tiles = [(box, zlib.compress(data, 1)) for box, data in self._pending.items()]
+        self._pending.clear()
+        self._undo.append(edit)
+        self._redo.clear()
+        self._trim()
+        return True
+
+    def undo(self, mask: Image.Image) -> Optional[Rect]:
+        """Restore the last edit into mask; returns the region changed"""
+        return self._step(mask, self._undo, self._redo)
+
+    def redo(self, mask: Image.Image) -> Optional[Rect]:
+        """Re-apply the last undone edit into mask; returns the region changed"""
+        return self._step(mask, self._redo, self._undo)
+
+    def _step(self, mask: Image.Image, source: List[MaskEdit], target: List[MaskEdit]) -> Optional[Rect]:
+        while source:
+            edit = source.pop()
+            # Edits made on a mask since replaced at another size (new image) can't apply
+            if edit.mask_size == mask.size:
+                target.append(_swap_tiles(mask, edit))
+                return edit.rect
+        return None
+
+    def _trim(self) -> None:
+        while self._undo and self.nbytes > self.max_bytes:
+            self._undo.pop(0)
+        while self._redo and self.nbytes > self.max_bytes:
+            self._redo.pop(0)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(edit.nbytes for edit in self._undo) + sum(edit.nbytes for edit in self._redo)
+
+    @property
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    @property
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def clear(self) -> None:
+        self._undo.clear()
+        self._redo.clear()
+        self._pending.clear()
+        self._pending_size = None
+
+    def __len__(self) -> int:
+        return len(self._undo)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Model File Lookup
+
+Locates the U-Net weights for both the GUI and the headless CLI, so it must
+not import anything that needs Tk.
+"""
+
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def find_model_files(app=None) -> dict:
+    """Find model files - prioritize the specific weights file from main.ipynb"""
+    model_paths = {'unet': None, 'lama': None}
+    
+    # First, look for the exact weights file mentioned in main.ipynb
+    exact_weight_path = Path(__file__).parent / "weights" / "v5_bce_unet_epoch30.pth"
+    if exact_weight_path.exists():
+        model_paths['unet'] = str(exact_weight_path)
+        logger.info("Found exact weights file: %s", exact_weight_path)
+        return model_paths
+    
+    # Fallback: search in common locations
+    search_dirs = [
+        Path(__file__).parent / "weights",
+        Path(__file__).parent / "checkpoints", 
+        Path.cwd() / "models",
+        Path.cwd() / "checkpoints",
+        Path.cwd() / "weights",
+        Path.cwd().parent / "models",
+        Path.cwd().parent / "checkpoints",
+    ]
+    
+    for search_dir in search_dirs:
+        if search_dir.exists():
+            logger.debug("Searching in: %s", search_dir)
+            # Look for U-Net models (prioritize v5 and v6 models from notebook)
+            for pattern in ["v5_*.pth", "v6_*.pth", "*unet*.pth", "*.pth"]:
+                unet_files = list(search_dir.glob(pattern))
+                if unet_files:
+                    # Sort by name to get latest version
+                    unet_files.sort(reverse=True)
+                    model_paths['unet'] = str(unet_files[0])
+                    logger.info("Found weights file: %s", unet_files[0])
+                    break
+            
+            if model_paths['unet']:
+                break
+    
+    return model_paths
@@ -1,29 +1,30 @@
+import logging
 import time
 import threading
 import numpy as np
 from PIL import Image
 from image_processing import ImageProcessingService, ProcessingTask
 from dust_removal_state import ToolMode, ProcessingMode
+from state_slices import SLICE_IMAGES, SLICE_MASK, SLICE_PROCESSING
 import gc
 
+logger = logging.getLogger(__name__)
+
 def detect_dust(app):
     """Detect dust in the selected image"""
-    print(f"🔍 Detect dust called")
-    print(f"🔍 Selected image: {app.state.selected_image is not None}")
-    print(f"🔍 U-Net model: {app.state.unet_model is not None}")
-    print(f"🔍 Is detecting: {app.state.processing_state.is_detecting}")
-    print(f"🔍 Is removing: {app.state.processing_state.is_removing}")
-    print(f"🔍 Can detect dust: {app.state.can_detect_dust}")
+    logger.debug("Detect dust: image=%s, model=%s, detecting=%s, removing=%s",
+                 app.state.selected_image is not None, app.state.unet_model is not None,
+                 app.state.processing_state.is_detecting, app.state.processing_state.is_removing)
     
     # Deselect active tools during generation for clarity
     app.state.set_tool_mode(ToolMode.NONE)
 
     if not app.state.can_detect_dust:
-        print("❌ Cannot detect dust - preconditions not met")
+        logger.warning("Cannot detect dust - preconditions not met")
         return
     
     app.state.processing_state.is_detecting = True
-    app.state.notify_observers()
+    app.state.notify_observers(SLICE_PROCESSING)
     
     def progress_callback(progress: float):
         app.root.after_idle(lambda: app.status_label.configure(
@@ -38,22 +39,17 @@ def detect_dust(app):
             # Create initial binary mask
             app.update_dust_mask_with_threshold()
             
-            # Store original mask for brush modifications
-            app.state.original_dust_mask = app.state.dust_mask.copy() if app.state.dust_mask else None
-            
-            # Create low-res mask for performance
-            app.state.create_low_res_mask()
+            # Keep the detected mask for brush modifications; shared until the first edit
+            app.state.keep_original_mask()
             
-            # Clear undo history and save initial state
+            # Clear undo history
             app.state.clear_mask_history()
-            if app.state.dust_mask:
-                app.state.save_mask_to_history()
             
             app.state.processing_state.is_detecting = False
             app.status_label.configure(text=f"Dust detected in {processing_time:.2f}s", text_color="green")
-            app.state.notify_observers()
+            app.state.notify_observers(SLICE_MASK, SLICE_PROCESSING)
             
-            print(f"✅ Dust detection completed in {processing_time:.2f}s")
+            logger.info("Dust detection completed in %.2fs", processing_time)
             
         except Exception as e:
             app.handle_processing_error(e, "dust detection")
@@ -64,19 +60,19 @@ def detect_dust(app):
     # Start processing task using the simple method (matches Swift macOS app)
     def detect_worker():
         try:
-            print("🔍 Starting dust detection...")
             start_time = time.time()
             
-            # Use the exact prediction method from main.ipynb
-            result = ImageProcessingService.predict_dust_mask(
-                app.state.unet_model,
-                app.state.selected_image,
-                threshold=0.5,  # Default threshold, will be adjustable
-                window_size=1024,
-                stride=512,
-                device=app.state.device,
-                progress_callback=progress_callback
-            )
+            # Use the exact prediction method from main.ipynb; one U-Net pass at a time (roll prefetch)
+            with app.state.inference_lock:
+                result = ImageProcessingService.predict_dust_mask(
+                    app.state.unet_model,
+                    app.state.source_image,
+                    threshold=0.5,  # Default threshold, will be adjustable
+                    window_size=1024,
+                    stride=512,
+                    device=app.state.device,
+                    progress_callback=progress_callback
+                )
             
             processing_time = time.time() - start_time
             completion_callback(result, processing_time)
@@ -91,18 +87,18 @@ def detect_dust(app):
 
 def remove_dust(app):
     """Remove dust using AI inpainting"""
-    print(f"🎯 Remove dust called - can_remove_dust: {app.state.can_remove_dust}")
-    print(f"🎯 State check - dust_mask: {app.state.dust_mask is not None}, is_detecting: {app.state.processing_state.is_detecting}, is_removing: {app.state.processing_state.is_removing}")
+    logger.debug("Remove dust: mask=%s, detecting=%s, removing=%s", app.state.dust_mask is not None,
+                 app.state.processing_state.is_detecting, app.state.processing_state.is_removing)
     
     if not app.state.can_remove_dust:
-        print("❌ Cannot remove dust - preconditions not met")
+        logger.warning("Cannot remove dust - preconditions not met")
         return
     
     # Toggle overlay visibility when starting removal, per requested UX
     try:
         app.toggle_overlay()
     except Exception as _e:
-        print(f"⚠️ Overlay toggle failed (non-blocking): {_e}")
+        logger.warning("Overlay toggle failed (non-blocking): %s", _e)
     
     # Deselect active tools when generating
     app.state.set_tool_mode(ToolMode.NONE)
@@ -112,7 +108,7 @@ def remove_dust(app):
         if app.preview_selected_image is not None and app.state.dust_mask is not None:
             # Build a preview-sized mask
             preview_size = app.preview_selected_image.size
-            preview_mask = app.state.dust_mask.resize(preview_size, Image.Resampling.NEAREST)
+            preview_mask = app.state.mask_for_size(preview_size)
             # Dilate at fixed radius 5 in preview scale
             preview_mask_dilated = ImageProcessingService.dilate_mask(preview_mask, kernel_size=5)
             # Inpaint once on preview
@@ -120,70 +116,61 @@ def remove_dust(app):
             app.preview_processed_image = preview_processed
             # Switch view for quick feedback
             app.state.set_processing_mode(ProcessingMode.SPLIT_SLIDER)
-            app.state.notify_observers()
-            print("🎯 Preview inpaint generated for instant feedback")
+            app.state.notify_observers(SLICE_IMAGES)
+            logger.debug("Preview inpaint generated for instant feedback")
             # Ensure active view updates immediately
             # Invalidate split cache so new preview is used
             app._split_cached_signature = None
             app.display_image()
     except Exception as e:
-        print(f"⚠️ Preview inpaint failed: {e}")
+        logger.warning("Preview inpaint failed: %s", e)
 
     app.state.processing_state.is_removing = True
-    app.state.notify_observers()
+    app.state.notify_observers(SLICE_PROCESSING)
     
     def completion_callback(result: Image.Image, processing_time: float):
         # Schedule GUI updates on main thread
         def update_ui():
             try:
-                print(f"🎯 Completion callback called with result: {type(result)}, time: {processing_time:.2f}s")
                 app.state.processed_image = result
-                print(f"🎯 Processed image set: {app.state.processed_image is not None}")
                 app.state.processing_state.processing_time = processing_time
                 app.state.processing_state.is_removing = False
                 
                 # Auto-switch to split view
-                print(f"🎯 Switching to SPLIT_SLIDER mode...")
                 app.state.set_processing_mode(ProcessingMode.SPLIT_SLIDER)
-                print(f"🎯 Current processing mode: {app.state.view_state.processing_mode}")
                 
                 app.status_label.configure(text=f"Dust removed in {processing_time:.2f}s", text_color="green")
                 
                 # Force multiple UI updates to ensure refresh
-                print(f"🎯 Forcing UI updates...")
-                app.state.notify_observers()
+                app.state.notify_observers(SLICE_IMAGES, SLICE_PROCESSING)
                 
                 # Force immediate display update with processed image
                 # Invalidate split cache to pick up new processed preview/full-res
                 try:
                     app.preview_processed_image = app.build_preview_image(app.state.processed_image)
                 except Exception as _e:
-                    print(f"⚠️ Failed to build processed preview: {_e}")
+                    logger.warning("Failed to build processed preview: %s", _e)
                 app._split_cached_signature = None
                 app.root.after_idle(lambda: app.display_image())
-                print(f"🎯 Direct display_image update scheduled")
                 
                 # Force window refresh
                 app.root.after_idle(lambda: app.root.update_idletasks())
-                print(f"🎯 Window refresh scheduled")
-                
-                print(f"✅ Dust removal completed in {processing_time:.2f}s")
+                logger.info("Dust removal completed in %.2fs", processing_time)
                 
             except Exception as e:
-                print(f"❌ Error in completion callback: {e}")
+                logger.exception("Error in completion callback")
                 app.handle_processing_error(e, "dust removal")
         
         app.root.after_idle(update_ui)
     
     def error_callback(error: Exception):
         def handle_error():
-            print(f"❌ Error callback called: {error}")
+            logger.error("Dust removal failed: %s", error)
             app.handle_processing_error(error, "dust removal")
         
         app.root.after_idle(handle_error)
     
     # Start processing task
-    print("🎯 Starting ProcessingTask...")
     app.processing_task = ProcessingTask(
         target_func=lambda: perform_dust_removal(app),
         callback=completion_callback,
@@ -191,17 +178,12 @@ def remove_dust(app):
     )
     
     app.processing_task.start()
-    print("🎯 ProcessingTask started")
 
 def perform_dust_removal(app) -> Image.Image:
     """Perform the actual dust removal process using CV2 inpainting"""
     gc.collect()
-    print(f"🎨 perform_dust_removal called")
-    print(f"🎨 Selected image available: {app.state.selected_image is not None}")
-    print(f"🎨 Dust mask available: {app.state.dust_mask is not None}")
     if not app.state.selected_image or not app.state.dust_mask:
         raise ValueError("Missing required components for dust removal")
-    print("🎨 Starting CV2 inpainting process...")
     base_mask = app.state.dust_mask
     if not getattr(app.state, 'remove_scratches', True):
         from image_processing import ImageProcessingService
@@ -209,29 +191,43 @@ def perform_dust_removal(app) -> Image.Image:
     if getattr(app.state, 'dust_brightness_color', True):
         from image_processing import ImageProcessingService
         base_mask = ImageProcessingService.filter_mask_by_brightness_and_color(
-            base_mask, app.state.selected_image, min_brightness=getattr(app.state,'min_brightness',180), max_color_diff=getattr(app.state,'max_color_diff',40))
-    print("🎨 Dilating mask...")
+            base_mask, app.state.source_image, min_brightness=getattr(app.state,'min_brightness',180), max_color_diff=getattr(app.state,'max_color_diff',40))
     from image_processing import ImageProcessingService
     dilated_mask = ImageProcessingService.dilate_mask(base_mask)
-    print("🎨 Converting image to RGB...")
-    image_rgb = app.state.selected_image.convert('RGB')
-    print("🎨 Performing CV2 inpainting...")
-    inpainted = perform_cv2_inpainting(app, image_rgb, dilated_mask)
-    print("🎨 Blending images...")
-    final_result = ImageProcessingService.blend_images(image_rgb, inpainted, dilated_mask)
+    if app.state.selected_image_16bit is not None:
+        # 16-bit scans stay uint16 through inpainting and compositing
+        image_rgb = app.state.selected_image_16bit
+    else:
+        image_rgb = app.state.selected_image.convert('RGB')
+    lama = app.state.lama_inpainter
+    use_lama = (getattr(app.state, 'use_lama', False) and lama is not None and lama.available
+                and app.state.selected_image_16bit is None)
+    if use_lama:
+        # LaMa repaints the whole frame, so the composite below must blend
+        logger.debug("Performing LaMa inpainting")
+        inpainted = lama.inpaint(image_rgb, dilated_mask)
+    else:
+        logger.debug("Performing CV2 inpainting")
+        inpainted = perform_cv2_inpainting(app, image_rgb, dilated_mask)
+    blend_mask = dilated_mask
+    if getattr(app.state, 'feather_edges', False):
+        blend_mask = ImageProcessingService.feather_mask(dilated_mask, getattr(app.state, 'feather_radius', 3))
+    final_result = ImageProcessingService.composite_inpainted(
+        image_rgb, inpainted, blend_mask, inpaint_honors_mask=not use_lama)
+    if isinstance(final_result, np.ndarray):
+        app.state.processed_image_16bit = final_result
+        final_result = ImageProcessingService.to_display_image(final_result)
     app.preview_processed_image = app.build_preview_image(final_result)
-    print("🎨 Dust removal process completed!")
     return final_result
 
-def perform_cv2_inpainting(app, image: Image.Image, mask: Image.Image) -> Image.Image:
-    """Perform single-pass CV2 TELEA inpainting (fast)."""
-    import cv2
-    
-    # Convert PIL images to numpy arrays
-    image_np = np.array(image.convert('RGB'))
-    mask_np = np.array(mask.convert('L'))
-    
-    print(f"🔍 Image shape: {image_np.shape}, Mask shape: {mask_np.shape}")
-    result = cv2.inpaint(image_np, mask_np, inpaintRadius=5, flags=cv2.INPAINT_TELEA)
-    print("✅ CV2 single-pass inpainting completed (radius=5)")
-    return Image.fromarray(result)
\ No newline at end of file
+def perform_cv2_inpainting(app, image, mask: Image.Image):
+    """Perform single-pass CV2 TELEA inpainting (fast).
+
+    Accepts a PIL image or an RGB array; 16-bit arrays are inpainted without
+    dropping to 8-bit and come back as arrays. With state.multiscale_inpaint set,
+    large blotches are filled through the multi-scale pyramid instead.
+    """
+    logger.debug("Inpainting image %s with mask %s", ImageProcessingService.image_size(image), mask.size)
+    if getattr(app.state, 'multiscale_inpaint', False):
+        return ImageProcessingService.inpaint_multiscale(image, mask, radius=5)
+    return ImageProcessingService.inpaint_cv2(image, mask, radius=5)
@@ -14,6 +14,7 @@ import numpy as np
 from typing import Optional, Callable, Tuple
 import math
 from dust_removal_state import DustRemovalState, ProcessingMode, ToolMode
+from state_slices import SLICE_IMAGES, SLICE_MASK, SLICE_VIEW
 from simple_modern_theme import SimpleModernColors
 
 
@@ -40,7 +41,8 @@ class SpotlessCanvas(tk.Frame):
         self.split_dragging = False
         
         self.setup_ui()
-        self.state.add_observer(self.update_canvas)
+        # Busy flags and timings don't change what the canvas draws
+        self.state.add_observer(self.update_canvas, (SLICE_IMAGES, SLICE_MASK, SLICE_VIEW))
         
     def setup_ui(self):
         """Setup canvas UI"""
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Session Memory Budget
+
+Tracks the bytes held by a session's large images and arrays and keeps them
+under a budget. When over it, the least recently used artifacts go first:
+ones that can be rebuilt cheaply (previews, split-view caches) are dropped and
+rebuilt the next time they are read; ones that can't (the raw prediction, the
+processed result) are spilled to a temp file and read back through a memory
+map, so the OS pages them in and out on demand instead of the session being
+pushed into swap. Spilled images are read back in whole when next used.
+
+The budget comes from SPOTLESS_MEMORY_BUDGET_MB, or half the physical memory.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+MEMORY_BUDGET_ENV = "SPOTLESS_MEMORY_BUDGET_MB"
+FALLBACK_BUDGET_BYTES = 4 * 1024 * 1024 * 1024
+
+# Bytes per pixel per band for PIL modes that aren't 8-bit
+_MODE_BAND_BYTES = {"I": 4, "F": 4, "I;16": 2, "I;16B": 2, "I;16L": 2, "1": 1}
+
+
+def default_budget_bytes() -> int:
+    """SPOTLESS_MEMORY_BUDGET_MB if set, else half the physical memory"""
+    env = os.environ.get(MEMORY_BUDGET_ENV)
+    if env:
+        try:
+            return int(float(env) * 1024 * 1024)
+        except ValueError:
+            logger.warning("Ignoring invalid %s=%r", MEMORY_BUDGET_ENV, env)
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // 2
+    except (AttributeError, ValueError, OSError):
+        return FALLBACK_BUDGET_BYTES
+
+
+def artifact_nbytes(value: Any) -> int:
+    """Resident size of an image or array; file-backed memory maps count as nothing"""
+    if value is None:
+        return 0
+    if isinstance(value, np.memmap):
+        return 0
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, Image.Image):
+        w, h = value.size
+        return w * h * len(value.getbands()) * _MODE_BAND_BYTES.get(value.mode, 1)
+    return 0
+
+
+@dataclass
+class _Artifact:
+    value: Any
+    nbytes: int
+    rebuild: Optional[Callable[[], Any]] = None
+    spill: bool = False
+    pinned: bool = False
+    spill_path: Optional[str] = None
+
+
+class SessionMemory:
+    """LRU byte budget over named session artifacts.
+
+    put() registers a value with how it may be evicted: pinned values (the
+    source image) are only counted; values with a rebuild callable are dropped
+    and rebuilt by get(); spill values are written to disk and swapped for a
+    read-only memory map (arrays) or reloaded by get() (images); anything else
+    is a plain cache that get() returns as None once evicted. Every get() marks
+    the artifact recently used.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = default_budget_bytes() if max_bytes is None else max_bytes
+        self._items: "OrderedDict[str, _Artifact]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._spill_dir: Optional[str] = None
+
+    def put(self, key: str, value: Any, rebuild: Optional[Callable[[], Any]] = None,
+            spill: bool = False, pinned: bool = False) -> None:
+        with self._lock:
+            self._remove(key)
+            if value is None and rebuild is None:
+                return
+            self._items[key] = _Artifact(value, artifact_nbytes(value), rebuild, spill, pinned)
+            self._enforce(keep=key)
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            if item.value is None and item.spill_path is not None:
+                item.value = Image.fromarray(np.load(item.spill_path))
+                item.nbytes = artifact_nbytes(item.value)
+                self._enforce(keep=key)
+            elif item.value is None and item.rebuild is not None:
+                item.value = item.rebuild()
+                item.nbytes = artifact_nbytes(item.value)
+                logger.debug("Rebuilt %s (%.1f MB)", key, item.nbytes / 1e6)
+                self._enforce(keep=key)
+            return item.value
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._items):
+                self._remove(key)
+            if self._spill_dir is not None:
+                shutil.rmtree(self._spill_dir, ignore_errors=True)
+                self._spill_dir = None
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(item.nbytes for item in self._items.values())
+
+    def usage(self) -> Dict[str, int]:
+        """Resident bytes per artifact, least recently used first"""
+        with self._lock:
+            return {key: item.nbytes for key, item in self._items.items()}
+
+    def _remove(self, key: str) -> None:
+        item = self._items.pop(key, None)
+        if item is not None and item.spill_path is not None:
+            try:
+                os.remove(item.spill_path)
+            except OSError:
+                pass  # still mapped (Windows); removed with the spill folder
+
+    def _enforce(self, keep: Optional[str] = None) -> None:
+        total = sum(item.nbytes for item in self._items.values())
+        for key, item in list(self._items.items()):
+            if total <= self.max_bytes:
+                break
+            if key == keep or item.pinned or item.nbytes == 0:
+                continue
+            freed = item.nbytes
+            if item.spill:
+                try:
+                    self._spill(key, item)
+                except (OSError, ValueError) as e:
+                    logger.warning("Could not spill %s to disk: %s", key, e)
+                    continue
+            elif item.rebuild is not None:
+                item.value = None
+                item.nbytes = 0
+            else:
+                del self._items[key]
+            total -= freed
+            logger.debug("Evicted %s (%.1f MB), session now %.1f MB of %.1f MB",
+                         key, freed / 1e6, total / 1e6, self.max_bytes / 1e6)
+
+    def _spill(self, key: str, item: _Artifact) -> None:
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix="spotless-spill-")
+            # Removed with the session, or at interpreter exit at the latest
+            weakref.finalize(self, shutil.rmtree, self._spill_dir, True)
+        if item.spill_path is None:
+            item.spill_path = os.path.join(self._spill_dir, f"{key}-{id(item):x}.npy")
+            np.save(item.spill_path, np.asarray(item.value))
+        # PIL can't wrap most mapped buffers without copying, so images are reloaded on use
+        item.value = None if isinstance(item.value, Image.Image) else np.load(item.spill_path, mmap_mode='r')
+        item.nbytes = 0
+
+
+class Artifact:
+    """Attribute stored in the owner's SessionMemory (its `memory` attribute).
+
+    rebuild names a method on the owner returning a fresh value after eviction.
+    """
+
+    def __init__(self, key: Optional[str] = None, rebuild: Optional[str] = None,
+                 spill: bool = False, pinned: bool = False):
+        self.key = key
+        self.rebuild = rebuild
+        self.spill = spill
+        self.pinned = pinned
+
+    def __set_name__(self, owner, name: str) -> None:
+        if self.key is None:
+            self.key = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return obj.memory.get(self.key)
+
+    def __set__(self, obj, value) -> None:
+        rebuild = getattr(obj, self.rebuild) if self.rebuild and value is not None else None
+        obj.memory.put(self.key, value, rebuild=rebuild, spill=self.spill, pinned=self.pinned)
@@ -1,7 +1,7 @@
 # Spotless batch processing helpers for SpotlessFilmModern
 from tkinter import messagebox, filedialog
 from typing import Optional, List
-import threading
+import logging
 import threading
 import os
 import time
@@ -9,7 +9,14 @@ from PIL import Image
 import numpy as np
 import customtkinter as ctk
 
-from image_processing import ImageProcessingService
+from batch_engine import (DEFAULT_BATCH_THRESHOLD, BatchDiscovery, BatchOptions, BatchPipeline, BatchProcessPool,
+                          BatchProgress, iter_batch_files)
+from batch_manifest import BatchManifest
+from batch_report import BatchReport, default_report_path
+from batch_schedule import ORDER_LARGEST, ORDER_SCAN, BatchScheduler, parse_priority_patterns
+from batch_watch import FolderWatcher
+
+logger = logging.getLogger(__name__)
 
 class BatchProgressWindow(ctk.CTkToplevel):
     def __init__(self, master):
@@ -69,13 +76,16 @@ class BatchProgressWindow(ctk.CTkToplevel):
 
         self.geometry(f"+{x}+{y}")
 
-    def update_progress(self, processed: int, total: int, skipped: int, eta_seconds: Optional[float] = None):
-        self.status_label.configure(text=f"Processing file {processed}/{total}...")
+    def update_progress(self, processed: int, total: int, skipped: int, eta_seconds: Optional[float] = None,
+                        discovering: bool = False):
+        # While the folder scan is still running the total is a lower bound
+        total_text = f"{total}+ (scanning...)" if discovering else f"{total}"
+        self.status_label.configure(text=f"Processing file {processed}/{total}{'+' if discovering else ''}...")
         self.progress_bar.set(processed / total if total > 0 else 0)
-        self.total_files_label.configure(text=f"Total files: {total}")
+        self.total_files_label.configure(text=f"Total files: {total_text}")
         self.skipped_files_label.configure(text=f"Skipped files: {skipped}")
         self.processed_files_label.configure(text=f"Processed: {processed}")
-        self.remaining_files_label.configure(text=f"Remaining: {total - processed - skipped}")
+        self.remaining_files_label.configure(text=f"Remaining: {max(0, total - processed)}")
 
         if eta_seconds is not None:
             if eta_seconds < 60:
@@ -98,7 +108,7 @@ class BatchProgressWindow(ctk.CTkToplevel):
 
     def _on_closing(self):
         """Handle window close button click."""
-        print("Batch cancel requested, signaling worker thread...")
+        logger.info("Batch cancel requested, signaling worker thread")
         self.status_label.configure(text="Cancelling...")
         self.stop_event.set()
         self.withdraw() # Hide the window immediately
@@ -138,6 +148,16 @@ def _finish_batch_ui(self, progress_window=None):
         self._batch_running = False
     self.root.after_idle(_do)
 
+def choose_batch_output_folder(self):
+    """Pick where batch outputs go; cancelling goes back to writing next to the originals."""
+    folder = filedialog.askdirectory(title="Select Batch Output Folder (Cancel to save next to originals)")
+    self.state.batch_output_root = folder or None
+    label = f"📤 Output: {os.path.basename(folder) or folder}" if folder else "📤 Output: next to originals"
+    try:
+        self.batch_output_btn.configure(text=label)
+    except Exception:
+        pass
+
 def batch_process_folder_dialog(self):
     """Open a folder picker and start recursive batch processing in background."""
     if self._batch_running:
@@ -156,13 +176,14 @@ def batch_process_folder_dialog(self):
     progress_window.lift() # Bring the batch window to the front
 
     # Pass the batch threshold from state to the worker
-    batch_threshold = getattr(self.state, 'batch_threshold', 0.005)
-    print(f"[SpotlessBatch] Starting batch process with sensitivity {batch_threshold}")
+    batch_threshold = getattr(self.state, 'batch_threshold', DEFAULT_BATCH_THRESHOLD)
+    logger.info("Starting batch process with sensitivity %s", batch_threshold)
     t = threading.Thread(target=self._batch_process_folder_worker, args=(folder, progress_window, progress_window.stop_event, batch_threshold))
     t.daemon = True
     t.start()
 
 def _batch_process_folder_worker(self, root_folder: str, progress_window, stop_event: threading.Event, batch_threshold: float):
+    manifest = None
     try:
         # Ensure model is available
         if not self.state.unet_model:
@@ -171,130 +192,94 @@ def _batch_process_folder_worker(self, root_folder: str, progress_window, stop_e
             self.root.after_idle(lambda: progress_window.destroy())
             return
 
-        print(f"Started batch with sensitivity {batch_threshold}")
-
-        supported_ext = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp", ".webp")
-        all_files: List[str] = []
-        for dirpath, _dirnames, filenames in os.walk(root_folder):
-            for fname in filenames:
-                if fname.lower().endswith(supported_ext):
-                    all_files.append(os.path.join(dirpath, fname))
-
-        total_potential_files = len(all_files)
-        if total_potential_files == 0:
-            self._update_status_async("No images found in selected folder.")
-            self.root.after_idle(lambda: progress_window.destroy())
-            return
-
-        files_to_process: List[str] = []
-        skipped_initial = 0
-        for fpath in all_files:
-            base_no_ext, ext = os.path.splitext(fpath)
-            if base_no_ext.endswith('C'):
-                skipped_initial += 1
-            else:
-                files_to_process.append(fpath)
-        
-        total_actual_to_process = len(files_to_process)
-        
-        self.root.after_idle(lambda: progress_window.update_progress(
-            processed=0,
-            total=total_actual_to_process,
-            skipped=skipped_initial
-        ))
-
-        if total_actual_to_process == 0:
-            self._update_status_async("No new images to process in selected folder.")
-            self.root.after_idle(lambda: progress_window.complete(0, 0, 0))
-            self._show_messagebox_async('info', 'Batch Complete', 'No new images to process.')
-            return
-
-        self._update_status_async(f"Batch start: {total_actual_to_process} images to process", "#4CAF50")
+        # Outputs mirror the folder tree under the chosen output folder, if any
+        options = BatchOptions.from_state(self.state, batch_threshold,
+                                          output_root=getattr(self.state, 'batch_output_root', None),
+                                          input_root=root_folder)
+
+        # Manifest in the output folder lets a cancelled or crashed run pick up where it stopped
+        manifest = BatchManifest.try_open(options.output_root or root_folder, input_root=root_folder)
+
+        # Files stream into the pipeline as the scan finds them; totals grow until it finishes
+        discovery = BatchDiscovery()
+        files_to_process = BatchScheduler(
+            iter_batch_files(root_folder, manifest, options.params_key(), discovery, router=options.output_router()),
+            order=ORDER_LARGEST if getattr(self.state, 'batch_largest_first', True) else ORDER_SCAN,
+            priority_patterns=parse_priority_patterns(getattr(self.state, 'batch_priority', "")),
+            root=root_folder,
+            discovery=discovery,
+        )
+        self._update_status_async("Batch start: scanning folder...", "#4CAF50")
 
         processed_count = 0
         failed_count = 0
+        total_actual_to_process = 0
         start_time = time.time()
-        # batch_threshold is now passed in
-        first_file_end_time = None
-        
-        batch_cancelled = False
+        last_progress = {'processed': 0, 'eta_seconds': None}
+
+        def refresh_window():
+            progress_window.update_progress(
+                processed=last_progress['processed'],
+                total=discovery.found,
+                skipped=discovery.skipped,
+                eta_seconds=last_progress['eta_seconds'],
+                discovering=not discovery.complete
+            )
 
-        from image_processing import ImageProcessingService
-        for idx, fpath in enumerate(files_to_process, start=1):
-            if stop_event.is_set():
-                batch_cancelled = True
-                break # Exit loop if stop event is set
+        def tick():
+            # Keep the counts moving while the scan runs ahead of the first results
+            if stop_event.is_set() or not progress_window.winfo_exists():
+                return
+            refresh_window()
+            if not discovery.complete:
+                self.root.after(500, tick)
+
+        self.root.after_idle(tick)
+
+        def on_progress(progress: BatchProgress):
+            name = os.path.basename(progress.last_item.path)
+            done = progress.processed + progress.failed
+            total = f"{progress.total}+" if progress.discovering else f"{progress.total}"
+            workers = f" ({len(progress.worker_counts)} workers)" if progress.worker_counts else ""
+            self._update_status_async(f"[{done}/{total}] Finished {name}{workers}")
+            last_progress['processed'] = progress.processed
+            last_progress['eta_seconds'] = progress.eta_seconds
+            self.root.after_idle(refresh_window)
+
+        report = BatchReport()
+        if getattr(self.state, 'batch_use_processes', False):
+            # Whole files in parallel across processes sharing one model
+            runner = BatchProcessPool(self.state.unet_model, options, stop_event=stop_event,
+                                      on_progress=on_progress, manifest=manifest, report=report)
+        else:
+            # Decode, inference, inpaint and encode overlap across files
+            runner = BatchPipeline(self.state.unet_model, self.state.device, options, stop_event=stop_event,
+                                   on_progress=on_progress, manifest=manifest, report=report)
+        batch_result = runner.run(files_to_process, discovery=discovery)
+        processed_count = batch_result.processed
+        failed_count = batch_result.failed
+        total_actual_to_process = discovery.found
+
+        if not batch_result.cancelled and total_actual_to_process == 0:
+            if discovery.skipped == 0:
+                self._update_status_async("No images found in selected folder.")
+            else:
+                self._update_status_async("No new images to process in selected folder.")
+                self._show_messagebox_async('info', 'Batch Complete', 'No new images to process.')
+            self.root.after_idle(lambda: progress_window.complete(0, 0, 0))
+            return
+        batch_cancelled = batch_result.cancelled
 
-            current_file_start_time = time.time()
-            try:
-                base_no_ext, ext = os.path.splitext(fpath)
-
-                self._update_status_async(f"[{idx}/{total_actual_to_process}] Processing {os.path.basename(fpath)}...")
-                self.root.after_idle(lambda: progress_window.status_label.configure(text=f"Processing {os.path.basename(fpath)}..."))
-
-                # Load image
-                with Image.open(fpath) as im:
-                    img = im.convert('RGB')
-
-                # Predict mask probabilities (tile-based)
-                prob_mask = ImageProcessingService.predict_dust_mask(
-                    self.state.unet_model,
-                    img,
-                    threshold=0.5,
-                    window_size=1024,
-                    stride=512,
-                    device=self.state.device,
-                    progress_callback=None
-                )
-
-                # Threshold to binary at desired sensitivity
-                bin_mask = ImageProcessingService.create_binary_mask(prob_mask, batch_threshold, img.size)
-
-                if not getattr(self.state, 'remove_scratches', True):
-                    bin_mask = ImageProcessingService.keep_small_dust_only(bin_mask)
-
-                if getattr(self.state, 'dust_brightness_color', True):
-                    bin_mask = ImageProcessingService.filter_mask_by_brightness_and_color(
-                        bin_mask, img, min_brightness=getattr(self.state,'min_brightness',180), max_color_diff=getattr(self.state,'max_color_diff',40))
-
-                # Dilate for coverage
-                dilated = ImageProcessingService.dilate_mask(bin_mask)
-
-                # Inpaint (fast CV2) and blend
-                inpainted = self.perform_cv2_inpainting(img, dilated)
-                final_img = ImageProcessingService.blend_images(img, inpainted, dilated)
-
-                # Output path with 'C' suffix
-                out_path = base_no_ext + 'C' + ext
-                if ext.lower() in (".jpg", ".jpeg"):
-                    final_img.save(out_path, 'JPEG', quality=95)
-                else:
-                    final_img.save(out_path)
-
-                processed_count += 1
-            except Exception as e:
-                failed_count += 1
-                print(f"Batch error on {fpath}: {e}")
-            finally:
-                current_file_end_time = time.time()
-                if first_file_end_time is None:
-                    first_file_end_time = current_file_end_time
-                
-                elapsed_since_start = current_file_end_time - start_time
-                files_done = processed_count + failed_count
-                
-                eta_seconds = None
-                if files_done > 0:
-                    avg_time_per_file = elapsed_since_start / files_done
-                    remaining_files = total_actual_to_process - files_done
-                    eta_seconds = avg_time_per_file * remaining_files
-
-                self.root.after_idle(lambda: progress_window.update_progress(
-                    processed=processed_count,
-                    total=total_actual_to_process,
-                    skipped=skipped_initial,
-                    eta_seconds=eta_seconds
-                ))
+        # Per-file, per-stage timings next to the outputs, to see what limits this archive
+        bottleneck = report.bottleneck()
+        report_folder = options.output_root or root_folder
+        try:
+            csv_path = default_report_path(report_folder, ".csv")
+            report.write(csv_path)
+            report.write(os.path.splitext(csv_path)[0] + ".json")
+            logger.info("Timing report: %s (slowest stage: %s)", csv_path, bottleneck)
+        except OSError as e:
+            logger.warning("Could not write timing report: %s", e)
         
         if batch_cancelled:
             self._update_status_async(f"Batch cancelled by user. {processed_count} images processed.", "orange")
@@ -303,14 +288,78 @@ def _batch_process_folder_worker(self, root_folder: str, progress_window, stop_e
         else:
             elapsed_total = time.time() - start_time
             self._update_status_async(
-                f"Batch done: {processed_count}/{total_actual_to_process} succeeded, {failed_count} failed in {elapsed_total:.1f}s",
+                f"Batch done: {processed_count}/{total_actual_to_process} succeeded, {failed_count} failed in {elapsed_total:.1f}s"
+                + (f" (slowest stage: {bottleneck})" if bottleneck else ""),
                 "#4CAF50" if failed_count == 0 else "orange"
             )
             self._show_messagebox_async('info', 'Batch Complete', f"Processed {processed_count}/{total_actual_to_process} images. Failed: {failed_count}.")
             self.root.after_idle(lambda: progress_window.complete(processed_count, total_actual_to_process, failed_count))
     except Exception as e:
-        print(f"Batch fatal error: {e}")
+        logger.exception("Batch fatal error")
         self._update_status_async(f"Batch failed: {e}", "red")
         self.root.after_idle(lambda: progress_window.complete(processed_count, total_actual_to_process, failed_count))
     finally:
+        if manifest is not None:
+            manifest.close()
         self._finish_batch_ui(progress_window)
+
+def toggle_watch_folder(self):
+    """Start watching a scanner folder, or stop the running watch."""
+    if self._watch_stop_event is not None:
+        self._watch_stop_event.set()
+        try:
+            self.watch_btn.configure(text="Stopping...", state="disabled")
+        except Exception:
+            pass
+        return
+    if not self.state.unet_model:
+        self._show_messagebox_async('error', 'Watch Folder', 'U-Net model not loaded. Please wait for models to load.')
+        return
+    folder = filedialog.askdirectory(title="Select Folder to Watch")
+    if not folder:
+        return
+    output_dir = filedialog.askdirectory(title="Select Output Folder (Cancel to save next to each scan)") or None
+
+    self._watch_stop_event = threading.Event()
+    try:
+        self.watch_btn.configure(text="⏹ Stop Watching")
+    except Exception:
+        pass
+    t = threading.Thread(target=self._watch_folder_worker, args=(folder, output_dir, self._watch_stop_event))
+    t.daemon = True
+    t.start()
+
+def _watch_folder_worker(self, folder: str, output_dir: Optional[str], stop_event: threading.Event):
+    manifest = None
+    try:
+        batch_threshold = getattr(self.state, 'batch_threshold', DEFAULT_BATCH_THRESHOLD)
+        logger.info("Watching %s with sensitivity %s, output: %s", folder, batch_threshold, output_dir or 'next to scans')
+        options = BatchOptions.from_state(self.state, batch_threshold,
+                                          output_root=output_dir, input_root=folder if output_dir else None)
+        manifest = BatchManifest.try_open(output_dir or folder, input_root=folder)
+        watcher = FolderWatcher(folder, stop_event=stop_event, manifest=manifest,
+                                params=options.params_key(), router=options.output_router())
+
+        def on_progress(progress: BatchProgress):
+            name = os.path.basename(progress.last_item.path)
+            self._update_status_async(f"👁 Watching: {progress.processed} cleaned, {progress.failed} failed (last: {name})")
+
+        self._update_status_async(f"👁 Watching {os.path.basename(folder)} for new scans", "#4CAF50")
+        # Same pipeline as batch mode; the watcher keeps feeding it until stopped, so the model stays warm
+        pipeline = BatchPipeline(self.state.unet_model, self.state.device, options,
+                                 stop_event=stop_event, on_progress=on_progress, manifest=manifest)
+        result = pipeline.run(watcher)
+        self._update_status_async(f"Stopped watching: {result.processed} images cleaned, {result.failed} failed")
+    except Exception as e:
+        logger.exception("Watch folder error")
+        self._update_status_async(f"Watch folder failed: {e}", "red")
+    finally:
+        if manifest is not None:
+            manifest.close()
+        def _do():
+            self._watch_stop_event = None
+            try:
+                self.watch_btn.configure(text="👁 Watch Folder", state="normal")
+            except Exception:
+                pass
+        self.root.after_idle(_do)
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Spotless Film headless batch runner
+
+Runs the batch detection/filter/inpaint pipeline without Tk, for render nodes
+and scripts. Progress is written to stdout as one JSON object per line; all
+other log output goes to stderr.
+
+    python spotless_cli.py /scans/roll01 /scans/roll02 --threshold 0.3
+    python spotless_cli.py scan1.tif scan2.tif --processes 8 --quiet
+    python spotless_cli.py /scanner/out --watch --output-dir /archive/cleaned
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import torch
+
+from batch_engine import (DEFAULT_BATCH_THRESHOLD, BatchDiscovery, BatchOptions, BatchPipeline, BatchProcessPool,
+                          BatchProgress, BatchResult, iter_batch_files, SUPPORTED_EXTENSIONS)
+from batch_output import DEFAULT_NAME_TEMPLATE
+from spotless_logging import configure_logging
+from batch_report import BatchReport
+from batch_schedule import ORDER_LARGEST, ORDER_SCAN, BatchScheduler
+from batch_manifest import BatchManifest
+from batch_watch import FolderWatcher
+from image_processing import ImageProcessingService
+from model_files import find_model_files
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="spotless_cli",
+        description="Remove dust from scanned film images without the GUI."
+    )
+    parser.add_argument("inputs", nargs="+", help="Image files and/or folders (searched recursively)")
+
+    detection = parser.add_argument_group("detection")
+    detection.add_argument("--threshold", type=float, default=DEFAULT_BATCH_THRESHOLD,
+                           help="Detection sensitivity, lower finds more dust (default: %(default)s)")
+    detection.add_argument("--keep-scratches", dest="remove_scratches", action="store_false",
+                           help="Only remove small dust, leave long scratches and hairs")
+    detection.add_argument("--no-color-filter", dest="dust_brightness_color", action="store_false",
+                           help="Don't restrict the mask to bright, neutral dust")
+    detection.add_argument("--min-brightness", type=int, default=180)
+    detection.add_argument("--max-color-diff", type=int, default=40)
+    detection.add_argument("--feather", type=int, default=0, metavar="RADIUS",
+                           help="Feather inpainted edges by RADIUS pixels (default: off)")
+    detection.add_argument("--multiscale", action="store_true",
+                           help="Multi-scale fill for large blotches")
+
+    runtime = parser.add_argument_group("runtime")
+    runtime.add_argument("--weights", help="U-Net weights file (default: search the usual model folders)")
+    runtime.add_argument("--device", choices=["auto", "cpu", "cuda", "mps"], default="auto")
+    runtime.add_argument("--processes", type=int, default=None, metavar="N",
+                         help="Use a pool of N worker processes instead of the threaded pipeline "
+                              "(0 sizes the pool to this machine)")
+    runtime.add_argument("--decode-workers", type=int, default=2)
+    runtime.add_argument("--inference-workers", type=int, default=1)
+    runtime.add_argument("--inference-batch", type=int, default=0,
+                         help="Images per forward pass, at most the stage queue depth "
+                              "(default: size to available memory)")
+    runtime.add_argument("--inpaint-workers", type=int, default=2)
+    runtime.add_argument("--encode-workers", type=int, default=2)
+    runtime.add_argument("--order", choices=[ORDER_LARGEST, ORDER_SCAN], default=ORDER_LARGEST,
+                         help="Process the largest images first (default) or in scan order")
+    runtime.add_argument("--priority", action="append", default=[], metavar="PATTERN",
+                         help="Folder name or glob (relative to the input) to process first; repeatable, "
+                              "earlier patterns win")
+
+    output = parser.add_argument_group("output")
+    output.add_argument("--output-dir", metavar="FOLDER",
+                        help="Write outputs under FOLDER, mirroring the input tree (default: next to each input)")
+    output.add_argument("--flat", action="store_true",
+                        help="With --output-dir, put every output directly in FOLDER instead of mirroring; "
+                             "refuses to run if two inputs share a name")
+    output.add_argument("--name-template", default=DEFAULT_NAME_TEMPLATE, metavar="TEMPLATE",
+                        help="Output file name from {stem} and {ext} (default: %(default)s)")
+    output.add_argument("--fsync", action="store_true",
+                        help="fsync each output before renaming it into place (slower, crash-safe)")
+    output.add_argument("--quality", type=int, default=95, help="JPEG quality (default: 95)")
+    output.add_argument("--skip-existing", action="store_true",
+                        help="Skip inputs whose cleaned output already exists")
+    output.add_argument("--manifest", metavar="FOLDER",
+                        help="Where to keep the resume manifest (default: the output folder, "
+                             "else the folder containing all inputs)")
+    output.add_argument("--no-manifest", action="store_true",
+                        help="Don't record or resume progress; process every input")
+    output.add_argument("--report", metavar="PATH",
+                        help="Write per-file, per-stage timings to PATH (.csv or .json)")
+    output.add_argument("--quiet", action="store_true", help="Silence log output on stderr")
+
+    watch = parser.add_argument_group("watch mode")
+    watch.add_argument("--watch", action="store_true",
+                       help="Keep running and process new files as they appear in the input folder")
+    watch.add_argument("--settle", type=float, default=2.0, metavar="SECONDS",
+                       help="How long a file's size and mtime must stay unchanged before it is processed")
+    watch.add_argument("--poll", type=float, default=1.0, metavar="SECONDS", help="Folder scan interval")
+    return parser
+
+
+def iter_inputs(inputs: List[str], discovery: BatchDiscovery, options: BatchOptions,
+                manifest: Optional[BatchManifest] = None, skip_existing: bool = False) -> Iterator[str]:
+    """Stream files and folder contents to process, counting into discovery as it goes"""
+    params = options.params_key()
+    router = options.output_router()
+    for entry in inputs:
+        if os.path.isdir(entry):
+            # The folder scan marks discovery complete; keep it open until every input is done
+            for path in iter_batch_files(entry, manifest, params, discovery, router):
+                if skip_existing and os.path.exists(router.output_path(path)):
+                    discovery.found -= 1
+                    discovery.skipped += 1
+                    continue
+                yield path
+            discovery.complete = False
+        elif (os.path.isfile(entry) and entry.lower().endswith(SUPPORTED_EXTENSIONS)
+              and (manifest is None or manifest.needs_processing(entry, params))
+              and not (skip_existing and os.path.exists(router.output_path(entry)))):
+            discovery.found += 1
+            yield entry
+        else:
+            discovery.skipped += 1
+    discovery.complete = True
+
+
+def common_root(inputs: List[str]) -> str:
+    """Deepest folder containing every input"""
+    folders = [os.path.abspath(p if os.path.isdir(p) else os.path.dirname(p) or ".") for p in inputs]
+    return os.path.commonpath(folders)
+
+
+def select_device(name: str) -> torch.device:
+    if name != "auto":
+        return torch.device(name)
+    return torch.device(
+        "mps" if torch.backends.mps.is_available() else
+        "cuda" if torch.cuda.is_available() else "cpu"
+    )
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+
+    # Keep stdout for machine-readable progress; library logging goes to stderr
+    json_out = sys.stdout
+    configure_logging(level=logging.CRITICAL + 1 if args.quiet else None, stream=sys.stderr)
+
+    def emit(event: str, **fields):
+        json_out.write(json.dumps({"event": event, **fields}) + "\n")
+        json_out.flush()
+
+    return run(args, emit)
+
+
+def build_options(args: argparse.Namespace) -> BatchOptions:
+    return BatchOptions(
+        threshold=args.threshold,
+        remove_scratches=args.remove_scratches,
+        dust_brightness_color=args.dust_brightness_color,
+        min_brightness=args.min_brightness,
+        max_color_diff=args.max_color_diff,
+        feather_edges=args.feather > 0,
+        feather_radius=max(1, args.feather),
+        multiscale_inpaint=args.multiscale,
+        jpeg_quality=args.quality,
+        decode_workers=args.decode_workers,
+        inference_workers=args.inference_workers,
+        inpaint_workers=args.inpaint_workers,
+        encode_workers=args.encode_workers,
+        inference_batch=args.inference_batch,
+        output_root=args.output_dir,
+        input_root=None if args.flat else common_root(args.inputs),
+        name_template=args.name_template,
+        fsync_outputs=args.fsync,
+    )
+
+
+def run(args: argparse.Namespace, emit) -> int:
+    weights = args.weights or find_model_files(None)['unet']
+    if not weights or not os.path.isfile(weights):
+        emit("error", message="No U-Net weights file found; pass --weights")
+        return 2
+
+    if args.watch and (len(args.inputs) != 1 or not os.path.isdir(args.inputs[0])):
+        emit("error", message="--watch takes exactly one folder")
+        return 2
+    if args.watch and args.processes is not None:
+        emit("error", message="--watch runs on the threaded pipeline; drop --processes")
+        return 2
+
+    options = build_options(args)
+    try:
+        router = options.output_router()
+        if args.flat and options.output_root:
+            # Same-named files from different folders would overwrite each other's output
+            collisions = router.collisions(iter_inputs(args.inputs, BatchDiscovery(), options))
+            if collisions:
+                output, sources = next(iter(collisions.items()))
+                emit("error", message=f"--flat would write {len(collisions)} output(s) more than once, "
+                                      f"e.g. {output} from {', '.join(sources)}; drop --flat to mirror the folders")
+                return 2
+    except ValueError as e:
+        emit("error", message=str(e))
+        return 2
+    manifest = None
+    if not args.no_manifest:
+        manifest = BatchManifest.try_open(args.manifest or options.output_root or common_root(args.inputs),
+                                          input_root=common_root(args.inputs))
+    try:
+        if args.watch:
+            return run_watch(args, emit, weights, options, manifest)
+        return run_batch(args, emit, weights, options, manifest)
+    finally:
+        if manifest is not None:
+            manifest.close()
+
+
+def emit_progress(emit, progress: BatchProgress) -> None:
+    item = progress.last_item
+    emit("progress",
+         processed=progress.processed,
+         failed=progress.failed,
+         total=progress.total,
+         discovering=progress.discovering,
+         eta_seconds=round(progress.eta_seconds, 1) if progress.eta_seconds is not None else None,
+         path=item.path,
+         output=item.output_path,
+         error=str(item.error) if item.error is not None else None)
+
+
+def write_report(args: argparse.Namespace, report: BatchReport) -> dict:
+    """Write the timing report if asked for; returns fields for the done event"""
+    fields = {"bottleneck": report.bottleneck(), "stages": report.summary()["stages"]}
+    if args.report:
+        report.write(args.report)
+        fields["report"] = os.path.abspath(args.report)
+    return fields
+
+
+def run_watch(args: argparse.Namespace, emit, weights: str, options: BatchOptions,
+              manifest: Optional[BatchManifest]) -> int:
+    """Process files as they land in the watched folder until interrupted"""
+    device = select_device(args.device)
+    # Loaded once and kept warm for every file that arrives
+    model = ImageProcessingService.load_model(weights, device)
+
+    stop_event = threading.Event()
+    watcher = FolderWatcher(args.inputs[0], settle_seconds=args.settle, poll_interval=args.poll,
+                            stop_event=stop_event, manifest=manifest, params=options.params_key(),
+                            router=options.output_router())
+    report = BatchReport()
+    runner = BatchPipeline(model, device, options, stop_event=stop_event,
+                           on_progress=lambda progress: emit_progress(emit, progress),
+                           manifest=manifest, report=report)
+    emit("watch", folder=os.path.abspath(args.inputs[0]), output=options.output_root,
+         manifest=manifest.path if manifest else None)
+
+    # Run the pipeline off the main thread so Ctrl-C can stop it and the manifest still gets closed
+    results: List[BatchResult] = []
+    worker = threading.Thread(target=lambda: results.append(runner.run(watcher)),
+                              name="watch-pipeline", daemon=True)
+    start_time = time.time()
+    worker.start()
+    try:
+        while worker.is_alive():
+            worker.join(0.5)
+    except KeyboardInterrupt:
+        stop_event.set()
+        worker.join()
+    result = results[0] if results else BatchResult()
+    emit("done",
+         processed=result.processed,
+         failed=result.failed,
+         skipped=0,
+         cancelled=True,
+         elapsed=round(time.time() - start_time, 2),
+         errors=result.errors,
+         **write_report(args, report))
+    return 0
+
+
+def run_batch(args: argparse.Namespace, emit, weights: str, options: BatchOptions,
+              manifest: Optional[BatchManifest]) -> int:
+    stop_event = threading.Event()
+    report = BatchReport()
+    pool = None
+    if args.processes is not None:
+        # Start the workers while this is still the only thread, so they can be forked;
+        # they run on the CPU, so load there and the weights are shareable as-is
+        device = torch.device("cpu")
+        model = ImageProcessingService.load_model(weights, device)
+        pool = BatchProcessPool(model, options, processes=args.processes or None, stop_event=stop_event,
+                                manifest=manifest, report=report)
+        pool.start()
+
+    discovery = BatchDiscovery()
+    files = iter(BatchScheduler(iter_inputs(args.inputs, discovery, options, manifest, args.skip_existing),
+                                order=args.order, priority_patterns=args.priority,
+                                root=common_root(args.inputs), discovery=discovery))
+    # The threaded pipeline only loads the model once the scan has found something to do
+    first = next(files, None)
+    if first is None:
+        if pool is not None:
+            pool.close()
+        emit("start", total=0, skipped=discovery.skipped, manifest=manifest.path if manifest else None)
+        emit("done", processed=0, failed=0, skipped=discovery.skipped, cancelled=False, elapsed=0.0, errors=[])
+        return 0
+    files = itertools.chain([first], files)
+    emit("start", total=discovery.found, discovering=not discovery.complete, skipped=discovery.skipped,
+         manifest=manifest.path if manifest else None)
+
+    last_progress = BatchProgress(processed=0, failed=0, total=discovery.found)
+
+    def on_progress(progress: BatchProgress):
+        nonlocal last_progress
+        last_progress = progress
+        emit_progress(emit, progress)
+
+    if pool is not None:
+        pool.on_progress = on_progress
+        runner = pool
+    else:
+        device = select_device(args.device)
+        model = ImageProcessingService.load_model(weights, device)
+        runner = BatchPipeline(model, device, options, stop_event=stop_event, on_progress=on_progress,
+                               manifest=manifest, report=report)
+
+    start_time = time.time()
+    try:
+        result = runner.run(files, discovery=discovery)
+    except KeyboardInterrupt:
+        stop_event.set()
+        emit("done", processed=last_progress.processed, failed=last_progress.failed, skipped=discovery.skipped,
+             cancelled=True, elapsed=round(time.time() - start_time, 2), errors=[], **write_report(args, report))
+        return 130
+
+    emit("done",
+         processed=result.processed,
+         failed=result.failed,
+         skipped=discovery.skipped,
+         cancelled=result.cancelled,
+         elapsed=round(result.elapsed, 2),
+         errors=result.errors,
+         **write_report(args, report))
+    return 1 if result.failed else 0
+
+
+if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
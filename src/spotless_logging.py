@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Logging Setup
+
+Modules log through logging.getLogger(__name__); the GUI and CLI entry points
+call configure_logging once. The level comes from SPOTLESS_LOG_LEVEL (default
+INFO), so per-event debug output, and the full-image statistics that are only
+computed for it, stay off unless asked for.
+"""
+
+import logging
+import os
+import sys
+from typing import Optional, TextIO, Union
+
+LOG_LEVEL_ENV = "SPOTLESS_LOG_LEVEL"
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+
+def configure_logging(level: Union[int, str, None] = None, stream: Optional[TextIO] = None) -> None:
+    """Send log records to stream (stdout by default) at level, or SPOTLESS_LOG_LEVEL"""
+    if level is None:
+        level = os.environ.get(LOG_LEVEL_ENV, "INFO")
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+        if not isinstance(level, int):
+            level = logging.INFO
+    logging.basicConfig(level=level, stream=stream or sys.stdout, format=LOG_FORMAT, datefmt="%H:%M:%S", force=True)
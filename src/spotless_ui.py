@@ -4,6 +4,8 @@ import customtkinter as ctk
 from tkinter import messagebox, filedialog
 from typing import Optional, Tuple, List
 from dust_removal_state import ToolMode  # <-- Add this import
+from state_slices import ALL_SLICES
+from batch_engine import DEFAULT_BATCH_THRESHOLD
 import numpy as np
 
 # All UI setup and update methods moved here from SpotlessFilmModern.
@@ -19,7 +21,8 @@ def setup_ui(self):
     self.setup_modern_sidebar()
     self.setup_center_panel()
     self.setup_status_bar()
-    self.state.add_observer(self.update_ui)
+    # The main update_ui covers every panel; it checks changed_slices itself before redrawing the image
+    self.state.add_observer(self.update_ui, ALL_SLICES)
 
 def setup_modern_sidebar(self):
     self.sidebar_frame = ctk.CTkFrame(self.main_frame, width=360, corner_radius=0, fg_color="#2A2A2A")
@@ -73,8 +76,23 @@ def create_import_section(self, parent):
     self.colorspace_label.pack(anchor="w")
     self.import_btn = ctk.CTkButton(parent, text="📁 Choose File", command=self.safe_import_image, font=ctk.CTkFont(size=12), height=32, fg_color="#4A4A4A", hover_color="#5A5A5A")
     self.import_btn.pack(fill="x", pady=(0, 5))
+    # Roll mode: frames cleaned one after another, the next ones detected in the background
+    self.roll_btn = ctk.CTkButton(parent, text="🎞 Open Roll...", command=self.open_frame_session_dialog, font=ctk.CTkFont(size=12), height=32, fg_color="#4A4A4A", hover_color="#5A5A5A")
+    self.roll_btn.pack(fill="x", pady=(0, 5))
+    frame_nav = ctk.CTkFrame(parent, fg_color="transparent")
+    frame_nav.pack(fill="x", pady=(0, 5))
+    self.prev_frame_btn = ctk.CTkButton(frame_nav, text="◀", command=self.previous_frame, width=32, height=26, state="disabled", fg_color="#3A3A3A", hover_color="#4A4A4A")
+    self.prev_frame_btn.pack(side="left")
+    self.next_frame_btn = ctk.CTkButton(frame_nav, text="▶", command=self.next_frame, width=32, height=26, state="disabled", fg_color="#3A3A3A", hover_color="#4A4A4A")
+    self.next_frame_btn.pack(side="right")
+    self.frame_label = ctk.CTkLabel(frame_nav, text="No roll open", font=ctk.CTkFont(size=10), text_color="#888888")
+    self.frame_label.pack(side="left", expand=True)
     self.batch_btn = ctk.CTkButton(parent, text="📂 Batch Process Folder", command=self.batch_process_folder_dialog, font=ctk.CTkFont(size=12), height=32, fg_color="#4A4A4A", hover_color="#5A5A5A")
     self.batch_btn.pack(fill="x", pady=(0, 5))
+    self.watch_btn = ctk.CTkButton(parent, text="👁 Watch Folder", command=self.toggle_watch_folder, font=ctk.CTkFont(size=12), height=32, fg_color="#4A4A4A", hover_color="#5A5A5A")
+    self.watch_btn.pack(fill="x", pady=(0, 5))
+    self.batch_output_btn = ctk.CTkButton(parent, text="📤 Output: next to originals", command=self.choose_batch_output_folder, font=ctk.CTkFont(size=11), height=26, fg_color="#3A3A3A", hover_color="#4A4A4A")
+    self.batch_output_btn.pack(fill="x", pady=(0, 5))
     # --- Batch Sensitivity Slider ---
     batch_sens_frame = ctk.CTkFrame(parent, fg_color="transparent")
     batch_sens_frame.pack(fill="x", pady=(0, 5))
@@ -82,7 +100,7 @@ def create_import_section(self, parent):
     header_row.pack(fill="x")
     batch_sens_label = ctk.CTkLabel(header_row, text="Batch Sensitivity", font=ctk.CTkFont(size=11, weight="bold"))
     batch_sens_label.pack(side="left")
-    self.batch_threshold_value_label = ctk.CTkLabel(header_row, text=f"{getattr(self.state, 'batch_threshold', 0.4):.4f}", font=ctk.CTkFont(size=10), text_color="#CCCCCC")
+    self.batch_threshold_value_label = ctk.CTkLabel(header_row, text=f"{getattr(self.state, 'batch_threshold', DEFAULT_BATCH_THRESHOLD):.4f}", font=ctk.CTkFont(size=10), text_color="#CCCCCC")
     self.batch_threshold_value_label.pack(side="right")
     slider_frame = ctk.CTkFrame(batch_sens_frame, fg_color="transparent")
     slider_frame.pack(fill="x")
@@ -94,8 +112,42 @@ def create_import_section(self, parent):
         slider_frame, from_=0.0001, to=0.5, number_of_steps=200,
         command=self.on_batch_threshold_changed
     )
-    self.batch_threshold_slider.set(getattr(self.state, 'batch_threshold', 0.4))
+    self.batch_threshold_slider.set(getattr(self.state, 'batch_threshold', DEFAULT_BATCH_THRESHOLD))
     self.batch_threshold_slider.pack(fill="x", pady=(5, 0))
+    # Process pool for large overnight batches
+    self.batch_use_processes_var = ctk.BooleanVar(value=getattr(self.state, 'batch_use_processes', False))
+    def on_batch_use_processes_toggled():
+        self.state.batch_use_processes = bool(self.batch_use_processes_var.get())
+    self.batch_use_processes_chk = ctk.CTkCheckBox(
+        batch_sens_frame,
+        text="Use all CPU cores (process pool)",
+        variable=self.batch_use_processes_var,
+        command=on_batch_use_processes_toggled
+    )
+    self.batch_use_processes_chk.pack(anchor="w", pady=(5, 0))
+    # Start big files first so they don't finish alone at the end of a run
+    self.batch_largest_first_var = ctk.BooleanVar(value=getattr(self.state, 'batch_largest_first', True))
+    def on_batch_largest_first_toggled():
+        self.state.batch_largest_first = bool(self.batch_largest_first_var.get())
+    self.batch_largest_first_chk = ctk.CTkCheckBox(
+        batch_sens_frame,
+        text="Largest files first",
+        variable=self.batch_largest_first_var,
+        command=on_batch_largest_first_toggled
+    )
+    self.batch_largest_first_chk.pack(anchor="w", pady=(5, 0))
+    # Folders (or glob patterns) to process ahead of everything else
+    self.batch_priority_var = ctk.StringVar(value=getattr(self.state, 'batch_priority', ""))
+    def on_batch_priority_changed(*_):
+        self.state.batch_priority = self.batch_priority_var.get()
+    self.batch_priority_var.trace_add("write", on_batch_priority_changed)
+    self.batch_priority_entry = ctk.CTkEntry(
+        batch_sens_frame,
+        textvariable=self.batch_priority_var,
+        placeholder_text="Priority folders, e.g. roll12, urgent*",
+        font=ctk.CTkFont(size=11)
+    )
+    self.batch_priority_entry.pack(fill="x", pady=(5, 0))
 
 def create_removal_section(self, parent):
     # Checkbox to control scratch/lint removal
@@ -129,6 +181,44 @@ def create_removal_section(self, parent):
     )
     self.dust_brightness_color_chk.pack(anchor="w", pady=(0, 2))
 
+    # Checkbox to feather the inpainted edges when compositing
+    self.feather_edges_var = ctk.BooleanVar(value=getattr(self.state, 'feather_edges', False))
+    def on_feather_edges_toggled():
+        self.state.feather_edges = bool(self.feather_edges_var.get())
+    self.feather_edges_chk = ctk.CTkCheckBox(
+        parent,
+        text="Feather inpainted edges",
+        variable=self.feather_edges_var,
+        command=on_feather_edges_toggled
+    )
+    self.feather_edges_chk.pack(anchor="w", pady=(0, 8))
+
+    # Checkbox to fill large blotches through the multi-scale pyramid
+    self.multiscale_inpaint_var = ctk.BooleanVar(value=getattr(self.state, 'multiscale_inpaint', False))
+    def on_multiscale_inpaint_toggled():
+        self.state.multiscale_inpaint = bool(self.multiscale_inpaint_var.get())
+    self.multiscale_inpaint_chk = ctk.CTkCheckBox(
+        parent,
+        text="Multi-scale fill for large blotches",
+        variable=self.multiscale_inpaint_var,
+        command=on_multiscale_inpaint_toggled
+    )
+    self.multiscale_inpaint_chk.pack(anchor="w", pady=(0, 8))
+
+    # Checkbox to inpaint with LaMa; the model is loaded and warmed when first enabled
+    self.use_lama_var = ctk.BooleanVar(value=getattr(self.state, 'use_lama', False))
+    def on_use_lama_toggled():
+        self.state.use_lama = bool(self.use_lama_var.get())
+        if self.state.use_lama and self.state.lama_inpainter is not None:
+            self.state.lama_inpainter.request()
+    self.use_lama_chk = ctk.CTkCheckBox(
+        parent,
+        text="Use LaMa inpainting (loads on demand)",
+        variable=self.use_lama_var,
+        command=on_use_lama_toggled
+    )
+    self.use_lama_chk.pack(anchor="w", pady=(0, 8))
+
     # Sliders for min_brightness and max_color_diff
     from tkinter import IntVar
     self.min_brightness_var = IntVar(value=getattr(self.state, 'min_brightness', 5))
@@ -1,7 +1,10 @@
+import logging
 import threading
-from pathlib import Path
-from image_processing import ImageProcessingService, LamaInpainter
-from image_processing import ImageProcessingService
+from image_processing import ImageProcessingService, LamaSession
+from model_files import find_model_files
+from state_slices import SLICE_MASK, SLICE_PROCESSING
+
+logger = logging.getLogger(__name__)
 
 def load_models_async(app):
     """Load models asynchronously"""
@@ -26,14 +29,24 @@ def load_models_async(app):
                     text="No model file found", text_color="red"
                 ))
             
-            # Initialize LaMa
-            print("🤖 Initializing LaMa...")
-            app.lama_inpainter = LamaInpainter()
+            # LaMa is not loaded here: the session loads it on first use and evicts it when idle
+            lama_labels = {
+                "idle": "💤 On demand",
+                "loading": "⏳ Loading...",
+                "ready": "✅ Ready",
+                "unavailable": "❌ Unavailable",
+            }
+            def on_lama_status(status: str):
+                app.root.after_idle(lambda: app.lama_label.configure(text=f"LaMa: {lama_labels[status]}"))
+            app.lama_inpainter = LamaSession(
+                idle_timeout=getattr(app.state, 'lama_idle_timeout', 300.0),
+                on_status=on_lama_status
+            )
             app.state.lama_inpainter = app.lama_inpainter
             
-            lama_status = "✅ Available" if app.lama_inpainter.available else "❌ Unavailable"
-            print(f"🤖 LaMa status: {lama_status}")
-            app.root.after_idle(lambda: app.lama_label.configure(text=f"LaMa: {lama_status}"))
+            lama_status = "idle" if app.lama_inpainter.available else "unavailable"
+            print(f"🤖 LaMa status: {lama_labels[lama_status]}")
+            on_lama_status(lama_status)
             
             if app.state.unet_model:
                 print("🤖 All models loaded successfully")
@@ -53,46 +66,6 @@ def load_models_async(app):
     thread.daemon = True
     thread.start()
 
-def find_model_files(app) -> dict:
-    """Find model files - prioritize the specific weights file from main.ipynb"""
-    model_paths = {'unet': None, 'lama': None}
-    
-    # First, look for the exact weights file mentioned in main.ipynb
-    exact_weight_path = Path(__file__).parent / "weights" / "v5_bce_unet_epoch30.pth"
-    if exact_weight_path.exists():
-        model_paths['unet'] = str(exact_weight_path)
-        print(f"✅ Found exact weights file: {exact_weight_path}")
-        return model_paths
-    
-    # Fallback: search in common locations
-    search_dirs = [
-        Path(__file__).parent / "weights",
-        Path(__file__).parent / "checkpoints", 
-        Path.cwd() / "models",
-        Path.cwd() / "checkpoints",
-        Path.cwd() / "weights",
-        Path.cwd().parent / "models",
-        Path.cwd().parent / "checkpoints",
-    ]
-    
-    for search_dir in search_dirs:
-        if search_dir.exists():
-            print(f"🔍 Searching in: {search_dir}")
-            # Look for U-Net models (prioritize v5 and v6 models from notebook)
-            for pattern in ["v5_*.pth", "v6_*.pth", "*unet*.pth", "*.pth"]:
-                unet_files = list(search_dir.glob(pattern))
-                if unet_files:
-                    # Sort by name to get latest version
-                    unet_files.sort(reverse=True)
-                    model_paths['unet'] = str(unet_files[0])
-                    print(f"✅ Found weights file: {unet_files[0]}")
-                    break
-            
-            if model_paths['unet']:
-                break
-    
-    return model_paths
-
 def handle_processing_error(app, error: Exception, operation: str):
     """Handle processing errors"""
     app.state.processing_state.is_detecting = False
@@ -100,7 +73,7 @@ def handle_processing_error(app, error: Exception, operation: str):
     error_msg = f"{operation.capitalize()} failed: {str(error)}"
     app.state.show_error(error_msg)
     app.status_label.configure(text="Error occurred", text_color="red")
-    app.state.notify_observers()
+    app.state.notify_observers(SLICE_PROCESSING)
     print(f"❌ {error_msg}")
 
 def update_dust_mask_with_threshold(app):
@@ -122,17 +95,16 @@ def update_dust_mask_with_threshold(app):
         min_brightness = getattr(app.state, 'min_brightness', 180)
         max_color_diff = getattr(app.state, 'max_color_diff', 40)
         new_mask = ImageProcessingService.filter_mask_by_brightness_and_color(
-            new_mask, app.state.selected_image, min_brightness=min_brightness, max_color_diff=max_color_diff)
+            new_mask, app.state.source_image, min_brightness=min_brightness, max_color_diff=max_color_diff)
     app.state.dust_mask = new_mask
-    app.state.create_low_res_mask()
-    app.state.notify_observers()
+    app.state.notify_observers(SLICE_MASK)
 
 def update_dust_mask_with_threshold_realtime(app):
     """Real-time threshold updates (matches Swift app behavior)"""
     if app.state.raw_prediction_mask is None or not app.state.selected_image:
         return
     
-    print(f"🎚️ Updating threshold to {app.state.processing_state.threshold:.3f}")
+    logger.debug("Updating threshold to %.3f", app.state.processing_state.threshold)
     
     # Create new binary mask with current threshold
     new_mask = ImageProcessingService.create_binary_mask(
@@ -148,11 +120,16 @@ def update_dust_mask_with_threshold_realtime(app):
             min_brightness = getattr(app.state, 'min_brightness', 180)
             max_color_diff = getattr(app.state, 'max_color_diff', 40)
             new_mask = ImageProcessingService.filter_mask_by_brightness_and_color(
-                new_mask, app.state.selected_image, min_brightness=min_brightness, max_color_diff=max_color_diff)
+                new_mask, app.state.source_image, min_brightness=min_brightness, max_color_diff=max_color_diff)
         app.state.dust_mask = new_mask
-        app.state.create_low_res_mask()
         
         # Immediately update the display
         app.update_ui()
         
-        print(f"✅ Mask updated with threshold {app.state.processing_state.threshold:.3f} (filtered small dust only={not getattr(app.state,'remove_scratches', True)}, color/brightness={getattr(app.state,'dust_brightness_color', True)}, min_brightness={min_brightness}, max_color_diff={max_color_diff})")
\ No newline at end of file
+        if getattr(app.state, 'dust_brightness_color', True):
+            logger.debug("Mask updated with threshold %.3f (small dust only=%s, min_brightness=%d, max_color_diff=%d)",
+                         app.state.processing_state.threshold, not getattr(app.state, 'remove_scratches', True),
+                         min_brightness, max_color_diff)
+        else:
+            logger.debug("Mask updated with threshold %.3f (small dust only=%s, no color/brightness filter)",
+                         app.state.processing_state.threshold, not getattr(app.state, 'remove_scratches', True))
\ No newline at end of file
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""
+State Slices
+
+Names of the parts of DustRemovalState observers can subscribe to;
+notify_observers() marks which of them changed. Kept free of Tk imports so
+headless modules can use them.
+"""
+
+from typing import FrozenSet
+
+SLICE_VIEW = "view"
+SLICE_MASK = "mask"
+SLICE_IMAGES = "images"
+SLICE_PROCESSING = "processing"
+ALL_SLICES: FrozenSet[str] = frozenset((SLICE_VIEW, SLICE_MASK, SLICE_IMAGES, SLICE_PROCESSING))
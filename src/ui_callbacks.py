@@ -1,6 +1,11 @@
+import logging
+
 from dust_removal_state import ToolMode, ProcessingMode
+from state_slices import SLICE_VIEW
 from spotless_ui import on_mouse_motion as on_mouse_motion_helper, update_brush_cursor as update_brush_cursor_helper, hide_brush_cursor as hide_brush_cursor_helper, update_cursor_for_tool_change as update_cursor_for_tool_change_helper
 
+logger = logging.getLogger(__name__)
+
 def on_mouse_motion(app, event):
     on_mouse_motion_helper(app, event)
 
@@ -89,7 +94,7 @@ def on_opacity_changed(app, value):
 
 def zoom_in(app):
     """Zoom in using centralized state and refresh UI"""
-    print(f"[UI] zoom_in from {app.state.view_state.zoom_scale:.3f}")
+    logger.debug("zoom_in from %.3f", app.state.view_state.zoom_scale)
     app.state.zoom_in()
     app.update_zoom_ui()
     if app.state.selected_image:
@@ -100,7 +105,7 @@ def zoom_in(app):
 
 def zoom_out(app):
     """Zoom out using centralized state and refresh UI"""
-    print(f"[UI] zoom_out from {app.state.view_state.zoom_scale:.3f}")
+    logger.debug("zoom_out from %.3f", app.state.view_state.zoom_scale)
     app.state.zoom_out()
     app.update_zoom_ui()
     if app.state.selected_image:
@@ -111,7 +116,7 @@ def zoom_out(app):
 
 def reset_zoom(app):
     """Reset zoom and pan"""
-    print("[UI] reset_zoom")
+    logger.debug("reset_zoom")
     app.state.reset_zoom()
     app.update_zoom_ui()
     if app.state.selected_image:
@@ -151,12 +156,19 @@ def setup_keyboard_shortcuts(app):
     # macOS Command+Z and Meta+Z fallback
     app.root.bind('<Command-z>', lambda e: app.undo_mask_change())
     app.root.bind('<Meta-z>', lambda e: app.undo_mask_change())
+    app.root.bind('<Control-y>', lambda e: app.redo_mask_change())
+    app.root.bind('<Control-Shift-Z>', lambda e: app.redo_mask_change())
+    app.root.bind('<Command-Shift-Z>', lambda e: app.redo_mask_change())
+    app.root.bind('<Meta-Shift-Z>', lambda e: app.redo_mask_change())
     app.root.bind('<space>', lambda e: app.toggle_space_mode(True))
     app.root.bind('<KeyRelease-space>', lambda e: app.toggle_space_mode(False))
     app.root.bind('<m>', lambda e: app.toggle_dust_overlay())
     app.root.bind('<c>', lambda e: app.toggle_compare_mode())
     app.root.bind('<e>', lambda e: app.toggle_eraser_tool())
     app.root.bind('<b>', lambda e: app.toggle_brush_tool())
+    # Roll navigation (Page Down / Page Up)
+    app.root.bind('<Next>', lambda e: app.next_frame())
+    app.root.bind('<Prior>', lambda e: app.previous_frame())
     
     # Focus management
     app.root.focus_set()
@@ -166,7 +178,7 @@ def toggle_dust_overlay(app):
     if app.state.dust_mask:
         hide_detections = getattr(app.state, 'hide_detections', False)
         app.state.hide_detections = not hide_detections
-        print(f"🎭 Dust overlay: {{'hidden' if app.state.hide_detections else 'visible'}}")
+        logger.debug("Dust overlay: %s", 'hidden' if app.state.hide_detections else 'visible')
         # Refresh display
         if app.state.selected_image:
             app.display_image()
@@ -184,7 +196,7 @@ def toggle_space_mode(app, pressed: bool):
         pass
     # Update cursor to reflect space key state
     app.update_cursor_for_tool_change()
-    app.state.notify_observers()
+    app.state.notify_observers(SLICE_VIEW)
 
 def toggle_compare_mode(app):
     """Cycle through compare modes"""
@@ -199,6 +211,11 @@ def undo_mask_change(app):
     if app.state.can_undo:
         app.state.undo_last_mask_change()
 
+def redo_mask_change(app):
+    """Redo last undone mask change"""
+    if app.state.can_redo:
+        app.state.redo_last_mask_change()
+
 def on_threshold_changed(app, value):
     """Handle real-time threshold slider changes (matches Swift app behavior)"""
     threshold = float(value)
@@ -215,7 +232,7 @@ def on_threshold_changed(app, value):
 
 def set_view_mode(app, mode: ProcessingMode):
     """Set processing mode and update display"""
-    print(f"🖼️ Switching to {mode} view mode")
+    logger.debug("Switching to %s view mode", mode)
     app.state.set_processing_mode(mode)
     # Update button states
     app.update_view_buttons()
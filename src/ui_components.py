@@ -13,6 +13,7 @@ import numpy as np
 from typing import Optional, Callable, Tuple
 import threading
 from dust_removal_state import DustRemovalState, ProcessingMode, ToolMode
+from state_slices import SLICE_IMAGES, SLICE_MASK, SLICE_PROCESSING, SLICE_VIEW
 from simple_modern_theme import SimpleModernColors
 
 
@@ -84,7 +85,7 @@ class SpotlessSidebar(SpotlessFrame):
         self.callbacks = callbacks
         
         self.setup_ui()
-        self.state.add_observer(self.update_ui)
+        self.state.add_observer(self.update_ui, (SLICE_IMAGES, SLICE_MASK, SLICE_PROCESSING))
     
     def setup_ui(self):
         """Setup sidebar UI"""
@@ -347,7 +348,7 @@ class SpotlessToolbar(SpotlessFrame):
         self.callbacks = callbacks
         
         self.setup_ui()
-        self.state.add_observer(self.update_ui)
+        self.state.add_observer(self.update_ui, (SLICE_VIEW, SLICE_IMAGES, SLICE_MASK, SLICE_PROCESSING))
     
     def setup_ui(self):
         """Setup toolbar UI"""
@@ -553,7 +554,7 @@ class ZoomControls(SpotlessFrame):
         self.state = state
         
         self.setup_ui()
-        self.state.add_observer(self.update_ui)
+        self.state.add_observer(self.update_ui, (SLICE_VIEW,))
     
     def setup_ui(self):
         """Setup zoom controls"""
@@ -1,4 +1,5 @@
 import customtkinter as ctk
+from state_slices import SLICE_IMAGES, SLICE_MASK, SLICE_VIEW
 from spotless_ui import (
     setup_ui as setup_ui_helper,
     setup_modern_sidebar as setup_modern_sidebar_helper,
@@ -274,7 +275,7 @@ def setup_status_bar(app):
     app.status_label.grid(row=0, column=1, sticky="w", padx=10)
     
     # LaMa status
-    app.lama_label = ctk.CTkLabel(app.status_frame, text="LaMa: Loading...",
+    app.lama_label = ctk.CTkLabel(app.status_frame, text="LaMa: On demand",
                                   font=ctk.CTkFont(size=10), text_color="gray60")
     app.lama_label.grid(row=0, column=2, sticky="e", padx=10)
 
@@ -361,12 +362,14 @@ def update_ui(app):
         else:
             app.export_frame.grid_forget()
     
+    update_frame_controls(app)
+    
     # Update toolbar button states if they exist
     if hasattr(app, 'view_cycle_btn'):
         app.update_tool_buttons()
     
-    # Display current image
-    if app.state.selected_image:
+    # Display current image; processing-only changes (busy flags, timings) don't need a redraw
+    if app.state.selected_image and app.state.changed_slices & {SLICE_VIEW, SLICE_MASK, SLICE_IMAGES}:
         app.display_image()
     
     # Update processing button text
@@ -380,4 +383,22 @@ def update_ui(app):
         if app.state.processing_state.is_removing:
             app.remove_btn.configure(text="✨  Removing...")
         else:
-            app.remove_btn.configure(text="✨  Remove Dust")
\ No newline at end of file
+            app.remove_btn.configure(text="✨  Remove Dust")
+
+def update_frame_controls(app):
+    """Roll navigation: position, frames prepared ahead, prev/next availability"""
+    if not hasattr(app, 'frame_label'):
+        return
+    session = app.frame_session
+    if session is None:
+        app.frame_label.configure(text="No roll open", text_color="#888888")
+        app.prev_frame_btn.configure(state="disabled")
+        app.next_frame_btn.configure(state="disabled")
+        return
+    text = f"Frame {session.index + 1}/{len(session)}"
+    ready = session.ready_ahead()
+    if ready:
+        text += f" · {ready} ready"
+    app.frame_label.configure(text=text, text_color="#CCCCCC")
+    app.prev_frame_btn.configure(state="normal" if session.has_previous else "disabled")
+    app.next_frame_btn.configure(state="normal" if session.has_next else "disabled")